@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import percentile
+
+
+# AIMD tuning (overridable through the environment)
+ADAPTIVE_ENABLED = os.environ.get("SCRAPER_ADAPTIVE_CONCURRENCY", "1") not in ("0", "false", "no")
+ADAPTIVE_MIN = int(os.environ.get("SCRAPER_ADAPTIVE_MIN", "1"))
+ADAPTIVE_INCREASE_INTERVAL = float(os.environ.get("SCRAPER_ADAPTIVE_INCREASE_INTERVAL", "30"))
+ADAPTIVE_DECREASE_COOLDOWN = float(os.environ.get("SCRAPER_ADAPTIVE_DECREASE_COOLDOWN", "10"))
+ADAPTIVE_MAX_ERROR_RATE = float(os.environ.get("SCRAPER_ADAPTIVE_MAX_ERROR_RATE", "0.2"))
+ADAPTIVE_LATENCY_TARGET_MS = float(os.environ.get("SCRAPER_ADAPTIVE_LATENCY_MS", "8000"))
+ADAPTIVE_MIN_SAMPLES = 5
+
+# Page outcomes that count against the error rate; 'blocked' also backs off at once.
+# 'no_listings' is a first results page without listing cards; 'empty' (a query
+# without results, or a later page past the last listing) is a normal page.
+BAD_OUTCOMES = ('blocked', 'consent_redirect', 'redirect', 'timeout', 'no_listings', 'error')
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease control of the worker limit.
+
+    The scraper reports every page it loads (outcome plus load latency). While
+    the error rate and median latency stay within bounds the limit grows by
+    one per increase interval; a block page halves it immediately, and so does
+    an error rate or latency spike. Samples are cleared after each change so
+    the next decision only sees pages loaded at the new level.
+    """
+
+    def __init__(self, min_limit=ADAPTIVE_MIN, max_limit=1, start=None, enabled=ADAPTIVE_ENABLED,
+                 increase_interval=ADAPTIVE_INCREASE_INTERVAL, decrease_cooldown=ADAPTIVE_DECREASE_COOLDOWN,
+                 max_error_rate=ADAPTIVE_MAX_ERROR_RATE, latency_target_ms=ADAPTIVE_LATENCY_TARGET_MS,
+                 apply=None):
+        self.enabled = enabled
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.level = self.max_limit if start is None else max(self.min_limit, min(self.max_limit, start))
+        self.increase_interval = increase_interval
+        self.decrease_cooldown = decrease_cooldown
+        self.max_error_rate = max_error_rate
+        self.latency_target_ms = latency_target_ms
+        self.apply = apply
+        self.on_change = None
+        self._lock = threading.Lock()
+        self._outcomes = {}
+        self._latencies = []
+        self._last_change = time.monotonic()
+        self.changes = deque(maxlen=50)
+
+    def bind(self, apply, max_limit, start=None, on_change=None):
+        """Drive `apply(level)` (e.g. JobScheduler.set_limit) between min_limit and max_limit"""
+        with self._lock:
+            self.apply = apply
+            self.on_change = on_change
+            self.max_limit = max(self.min_limit, max_limit)
+            self.level = self.max_limit if start is None else max(self.min_limit, min(self.max_limit, start))
+            level = self.level
+        if self.enabled:
+            apply(level)
+
+    def report(self, outcome='ok', latency_ms=None):
+        """Record one page load: outcome 'ok' or one of BAD_OUTCOMES"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+            if latency_ms is not None:
+                self._latencies.append(latency_ms)
+            change = self._decide(outcome)
+        if change:
+            self._apply(change)
+
+    def _decide(self, outcome):
+        now = time.monotonic()
+        since_change = now - self._last_change
+        total = sum(self._outcomes.values())
+        bad = {k: v for k, v in self._outcomes.items() if k in BAD_OUTCOMES}
+        error_rate = sum(bad.values()) / total if total else 0.0
+        p50 = percentile(self._latencies, 50)
+
+        reason = None
+        if outcome == 'blocked' and since_change >= self.decrease_cooldown:
+            reason = "blocked: redirected to a block page"
+        elif total >= ADAPTIVE_MIN_SAMPLES and since_change >= self.decrease_cooldown:
+            if error_rate > self.max_error_rate:
+                detail = ", ".join(f"{k} {v}" for k, v in sorted(bad.items()))
+                reason = f"error rate {error_rate:.0%} over {total} pages ({detail})"
+            elif p50 is not None and p50 > self.latency_target_ms:
+                reason = f"median page load {p50:.0f} ms over {self.latency_target_ms:.0f} ms target"
+        if reason:
+            new_level = max(self.min_limit, self.level // 2)
+        elif total >= ADAPTIVE_MIN_SAMPLES and since_change >= self.increase_interval and self.level < self.max_limit:
+            new_level = self.level + 1
+            latency = f", median page load {p50:.0f} ms" if p50 is not None else ""
+            reason = f"healthy: error rate {error_rate:.0%} over {total} pages{latency}"
+        else:
+            return None
+
+        # Whatever the decision, the next one starts from a clean window
+        self._outcomes = {}
+        self._latencies = []
+        self._last_change = now
+        if new_level == self.level:
+            return None
+        change = {'at': time.time(), 'from': self.level, 'to': new_level, 'reason': reason}
+        self.level = new_level
+        self.changes.append(change)
+        return change
+
+    def _apply(self, change):
+        print(f"[ADAPTIVE] Concurrency {change['from']} -> {change['to']}: {change['reason']}")
+        try:
+            if self.apply:
+                self.apply(change['to'])
+            if self.on_change:
+                self.on_change(change)
+        except Exception as e:
+            print(f"[WARNING] Could not apply concurrency change: {e}")
+
+    def status(self):
+        with self._lock:
+            total = sum(self._outcomes.values())
+            return {
+                'enabled': self.enabled,
+                'level': self.level,
+                'min': self.min_limit,
+                'max': self.max_limit,
+                'window': {
+                    'pages': total,
+                    'outcomes': dict(self._outcomes),
+                    'median_load_ms': percentile(self._latencies, 50),
+                    'seconds': round(time.monotonic() - self._last_change, 1),
+                },
+                'changes': list(self.changes),
+            }
+
+
+# Shared by every worker in the process; the server binds it to the scheduler
+controller = AIMDController()
+
+
+def report_page(outcome='ok', latency_ms=None):
+    controller.report(outcome, latency_ms)
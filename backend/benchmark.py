@@ -0,0 +1,331 @@
+"""Benchmark harness for the scraper backend.
+
+Usage:
+    python benchmark.py csv-writer [--rows N] [--flush-rows N] [--flush-interval S]
+    python benchmark.py record --queries "coffee shops" ... [--location L] [--fixtures DIR]
+    python benchmark.py replay [--fixtures DIR] [--concurrency 1,2,4] [--engines selenium,playwright]
+
+`record` scrapes live Google once and saves every page it sees as fixtures;
+`replay` runs full jobs against replay_server.py serving those fixtures.
+Each subcommand prints its results as JSON.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import socket
+import tempfile
+import threading
+import time
+
+from csv_writer import BufferedCSVWriter, DURABILITY_MODES, _CountingFileIO
+from fixtures import FIXTURES_DIR, FixtureStore
+from metrics import summarize
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+FIELDNAMES = ['name', 'rating', 'total_reviews', 'category', 'address',
+              'phone', 'website', 'price_range', 'hours_status', 'google_maps_url', 'search_location']
+
+
+def sample_row(i):
+    return {
+        'name': f"Benchmark Coffee {i}",
+        'rating': '4.5',
+        'total_reviews': str(100 + i),
+        'category': 'Coffee shop',
+        'address': f"{i} Broadway, New York, NY 10001",
+        'phone': '(212) 555-0100',
+        'website': f"https://example.com/{i}",
+        'price_range': '$$',
+        'hours_status': 'Open ⋅ Closes 8 PM',
+        'google_maps_url': f"https://maps.google.com/?cid={1000000 + i}",
+        'search_location': 'New York',
+    }
+
+
+def bench_legacy_csv(filepath, rows):
+    """The old path: open, write one row, flush and close for every row"""
+    latencies = []
+    write_syscalls = 0
+    for i in range(rows):
+        started = time.perf_counter()
+        raw = _CountingFileIO(filepath, 'a')
+        with io.TextIOWrapper(io.BufferedWriter(raw), encoding='utf-8', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+            writer.writerow(sample_row(i))
+            csvfile.flush()
+        latencies.append((time.perf_counter() - started) * 1e6)
+        write_syscalls += raw.write_calls
+    return {
+        'mode': 'legacy-open-per-row',
+        'rows': rows,
+        'opens': rows,
+        'write_syscalls': write_syscalls,
+        'append_us': summarize(latencies),
+    }
+
+
+def bench_buffered_csv(filepath, rows, durability, flush_rows, flush_interval):
+    latencies = []
+    writer = BufferedCSVWriter(filepath, FIELDNAMES, flush_rows=flush_rows, flush_interval=flush_interval,
+                               durability=durability)
+    for i in range(rows):
+        started = time.perf_counter()
+        writer.writerow(sample_row(i))
+        latencies.append((time.perf_counter() - started) * 1e6)
+    writer.close()
+    result = {'mode': f"buffered-{durability}", 'rows': rows, 'opens': 1}
+    result.update(writer.stats())
+    result['append_us'] = summarize(latencies)
+    return result
+
+
+def run_csv_writer(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, 'legacy.csv')
+        results.append(bench_legacy_csv(filepath, args.rows))
+        for durability in DURABILITY_MODES:
+            filepath = os.path.join(tmp, f"buffered_{durability}.csv")
+            results.append(bench_buffered_csv(filepath, args.rows, durability, args.flush_rows, args.flush_interval))
+    return {'benchmark': 'csv-writer', 'flush_rows': args.flush_rows, 'results': results}
+
+
+PHASES = ['page_load_ms', 'next_page_ms', 'panel_wait_ms', 'extract_ms', 'listing_latency_ms']
+
+
+class RSSSampler:
+    """Tracks peak RSS of this process plus its browsers (needs psutil for the browsers)"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_total = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak_total = max(self.peak_total, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._sample()
+        return round(self.peak_total / 1024 / 1024, 1) if psutil is not None else None
+
+
+def backend_peak_rss_mb():
+    """Peak RSS of this process since it started (ru_maxrss is in KB on Linux)"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def use_scratch_backend(pool_size):
+    """Point the backend at throwaway output/job storage; must run before importing server"""
+    work_dir = tempfile.mkdtemp(prefix='scraper-bench-')
+    os.environ['SCRAPER_OUTPUT_DIR'] = os.path.join(work_dir, 'csv_outputs')
+    os.environ['SCRAPER_JOBS_DB'] = os.path.join(work_dir, 'jobs.db')
+    os.environ['SCRAPER_ZIP_CACHE_DIR'] = os.path.join(work_dir, 'zip_cache')
+    os.environ['SCRAPER_BUSINESS_INDEX'] = os.path.join(work_dir, 'business_index.jsonl')
+    os.environ['SCRAPER_DETAIL_CACHE_DB'] = os.path.join(work_dir, 'detail_cache.db')
+    os.environ['SCRAPER_POOL_SIZE'] = str(pool_size)
+    os.environ['SCRAPER_MAX_WORKERS'] = str(pool_size)
+    # Levels are set by the benchmark, not discovered by the adaptive controller
+    os.environ['SCRAPER_ADAPTIVE_CONCURRENCY'] = '0'
+    return work_dir
+
+
+def run_job(server, queries, location, concurrency, args, engine="selenium"):
+    request = server.ScrapeRequest(
+        queries=queries,
+        location=location,
+        concurrency=concurrency,
+        engine=engine,
+        extraction_mode=args.extraction_mode,
+        panel_wait_mode=args.panel_wait_mode,
+        pagination_mode=args.pagination_mode,
+        page_workers=args.page_workers,
+        known_business_mode=args.known_business_mode,
+        # Every level must really scrape: no answers from earlier levels' results or rows
+        reuse_results=False,
+        detail_cache_ttl=0
+    )
+    started = time.time()
+    job_id = server.create_job(request)
+    server.scheduler.wait(job_id)
+    elapsed = time.time() - started
+    return job_id, elapsed, server.job_status[job_id]
+
+
+def run_record(args):
+    os.environ['SCRAPER_RECORD_DIR'] = os.path.abspath(args.fixtures)
+    use_scratch_backend(1)
+    import server
+
+    try:
+        job_id, elapsed, job = run_job(server, args.queries, args.location, 1, args)
+    finally:
+        server.driver_pool.shutdown()
+    return {
+        'benchmark': 'record',
+        'fixtures': os.path.abspath(args.fixtures),
+        'status': job['status'],
+        'elapsed_s': round(elapsed, 1),
+        'rows': sum(r.get('total_results', 0) for r in job['results']),
+        'recorded_queries': FixtureStore(args.fixtures).queries(),
+    }
+
+
+def compare_engines(results):
+    """Playwright listings/min as a multiple of Selenium's, per concurrency level"""
+    rates = {}
+    for result in results:
+        rates.setdefault(result['concurrency'], {})[result['engine']] = result['listings_per_min']
+    return {
+        level: round(by_engine['playwright'] / by_engine['selenium'], 2)
+        for level, by_engine in rates.items()
+        if by_engine.get('selenium') and by_engine.get('playwright')
+    }
+
+
+def run_replay(args):
+    levels = [int(level) for level in args.concurrency.split(',')]
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    fixtures_dir = os.path.abspath(args.fixtures)
+    port = free_port()
+    os.environ['SCRAPER_BASE_URL'] = f"http://127.0.0.1:{port}"
+    # The replay server is local: pacing would cap every level at the token bucket rates
+    os.environ['SCRAPER_RATE_GLOBAL'] = '0'
+    os.environ['SCRAPER_RATE_WORKER'] = '0'
+    # Room for every query's page workers, but only the level's queries hold scheduler slots
+    pool_size = max(levels) * args.page_workers
+    work_dir = use_scratch_backend(pool_size)
+    from replay_server import ReplayServer
+    import server
+
+    replay = ReplayServer(fixtures_dir, port=port)
+    replay.start()
+    queries = args.queries or replay.httpd.RequestHandlerClass.store.queries()
+    if not queries:
+        raise SystemExit(f"No recorded queries in {fixtures_dir}; run `benchmark.py record` first")
+
+    if 'playwright' in engines and not server.playwright_engine.AVAILABLE:
+        raise SystemExit(server.playwright_engine.MISSING_MESSAGE)
+
+    results = []
+    try:
+        # Start every browser up front so the first level does not pay the cold starts
+        if 'selenium' in engines:
+            server.driver_pool.warm(pool_size)
+        for engine, level in [(engine, level) for engine in engines for level in levels]:
+            sampler = RSSSampler().start()
+            job_id, elapsed, job = run_job(server, queries, "", level, args, engine=engine)
+            stats = job.get('stats') or {}
+            listings = stats.get('listings_visited', 0)
+            results.append({
+                'engine': engine,
+                'concurrency': level,
+                'status': job['status'],
+                'queries': len(queries),
+                'elapsed_s': round(elapsed, 2),
+                'listings': listings,
+                'rows': sum(r.get('total_results', 0) for r in job['results']),
+                'listings_per_min': round(listings / elapsed * 60, 1) if elapsed else None,
+                'phases': {phase: stats.get(phase) for phase in PHASES},
+                'webdriver_commands_per_listing': stats.get('webdriver_commands_per_listing'),
+                'peak_rss_mb': {'backend': backend_peak_rss_mb(), 'backend_and_browsers': sampler.stop()},
+            })
+    finally:
+        server.driver_pool.shutdown()
+        server.playwright_engine.engine.shutdown()
+        replay.stop()
+
+    return {
+        'benchmark': 'replay',
+        'fixtures': fixtures_dir,
+        'extraction_mode': args.extraction_mode,
+        'panel_wait_mode': args.panel_wait_mode,
+        'pagination_mode': args.pagination_mode,
+        'page_workers': args.page_workers,
+        'known_business_mode': args.known_business_mode,
+        'rate_limit': server.limiter.status(),
+        'work_dir': work_dir,
+        'results': results,
+        'playwright_vs_selenium': compare_engines(results),
+    }
+
+
+def add_scrape_options(parser):
+    parser.add_argument('--extraction-mode', choices=['script', 'selenium'], default='script')
+    parser.add_argument('--panel-wait-mode', choices=['observer', 'polling'], default='observer')
+    parser.add_argument('--pagination-mode', choices=['url', 'click'], default='url')
+    parser.add_argument('--page-workers', type=int, default=1, help="Browsers one query's pages are spread across")
+    parser.add_argument('--known-business-mode', choices=['off', 'skip', 'reference'], default='off')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scraper backend benchmarks")
+    parser.add_argument('--output', help="Also write the JSON report to this file (scraper logs share stdout)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    csv_parser = sub.add_parser('csv-writer', help="Row append latency and write syscalls per CSV output mode")
+    csv_parser.add_argument('--rows', type=int, default=2000)
+    csv_parser.add_argument('--flush-rows', type=int, default=10)
+    csv_parser.add_argument('--flush-interval', type=float, default=5.0)
+    csv_parser.set_defaults(func=run_csv_writer)
+
+    record_parser = sub.add_parser('record', help="Scrape live once and save the pages as replay fixtures")
+    record_parser.add_argument('--queries', nargs='+', required=True)
+    record_parser.add_argument('--location', default="")
+    record_parser.add_argument('--fixtures', default=str(FIXTURES_DIR))
+    add_scrape_options(record_parser)
+    record_parser.set_defaults(func=run_record)
+
+    replay_parser = sub.add_parser('replay', help="Listings/min, phase latency and peak RSS against recorded fixtures")
+    replay_parser.add_argument('--fixtures', default=str(FIXTURES_DIR))
+    replay_parser.add_argument('--concurrency', default="1,2,4", help="Comma separated job concurrency levels")
+    replay_parser.add_argument('--queries', nargs='+', help="Recorded queries to run (default: all)")
+    replay_parser.add_argument('--engines', default="selenium",
+                               help="Comma separated scraper engines to run every level on (selenium, playwright)")
+    add_scrape_options(replay_parser)
+    replay_parser.set_defaults(func=run_replay)
+
+    args = parser.parse_args(argv)
+    report = json.dumps(args.func(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+class BusinessIndex:
+    """Every business scraped so far, keyed by its CID, shared by all jobs.
+
+    Lookups hit an in-memory dict; each new or updated business is appended
+    as one JSON line to the log file, which is replayed (last line wins) on
+    startup and rewritten once it holds mostly superseded lines.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._log_lines = 0
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._rows[entry['key']] = entry
+                        self._log_lines += 1
+                    except Exception:
+                        # A torn last line from a crash; the rest is still good
+                        continue
+            print(f"DEBUG: Loaded {len(self._rows)} known businesses from {self.path}")
+        if self._log_lines > 2 * len(self._rows) + 1000:
+            self._compact()
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self._file.tell() and not self._ends_with_newline():
+            # Keep the next entry off the torn line
+            self._file.write('\n')
+            self._file.flush()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _compact(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._rows.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, self.path)
+        print(f"DEBUG: Compacted business index from {self._log_lines} to {len(self._rows)} lines")
+        self._log_lines = len(self._rows)
+
+    def get(self, key):
+        """The stored row for a business CID, or None"""
+        entry = self._rows.get(key)
+        return dict(entry['row']) if entry else None
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, key, row):
+        """Record (or refresh) a scraped business"""
+        if not key:
+            return
+        entry = {'key': key, 'row': row, 'scraped_at': datetime.now().isoformat()}
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._rows[key] = entry
+            self._log_lines += 1
+            try:
+                self._file.write(line)
+                self._file.flush()
+            except Exception as e:
+                print(f"[WARNING] Could not append to business index {self.path}: {e}")
+
+    def status(self):
+        return {'path': str(self.path), 'businesses': len(self._rows), 'log_lines': self._log_lines}
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import weakref
+
+
+# Deadlines in seconds, 0 = none (overridable through the environment). A job
+# deadline can also be set per request; each level is capped by the one above.
+JOB_DEADLINE = float(os.environ.get("SCRAPER_JOB_DEADLINE", "0"))
+QUERY_DEADLINE = float(os.environ.get("SCRAPER_QUERY_DEADLINE", "0"))
+PAGE_DEADLINE = float(os.environ.get("SCRAPER_PAGE_DEADLINE", "0"))
+LISTING_DEADLINE = float(os.environ.get("SCRAPER_LISTING_DEADLINE", "0"))
+
+TERMINATE_LATENCY_TARGET_MS = 500
+POLL_SLICE = 0.05  # For plain callables, which cannot wake a sleeper
+
+
+class CancellationToken:
+    """Cancellation signal for a job, query, page or listing, built on threading.Event.
+
+    Calling the token returns True once it is cancelled, so it drops in
+    wherever a termination_flag callable is expected. cancel() wakes every
+    wait() at once and cascades to child tokens; a token whose deadline
+    passes cancels itself (and its children) with reason 'deadline' without
+    touching its parent.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        self.parent = parent
+        self.reason = None
+        self.cancelled_at = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._children = weakref.WeakSet()
+        self.deadline = time.monotonic() + timeout if timeout else None
+        if parent is not None:
+            if parent.deadline is not None and (self.deadline is None or parent.deadline < self.deadline):
+                self.deadline = parent.deadline
+            parent._adopt(self)
+
+    def _adopt(self, child):
+        with self._lock:
+            self._children.add(child)
+            reason = self.reason if self._event.is_set() else None
+        if reason:
+            child.cancel(reason)
+
+    def cancel(self, reason='terminated'):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self.cancelled_at = time.monotonic()
+            self._event.set()
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+
+    def cancelled(self):
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel('deadline')
+            return True
+        return False
+
+    __call__ = cancelled
+
+    def remaining(self):
+        """Seconds until the deadline (0 once cancelled), or None without one"""
+        if self._event.is_set():
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def wait(self, seconds):
+        """Sleep up to `seconds`, returning early (True) as soon as the token is cancelled"""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if self._event.wait(max(0.0, seconds)):
+            return True
+        return self.cancelled()
+
+    def child(self, timeout=None):
+        return CancellationToken(timeout, parent=self)
+
+    def since_cancel_ms(self):
+        """Milliseconds since cancel(), or None if not cancelled"""
+        if self.cancelled_at is None:
+            return None
+        return round((time.monotonic() - self.cancelled_at) * 1000, 1)
+
+
+def child_token(cancelled, timeout):
+    """A token for one level down (query, page, listing) with its own deadline.
+
+    Without a deadline the parent is passed on as is; plain termination_flag
+    callables cannot carry deadlines and are passed on too.
+    """
+    if not timeout:
+        return cancelled
+    if cancelled is None:
+        return CancellationToken(timeout)
+    if isinstance(cancelled, CancellationToken):
+        return cancelled.child(timeout)
+    return cancelled
+
+
+def interruptible_sleep(seconds, cancelled=None):
+    """time.sleep() that returns early (True) once `cancelled` fires"""
+    if cancelled is None:
+        time.sleep(seconds)
+        return False
+    if isinstance(cancelled, CancellationToken):
+        return cancelled.wait(seconds)
+    end = time.monotonic() + seconds
+    while True:
+        if cancelled():
+            return True
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(remaining, POLL_SLICE))
@@ -0,0 +1,65 @@
+import csv
+import os
+
+
+# Resume interrupted jobs from their checkpoints on startup (overridable through the environment)
+RESUME_JOBS = os.environ.get("SCRAPER_RESUME_JOBS", "1") not in ("0", "false", "no")
+
+
+class QueryCheckpointer:
+    """Saves a running query's progress after every finished results page.
+
+    A checkpoint records the pages written so far and the CSV row count and
+    byte size at that point, so a restarted server can cut the CSV back to the
+    last complete page and carry on from the next one. The Maps URLs already
+    scraped are not stored: they are read back from the restored rows.
+    """
+
+    def __init__(self, store, job_id, query_index, query, csv_file):
+        self.store = store
+        self.job_id = job_id
+        self.query_index = query_index
+        self.query = query
+        self.csv_file = csv_file
+        self.saved = 0
+
+    def __call__(self, page, rows, csv_bytes):
+        checkpoint = {
+            'query': self.query,
+            'csv_file': self.csv_file,
+            'page': page,
+            'rows': rows,
+            'csv_bytes': csv_bytes,
+        }
+        try:
+            self.store.save_checkpoint(self.job_id, self.query_index, checkpoint)
+            self.saved += 1
+        except Exception as e:
+            print(f"[WARNING] Could not save checkpoint for query {self.query_index} of job {self.job_id}: {e}")
+
+    def clear(self):
+        self.store.delete_checkpoint(self.job_id, self.query_index)
+
+
+def restore_csv(csv_filepath, checkpoint):
+    """Cut a CSV back to its checkpoint and return the rows it holds, or None if it cannot be resumed.
+
+    Rows appended after the checkpoint (part of a page that never finished)
+    are dropped; that page is scraped again.
+    """
+    try:
+        size = os.path.getsize(csv_filepath)
+    except OSError:
+        print(f"[WARNING] Checkpointed CSV {csv_filepath} is gone; starting the query over")
+        return None
+    if size < checkpoint['csv_bytes']:
+        print(f"[WARNING] {csv_filepath} is shorter than its checkpoint ({size} < {checkpoint['csv_bytes']} bytes); starting the query over")
+        return None
+    if size > checkpoint['csv_bytes']:
+        with open(csv_filepath, 'r+b') as f:
+            f.truncate(checkpoint['csv_bytes'])
+    with open(csv_filepath, 'r', newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    if len(rows) != checkpoint['rows']:
+        print(f"[WARNING] {csv_filepath} holds {len(rows)} rows, checkpoint says {checkpoint['rows']}")
+    return rows
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+
+# Backoff after a block page (overridable through the environment)
+BREAKER_BACKOFF = float(os.environ.get("SCRAPER_BREAKER_BACKOFF", "60"))
+BREAKER_MAX_BACKOFF = float(os.environ.get("SCRAPER_BREAKER_MAX_BACKOFF", "900"))
+BLOCKED_RETRIES = int(os.environ.get("SCRAPER_BLOCKED_RETRIES", "2"))
+PROBE_TIMEOUT = 120  # Another worker takes over a probe that never reported back
+WAIT_SLICE = 0.1  # How often waiters look at their cancellation token
+
+
+class BlockedError(Exception):
+    """Google answered with a block page (google.com/sorry, a sign-in wall) instead of results.
+
+    `rows` are what the query scraped before the block (already in its CSV).
+    """
+
+    def __init__(self, url, rows=None):
+        super().__init__(f"Blocked: redirected to {url}")
+        self.url = url
+        self.rows = rows or []
+
+
+class CircuitBreaker:
+    """Stops every worker from navigating while Google is blocking us.
+
+    closed: navigations go ahead. trip() opens it for a backoff window that
+    doubles with every consecutive trip. When the window is over the first
+    worker to navigate becomes the probe (half_open) while the others keep
+    waiting; the probe's first good page closes the breaker, another block
+    page opens it again.
+    """
+
+    def __init__(self, backoff=BREAKER_BACKOFF, max_backoff=BREAKER_MAX_BACKOFF):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state = 'closed'
+        self.reason = None
+        self.opened_at = None
+        self.retry_at = None
+        self.consecutive_trips = 0
+        self.trips_total = 0
+        self._probe = None
+        self._probe_started = None
+        self._cond = threading.Condition()
+
+    def trip(self, reason):
+        with self._cond:
+            if self.state == 'open':
+                return
+            self.consecutive_trips += 1
+            self.trips_total += 1
+            window = min(self.max_backoff, self.backoff * 2 ** (self.consecutive_trips - 1))
+            self.state = 'open'
+            self.reason = reason
+            self.opened_at = time.time()
+            self.retry_at = self.opened_at + window
+            self._probe = None
+            self._cond.notify_all()
+        print(f"[BREAKER] Open for {window:.0f}s: {reason}")
+
+    def record_success(self, probe=None):
+        """A page loaded normally; closes the breaker if this was the probe"""
+        probe = threading.get_ident() if probe is None else probe
+        with self._cond:
+            if self.state != 'half_open' or self._probe != probe:
+                return
+            self.state = 'closed'
+            self.reason = None
+            self.consecutive_trips = 0
+            self._probe = None
+            self._cond.notify_all()
+        print("[BREAKER] Closed: probe page loaded normally")
+
+    def wait_until_clear(self, cancelled=None, probe=None):
+        """Block while the breaker is open (or another worker probes); False if cancelled meanwhile.
+
+        `probe` identifies the worker (default: the calling thread); workers
+        that share a thread, like coroutines, pass their own.
+        """
+        probe = threading.get_ident() if probe is None else probe
+        with self._cond:
+            while True:
+                if self.state == 'closed' or self._probe == probe:
+                    return True
+                probe_stuck = self.state == 'half_open' and time.time() - self._probe_started > PROBE_TIMEOUT
+                if probe_stuck or (self.state == 'open' and time.time() >= self.retry_at):
+                    self.state = 'half_open'
+                    self._probe = probe
+                    self._probe_started = time.time()
+                    print("[BREAKER] Half open: probing with the next navigation")
+                    return True
+                if cancelled and cancelled():
+                    return False
+                self._cond.wait(WAIT_SLICE)
+
+    def status(self):
+        with self._cond:
+            return {
+                'state': self.state,
+                'reason': self.reason,
+                'opened_at': datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None,
+                'retry_at': datetime.fromtimestamp(self.retry_at).isoformat() if self.state == 'open' else None,
+                'consecutive_trips': self.consecutive_trips,
+                'trips_total': self.trips_total,
+            }
+
+
+# Shared by every worker in the process
+breaker = CircuitBreaker()
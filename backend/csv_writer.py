@@ -0,0 +1,121 @@
+import csv
+import io
+import os
+import time
+
+
+# Output buffering (overridable through the environment)
+CSV_FLUSH_ROWS = int(os.environ.get("SCRAPER_CSV_FLUSH_ROWS", "10"))
+CSV_FLUSH_INTERVAL = float(os.environ.get("SCRAPER_CSV_FLUSH_INTERVAL", "5"))
+CSV_DURABILITY = os.environ.get("SCRAPER_CSV_DURABILITY", "flush")
+CSV_BUFFER_SIZE = 64 * 1024
+
+DURABILITY_MODES = ('none', 'flush', 'fsync')
+
+
+class _CountingFileIO(io.FileIO):
+    """FileIO that counts its write() calls, i.e. write syscalls"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_calls = 0
+
+    def write(self, b):
+        self.write_calls += 1
+        return super().write(b)
+
+
+class BufferedCSVWriter:
+    """Appends rows to one CSV file that stays open for a whole query.
+
+    Rows are buffered in memory and pushed out at flush points: every
+    `flush_rows` rows, when `flush_interval` seconds have passed since the
+    last flush (checked on each write), and on flush()/close(). `durability`
+    decides what a flush point does:
+
+    - "none": nothing; rows reach the OS when the buffer fills or on close
+    - "flush": hand the buffer to the OS (survives a crash of this process)
+    - "fsync": flush and fsync (survives a power loss)
+    """
+
+    def __init__(self, filepath, fieldnames, flush_rows=CSV_FLUSH_ROWS, flush_interval=CSV_FLUSH_INTERVAL,
+                 durability=CSV_DURABILITY, write_header=False):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        self.filepath = filepath
+        self.fieldnames = fieldnames
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._raw = _CountingFileIO(filepath, 'a')
+        self._file = io.TextIOWrapper(io.BufferedWriter(self._raw, CSV_BUFFER_SIZE), encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self.closed = False
+        self.rows_written = 0
+        self.flushes = 0
+        self.fsyncs = 0
+        self.append_seconds = 0.0
+        if write_header:
+            self._writer.writeheader()
+
+    def writerow(self, row):
+        started = time.perf_counter()
+        self._writer.writerow(row)
+        self.rows_written += 1
+        self._pending += 1
+        if self._pending >= self.flush_rows or (
+                self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+        self.append_seconds += time.perf_counter() - started
+
+    def flush(self):
+        """Flush point: push pending rows according to the durability setting"""
+        if self.closed:
+            return
+        if self._pending and self.durability != 'none':
+            self._file.flush()
+            self.flushes += 1
+            if self.durability == 'fsync':
+                os.fsync(self._raw.fileno())
+                self.fsyncs += 1
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def checkpoint(self):
+        """Hand every row written so far to the OS (fsync under "fsync") and return the file size"""
+        if self.closed:
+            return os.path.getsize(self.filepath)
+        self._file.flush()
+        if self._pending:
+            self.flushes += 1
+            if self.durability == 'fsync':
+                os.fsync(self._raw.fileno())
+                self.fsyncs += 1
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        return self._raw.tell()
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self._file.close()
+        self.closed = True
+
+    def stats(self):
+        return {
+            'rows_written': self.rows_written,
+            'flushes': self.flushes,
+            'fsyncs': self.fsyncs,
+            'write_syscalls': self._raw.write_calls,
+            'append_us_mean': round(self.append_seconds / self.rows_written * 1e6, 2) if self.rows_written else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
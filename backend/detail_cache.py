@@ -0,0 +1,110 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Freshness and size bounds (overridable through the environment)
+DETAIL_CACHE_TTL = int(os.environ.get("SCRAPER_DETAIL_CACHE_TTL", str(24 * 3600)))
+DETAIL_CACHE_MAX_ENTRIES = int(os.environ.get("SCRAPER_DETAIL_CACHE_MAX_ENTRIES", "50000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    business_key TEXT PRIMARY KEY,
+    row TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_details_last_used ON details (last_used);
+"""
+
+
+class DetailCache:
+    """Scraped detail rows by business CID, reused while they are fresh.
+
+    An entry is fresh for `ttl` seconds after it was scraped. Once the cache
+    holds more than `max_entries` rows the least recently used ones are
+    evicted (a tenth of the cap at a time, so eviction is not paid per insert).
+    """
+
+    def __init__(self, db_path, ttl=DETAIL_CACHE_TTL, max_entries=DETAIL_CACHE_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, key, ttl=None):
+        """(row, outcome) where outcome is 'hit', 'stale' or 'miss'; row is None unless it is a hit"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT row, scraped_at FROM details WHERE business_key = ?", (key,)
+            ).fetchone()
+            if found is None:
+                self.misses += 1
+                return None, 'miss'
+            if now - found[1] > ttl:
+                self.stale += 1
+                return None, 'stale'
+            self._conn.execute("UPDATE details SET last_used = ? WHERE business_key = ?", (now, key))
+            self.hits += 1
+        return json.loads(found[0]), 'hit'
+
+    def put(self, key, row):
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE details SET row = ?, scraped_at = ?, last_used = ? WHERE business_key = ?",
+                (json.dumps(row), now, now, key)
+            )
+            if cursor.rowcount:
+                return
+            self._conn.execute(
+                "INSERT INTO details (business_key, row, scraped_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(row), now, now)
+            )
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        target = self.max_entries - max(1, self.max_entries // 10)
+        cursor = self._conn.execute(
+            "DELETE FROM details WHERE business_key IN "
+            "(SELECT business_key FROM details ORDER BY last_used LIMIT ?)",
+            (self._count - target,)
+        )
+        self.evictions += cursor.rowcount
+        self._count -= cursor.rowcount
+
+    def status(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,342 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from selenium import webdriver
+
+
+# Pool configuration (overridable through the environment)
+POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", "2"))
+POOL_WARM = int(os.environ.get("SCRAPER_POOL_WARM", "0"))
+MAX_PAGES_PER_DRIVER = int(os.environ.get("SCRAPER_POOL_MAX_PAGES", "50"))
+ACQUIRE_TIMEOUT = float(os.environ.get("SCRAPER_POOL_ACQUIRE_TIMEOUT", "600"))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
+
+def build_chrome_options():
+    """Chrome options shared by every browser we start (originally from test.py)"""
+    option = webdriver.ChromeOptions()
+    # option.add_argument("--headless")
+    option.add_argument(f"user-agent={USER_AGENT}")
+    option.add_argument("--disable-blink-features=AutomationControlled")
+    option.add_experimental_option("useAutomationExtension", False)
+    option.add_argument('--disable-infobars')
+    option.add_experimental_option("excludeSwitches", ["enable-automation"])
+    option.add_argument("--start-maximized")
+    option.add_argument("--disable-search-engine-choice-screen")
+    option.add_argument("--disable-dev-shm-usage")
+    option.add_argument("--no-sandbox")
+    option.add_argument("--disable-gpu")
+    option.add_argument("--disable-features=IsolateOrigins,site-per-process")
+    # Suppress Errors and Noise
+    option.add_argument("--log-level=3")
+    option.add_argument("--silent")
+    option.add_argument("--disable-logging")
+    option.add_argument("--disable-background-networking")
+    option.add_argument("--disable-sync")
+    option.add_argument("--no-first-run")
+    option.add_argument("--ignore-certificate-errors")
+    option.add_argument("--ignore-ssl-errors")
+    option.add_argument("--allow-running-insecure-content")
+    return option
+
+
+def create_driver():
+    """Start a Chrome instance with the automation flag hidden"""
+    driver = webdriver.Chrome(options=build_chrome_options())
+    driver.set_page_load_timeout(8)  # Further reduced timeout to allow faster interruption
+    # Hide automation flag from test.py
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+    })
+    return driver
+
+
+class DriverLostError(Exception):
+    """The browser or its WebDriver session died while scraping listing `listing_index` of a page"""
+
+    def __init__(self, listing_index, cause):
+        super().__init__(f"Browser lost at listing {listing_index + 1}: {cause}")
+        self.listing_index = listing_index
+        self.cause = cause
+
+
+def driver_alive(driver):
+    """False once the browser has crashed or its WebDriver session is gone"""
+    try:
+        driver.execute_script("return 1")
+        return len(driver.window_handles) > 0
+    except Exception:
+        return False
+
+
+class PooledDriver:
+    """A browser owned by the pool, plus the bookkeeping needed to recycle it"""
+
+    def __init__(self, driver, driver_id, lock=None):
+        self.driver = driver
+        self.driver_id = driver_id
+        self._lock = lock or threading.RLock()  # The pool's condition, which status() reads under
+        self.created_at = datetime.now().isoformat()
+        self.pages_served = 0
+        self.leases = 0
+        self.consent_handled = False
+        self.job_id = None
+        self.leased_at = None
+        self.discarded = False
+        self.retired = False
+
+    def mark_page(self, count=1):
+        """Record a results page load; drivers are recycled after MAX_PAGES_PER_DRIVER"""
+        with self._lock:
+            self.pages_served += count
+
+    def to_dict(self):
+        return {
+            'driver_id': self.driver_id,
+            'created_at': self.created_at,
+            'pages_served': self.pages_served,
+            'leases': self.leases,
+            'consent_handled': self.consent_handled,
+            'job_id': self.job_id,
+            'leased_for_seconds': round(time.time() - self.leased_at, 1) if self.leased_at else None,
+        }
+
+
+class DriverPool:
+    """Keeps up to `size` warm Chrome instances and leases them to queries.
+
+    A lease hands out an idle, health-checked browser (or starts a new one while
+    below `size`). On release the browser is reset and returned to the idle list,
+    unless it was discarded (e.g. job terminated) or has served `max_pages` pages,
+    in which case it is quit and replaced lazily on the next acquire.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES_PER_DRIVER, driver_factory=create_driver):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.driver_factory = driver_factory
+        self._cond = threading.Condition()
+        self._idle = []
+        self._leased = {}
+        self._live = 0
+        self._next_id = 1
+        self._closed = False
+        self.created_total = 0
+        self.recycled_total = 0
+        self.replaced_total = 0
+        self.health_failures = 0
+        self.leases_total = 0
+
+    # --- lifecycle -----------------------------------------------------------------
+
+    def _start_driver(self):
+        """Create a browser for a slot that was already reserved in self._live"""
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            pooled = PooledDriver(driver, self._next_id, lock=self._cond)
+            self._next_id += 1
+            self.created_total += 1
+        print(f"DEBUG: Driver pool started browser #{pooled.driver_id}")
+        return pooled
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            print(f"DEBUG: Browser #{pooled.driver_id} already closed or failed to quit: {e}")
+
+    def _retire(self, pooled, reason):
+        """Quit a browser and free its slot"""
+        print(f"DEBUG: Retiring browser #{pooled.driver_id} ({reason})")
+        self._quit(pooled)
+        with self._cond:
+            self._free_slot(pooled)
+
+    def _free_slot(self, pooled):
+        """Give a retired browser's slot back to waiters, once; the caller holds self._cond"""
+        if pooled.retired:
+            return
+        pooled.retired = True
+        self._live -= 1
+        self.recycled_total += 1
+        self._cond.notify()
+
+    def is_healthy(self, pooled):
+        return driver_alive(pooled.driver)
+
+    def _reset(self, pooled):
+        """Bring a browser back to a neutral state between leases.
+
+        Cookies are kept on purpose so the consent dialog stays dismissed.
+        """
+        driver = pooled.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+
+    def warm(self, count=None):
+        """Start browsers up front so the first queries skip the cold start"""
+        count = self.size if count is None else min(count, self.size)
+        started = []
+        for _ in range(count):
+            with self._cond:
+                if self._closed or self._live >= self.size:
+                    break
+                self._live += 1
+            try:
+                started.append(self._start_driver())
+            except Exception as e:
+                print(f"[WARNING] Could not pre-start browser: {e}")
+                break
+        with self._cond:
+            self._idle.extend(started)
+            self._cond.notify_all()
+        return len(started)
+
+    def shutdown(self):
+        """Quit every browser; leased ones are quit and discarded on release"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            leased = list(self._leased.values())
+            for pooled in leased:
+                pooled.discarded = True
+            self._cond.notify_all()
+        for pooled in idle + leased:
+            self._quit(pooled)
+        with self._cond:
+            self._live -= len(idle)
+
+    # --- leasing -------------------------------------------------------------------
+
+    def acquire(self, job_id=None, timeout=ACQUIRE_TIMEOUT):
+        """Lease a healthy browser, waiting up to `timeout` seconds for a free slot"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            pooled = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is shut down")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        break
+                    if self._live < self.size:
+                        self._live += 1
+                        break
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No browser available within {timeout}s")
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                pooled = self._start_driver()
+            elif not self.is_healthy(pooled):
+                with self._cond:
+                    self.health_failures += 1
+                self._retire(pooled, "failed health check")
+                continue
+
+            with self._cond:
+                pooled.job_id = job_id
+                pooled.leased_at = time.time()
+                pooled.leases += 1
+                self.leases_total += 1
+                self._leased[pooled.driver_id] = pooled
+            return pooled
+
+    def release(self, pooled):
+        """Return a leased browser; it is reset or retired depending on its state"""
+        with self._cond:
+            self._leased.pop(pooled.driver_id, None)
+            pooled.job_id = None
+            pooled.leased_at = None
+            closed = self._closed
+            if pooled.retired:
+                # replace() failed and already gave the slot back
+                return
+
+        if pooled.discarded or closed:
+            self._retire(pooled, "discarded")
+            return
+        if self.max_pages and pooled.pages_served >= self.max_pages:
+            self._retire(pooled, f"served {pooled.pages_served} pages")
+            return
+        try:
+            self._reset(pooled)
+        except Exception as e:
+            self._retire(pooled, f"reset failed: {e}")
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def replace(self, pooled):
+        """Swap the dead browser of a leased slot for a new one; the lease (and its holders) carry on"""
+        with self._cond:
+            if self._closed or pooled.discarded:
+                raise RuntimeError(f"Browser #{pooled.driver_id} was discarded, not replacing it")
+        self._quit(pooled)
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            # The lease has no browser left: free its slot now instead of at release()
+            with self._cond:
+                pooled.discarded = True
+                self._leased.pop(pooled.driver_id, None)
+                self._free_slot(pooled)
+            raise
+        with self._cond:
+            pooled.driver = driver
+            pooled.pages_served = 0
+            pooled.consent_handled = False
+            self.replaced_total += 1
+        print(f"DEBUG: Driver pool replaced the crashed browser of slot #{pooled.driver_id}")
+        return pooled
+
+    @contextmanager
+    def lease(self, job_id=None, timeout=ACQUIRE_TIMEOUT):
+        pooled = self.acquire(job_id=job_id, timeout=timeout)
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def discard_job(self, job_id):
+        """Quit every browser currently leased to a job (used when terminating it)"""
+        with self._cond:
+            targets = [p for p in self._leased.values() if p.job_id == job_id]
+            for pooled in targets:
+                pooled.discarded = True
+        for pooled in targets:
+            self._quit(pooled)
+        return len(targets)
+
+    def status(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'max_pages_per_driver': self.max_pages,
+                'live': self._live,
+                'idle': len(self._idle),
+                'leased': len(self._leased),
+                'created_total': self.created_total,
+                'recycled_total': self.recycled_total,
+                'replaced_total': self.replaced_total,
+                'health_failures': self.health_failures,
+                'leases_total': self.leases_total,
+                'drivers': [p.to_dict() for p in self._leased.values()] + [p.to_dict() for p in self._idle],
+            }
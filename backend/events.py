@@ -0,0 +1,96 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+
+# Events worth sending to clients that are not following one particular job
+GLOBAL_EVENT_TYPES = {'job_state', 'file_created', 'file_renamed', 'files_deleted', 'concurrency_changed'}
+
+
+class EventBus:
+    """Fans job progress events out to the /api/events SSE streams.
+
+    publish() may be called from any worker thread; every subscriber owns an
+    asyncio.Queue that is filled on its event loop via call_soon_threadsafe.
+    The last `history` events are kept so a reconnecting client can resume
+    from its Last-Event-ID.
+    """
+
+    def __init__(self, history=500, queue_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.published_total = 0
+        self.dropped_total = 0
+
+    def publish(self, event_type, job_id=None, **data):
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'type': event_type,
+                'job_id': job_id,
+                'time': time.time(),
+                'data': data,
+            }
+            self._history.append(event)
+            self.published_total += 1
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is gone
+                self.unsubscribe(queue)
+        return event
+
+    def _offer(self, queue, event):
+        if queue.full():
+            # Slow consumer: drop its oldest event rather than block publishers
+            queue.get_nowait()
+            self.dropped_total += 1
+        queue.put_nowait(event)
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber on the running loop; missed events after last_event_id are queued first"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and not queue.full():
+                        queue.put_nowait(event)
+            self._subscribers[queue] = loop
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def status(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published_total': self.published_total,
+                'dropped_total': self.dropped_total,
+            }
+
+
+def wants_event(event, job_id=None):
+    """Stream filter: one job's events (plus global ones), or only global events"""
+    if event['type'] in GLOBAL_EVENT_TYPES and (job_id is None or event['type'] != 'job_state'):
+        return True
+    return job_id is not None and event['job_id'] == job_id
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
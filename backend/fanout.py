@@ -0,0 +1,144 @@
+import threading
+
+
+class SeenSet:
+    """Dedup set shared by every worker scraping the same query"""
+
+    def __init__(self, items=None):
+        self._items = set(items or ())
+        self._lock = threading.Lock()
+
+    def add_new(self, item):
+        """Add item; False if it was already there (atomic check-and-add)"""
+        with self._lock:
+            if item in self._items:
+                return False
+            self._items.add(item)
+            return True
+
+    def discard(self, item):
+        with self._lock:
+            self._items.discard(item)
+
+    def __contains__(self, item):
+        with self._lock:
+            return item in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+class SeenSetView:
+    """One query's view of a job-wide SeenSet.
+
+    `rejected` counts the items turned away because another query of the job
+    had them; items this query added itself (e.g. resumed rows) do not count.
+    """
+
+    def __init__(self, seen):
+        self.seen = seen
+        self.rejected = 0
+        self._mine = set()
+        self._lock = threading.Lock()
+
+    def add_new(self, item):
+        with self._lock:
+            if self.seen.add_new(item):
+                self._mine.add(item)
+                return True
+            if item not in self._mine:
+                self.rejected += 1
+            return False
+
+    def discard(self, item):
+        with self._lock:
+            self._mine.discard(item)
+            self.seen.discard(item)
+
+    def __contains__(self, item):
+        return item in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+
+class PageBuffer:
+    """Stands in for the CSV writer while a page is scraped out of order"""
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        pass
+
+
+class OrderedPageMerger:
+    """Writes finished pages to the query's CSV strictly in page order.
+
+    Pages may complete in any order; a page's rows are written once every
+    earlier page has completed (or was given up on). `on_written(pages, rows)`
+    is told each time the run of pages written without a gap grows.
+    """
+
+    def __init__(self, csv_writer=None, first_page=0, on_written=None):
+        self.csv_writer = csv_writer
+        self.on_written = on_written
+        self.rows = []
+        self._next = first_page
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _write(self, rows):
+        for row in rows:
+            if self.csv_writer is not None:
+                self.csv_writer.writerow(row)
+            self.rows.append(row)
+
+    def complete(self, page, rows):
+        with self._lock:
+            self._pending[page] = rows
+            written = self._next
+            while self._next in self._pending:
+                self._write(self._pending.pop(self._next))
+                self._next += 1
+            if self.csv_writer is not None:
+                self.csv_writer.flush()
+            if self.on_written and self._next > written:
+                # Every page before _next is in the CSV now
+                self.on_written(self._next, self.rows)
+
+    def finish(self):
+        """Write whatever is still waiting behind a gap, in page order"""
+        with self._lock:
+            for page in sorted(self._pending):
+                self._write(self._pending.pop(page))
+            if self.csv_writer is not None:
+                self.csv_writer.flush()
+        return self.rows
+
+
+class PageFanout:
+    """Hands out results page numbers to workers until the end of results is known"""
+
+    def __init__(self, first_page=1, max_pages=100):
+        self._next = first_page
+        self.last_page = max_pages - 1
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Next page number to scrape, or None once past the last page"""
+        with self._lock:
+            if self._next > self.last_page:
+                return None
+            page = self._next
+            self._next += 1
+            return page
+
+    def mark_end(self, page):
+        """`page` is the last page with results"""
+        with self._lock:
+            self.last_page = min(self.last_page, page)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.parse
+from pathlib import Path
+
+
+# Recording mode: when set, every scraped results page and detail panel is saved here
+RECORD_DIR = os.environ.get("SCRAPER_RECORD_DIR", "")
+FIXTURES_DIR = Path(os.environ.get("SCRAPER_FIXTURES_DIR", Path(__file__).parent.parent / 'fixtures'))
+
+_index_lock = threading.Lock()
+
+
+def start_offset(url):
+    """The `start` parameter of a results page URL (0 for the first page)"""
+    try:
+        return int(urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get('start', ['0'])[0])
+    except ValueError:
+        return 0
+
+
+def url_path(url):
+    """Path, query and fragment of a URL, so it can be replayed on another host"""
+    parts = urllib.parse.urlsplit(url)
+    return urllib.parse.urlunsplit(('', '', parts.path, parts.query, parts.fragment))
+
+
+class FixtureStore:
+    """Recorded results pages and detail panel states on disk.
+
+    Layout: <root>/index.json maps directory names to search queries;
+    <root>/<query dir>/page-<start>.json is a results page and
+    <root>/<query dir>/page-<start>/panel-<n>.json the page after clicking
+    its n-th listing. Each file holds {"url": ..., "html": ...}.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def query_dir(self, query):
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', query).strip('_')[:60] or 'query'
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()[:8]
+        return self.root / f"{slug}_{digest}"
+
+    def page_path(self, query, start):
+        return self.query_dir(query) / f"page-{start}.json"
+
+    def panel_path(self, query, start, index):
+        return self.query_dir(query) / f"page-{start}" / f"panel-{index}.json"
+
+    def _write(self, path, url, html):
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'html': html}, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path):
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _register(self, query):
+        index_path = self.root / 'index.json'
+        with _index_lock:
+            os.makedirs(self.root, exist_ok=True)
+            index = self._read_index()
+            name = self.query_dir(query).name
+            if index.get(name) != query:
+                index[name] = query
+                with open(index_path, 'w', encoding='utf-8') as f:
+                    json.dump(index, f, indent=2)
+
+    def _read_index(self):
+        index_path = self.root / 'index.json'
+        if not index_path.exists():
+            return {}
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_page(self, query, start, url, html):
+        self._register(query)
+        self._write(self.page_path(query, start), url, html)
+
+    def save_panel(self, query, start, index, url, html):
+        self._write(self.panel_path(query, start, index), url, html)
+
+    def load_page(self, query, start):
+        return self._read(self.page_path(query, start))
+
+    def load_panel(self, query, start, index):
+        return self._read(self.panel_path(query, start, index))
+
+    def queries(self):
+        """Every recorded search query (the `q` value, location included)"""
+        return sorted(self._read_index().values())
+
+
+class FixtureRecorder:
+    """Saves the pages one query's scrape goes through into a FixtureStore"""
+
+    def __init__(self, store, query):
+        self.store = store
+        self.query = query
+        self.start = 0
+
+    def _snapshot(self, driver):
+        return driver.current_url, driver.execute_script("return document.documentElement.outerHTML")
+
+    def record_page(self, driver):
+        try:
+            url, html = self._snapshot(driver)
+            self.start = start_offset(url)
+            self.store.save_page(self.query, self.start, url, html)
+        except Exception as e:
+            print(f"[WARNING] Could not record results page for '{self.query}': {e}")
+
+    def record_panel(self, driver, index):
+        try:
+            url, html = self._snapshot(driver)
+            self.store.save_panel(self.query, self.start, index, url, html)
+        except Exception as e:
+            print(f"[WARNING] Could not record panel {index} for '{self.query}': {e}")
+
+
+def recorder_for(query):
+    """A FixtureRecorder when recording mode is on, else None"""
+    if not RECORD_DIR:
+        return None
+    return FixtureRecorder(FixtureStore(RECORD_DIR), query)
@@ -0,0 +1,225 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS query_results (
+    query_key TEXT PRIMARY KEY,
+    completed_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    query_index INTEGER NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, query_index)
+);
+"""
+
+
+class JobStore:
+    """Job history and backend state kept in SQLite (WAL mode).
+
+    Every job is one row: the full status dict is stored as JSON next to the
+    columns we query on (status, created_at), so a progress update rewrites a
+    single row instead of the whole history.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- jobs ----------------------------------------------------------------------
+
+    def save_job(self, job):
+        """Insert or update one job (job is the status dict, keyed by its job_id)"""
+        row = (
+            job['job_id'],
+            job.get('status'),
+            job.get('created_at', ''),
+            datetime.now().isoformat(),
+            json.dumps(job),
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at, "
+                "data = excluded.data",
+                row
+            )
+
+    def save_many(self, jobs):
+        """Write several jobs in one transaction"""
+        now = datetime.now().isoformat()
+        rows = [(job['job_id'], job.get('status'), job.get('created_at', ''), now, json.dumps(job)) for job in jobs]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO jobs (job_id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_job(self, job_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            return cursor.rowcount > 0
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_jobs(self):
+        """All jobs as {job_id: status dict}, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT job_id, data FROM jobs ORDER BY created_at").fetchall()
+        jobs = {}
+        for job_id, data in rows:
+            try:
+                jobs[job_id] = json.loads(data)
+            except ValueError as e:
+                print(f"Skipping unreadable job {job_id}: {e}")
+        return jobs
+
+    def jobs_with_status(self, statuses):
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at", tuple(statuses)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def latest_job_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    # --- backend state -------------------------------------------------------------
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def has_state(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM state WHERE key = ?", (key,)).fetchone() is not None
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, json.dumps(value))
+            )
+
+    # --- query results -------------------------------------------------------------
+
+    def get_query_result(self, query_key):
+        """(completed_at, result dict) of the last finished scrape of a query, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT completed_at, data FROM query_results WHERE query_key = ?", (query_key,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def save_query_result(self, query_key, completed_at, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO query_results (query_key, completed_at, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(query_key) DO UPDATE SET completed_at = excluded.completed_at, data = excluded.data",
+                (query_key, completed_at, json.dumps(result))
+            )
+
+    def delete_query_result(self, query_key):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_results WHERE query_key = ?", (query_key,))
+
+    # --- checkpoints -----------------------------------------------------------------
+
+    def save_checkpoint(self, job_id, query_index, checkpoint):
+        """Record how far a running query got (one row per job and query, overwritten per page)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO checkpoints (job_id, query_index, updated_at, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(job_id, query_index) DO UPDATE SET updated_at = excluded.updated_at, data = excluded.data",
+                (job_id, query_index, datetime.now().isoformat(), json.dumps(checkpoint))
+            )
+
+    def get_checkpoints(self, job_id):
+        """{query_index: checkpoint dict} of a job's unfinished queries"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query_index, data FROM checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {query_index: json.loads(data) for query_index, data in rows}
+
+    def delete_checkpoint(self, job_id, query_index):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE job_id = ? AND query_index = ?", (job_id, query_index))
+
+    def delete_checkpoints(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    # --- migration -----------------------------------------------------------------
+
+    def migrate_json(self, jobs_file, state_file):
+        """Import jobs.json and backend_state.json once; the JSON files are left in place"""
+        if self.has_state('json_migrated_at'):
+            return 0
+        imported = 0
+        jobs_file, state_file = Path(jobs_file), Path(state_file)
+        if jobs_file.exists():
+            try:
+                with open(jobs_file, 'r') as f:
+                    jobs = json.load(f)
+                valid = [dict(job, job_id=jid) for jid, job in jobs.items() if isinstance(job, dict)]
+                self.save_many(valid)
+                imported = len(valid)
+            except Exception as e:
+                print(f"Error importing {jobs_file}: {e}")
+        if state_file.exists() and not self.has_state('last_job_id'):
+            try:
+                with open(state_file, 'r') as f:
+                    state = json.load(f)
+                self.set_state('last_job_id', state.get('last_job_id'))
+            except Exception as e:
+                print(f"Error importing {state_file}: {e}")
+        self.set_state('json_migrated_at', datetime.now().isoformat())
+        if imported:
+            print(f"Imported {imported} jobs from {jobs_file} into {self.db_path}")
+        return imported
@@ -0,0 +1,114 @@
+import math
+import threading
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 2),
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'max': round(max(values), 2),
+    }
+
+
+# Derived rates reported in snapshot(): name -> (hit counter, other counters)
+RATES = {
+    'detail_cache_hit_rate': ('detail_cache_hits', ('detail_cache_misses', 'detail_cache_stale')),
+}
+
+
+class ScrapeStats:
+    """Thread-safe counters and samples collected while a job scrapes.
+
+    Counters are plain integers (listings visited, WebDriver commands, ...);
+    samples are numeric observations (per-listing command counts, latencies)
+    reported as count/mean/p50/p95/max in snapshot().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.samples = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def get(self, name, default=0):
+        with self._lock:
+            return self.counters.get(name, default)
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.counters)
+            for name, values in self.samples.items():
+                result[name] = summarize(values)
+            for name, (hits, others) in RATES.items():
+                total = result.get(hits, 0) + sum(result.get(other, 0) for other in others)
+                if total:
+                    result[name] = round(result.get(hits, 0) / total, 3)
+            return result
+
+
+class CommandCounter:
+    """Counts WebDriver commands sent by a driver while the context is active.
+
+    Every Selenium call (including WebElement methods) goes through
+    driver.execute(), so wrapping it on the instance counts real HTTP round trips.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.count = 0
+        self._had_instance_attr = False
+        self._previous = None
+
+    def start(self):
+        self._had_instance_attr = 'execute' in vars(self.driver)
+        self._previous = self.driver.execute
+        previous = self._previous
+
+        def counting_execute(*args, **kwargs):
+            self.count += 1
+            return previous(*args, **kwargs)
+
+        self.driver.execute = counting_execute
+        return self
+
+    def rebind(self, driver):
+        """Keep counting on a replacement driver"""
+        self.stop()
+        self.driver = driver
+        return self.start()
+
+    def stop(self):
+        if self._previous is None:
+            return
+        if self._had_instance_attr:
+            self.driver.execute = self._previous
+        else:
+            del self.driver.execute
+        self._previous = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
@@ -0,0 +1,293 @@
+"""JavaScript snippets executed inside the results page.
+
+Each script does in a single WebDriver round trip what would otherwise take
+dozens of find_element / get_attribute / .text calls. They only collect raw
+strings; all cleanup and validation stays in Python (see scraper.py).
+"""
+
+# Shared helpers prepended to every script
+_HELPERS = r"""
+function norm(t) { return (t || '').split(/\s+/).filter(Boolean).join(' '); }
+function text(el) { return el ? (el.innerText || '').trim() : ''; }
+function attr(el, name) { var v = el ? el.getAttribute(name) : null; return v ? v.trim() : ''; }
+function visible(el) { return !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length)); }
+function docAll(sel) { try { return Array.prototype.slice.call(document.querySelectorAll(sel)); } catch (e) { return []; } }
+function docFirst(sel) { try { return document.querySelector(sel); } catch (e) { return null; } }
+function rootAll(root, sel) {
+    var found = [];
+    if (root) { try { found = Array.prototype.slice.call(root.querySelectorAll(sel)); } catch (e) { found = []; } }
+    return found.length ? found : docAll(sel);
+}
+function rootFirst(root, sel) {
+    var el = null;
+    if (root) { try { el = root.querySelector(sel); } catch (e) { el = null; } }
+    return el || docFirst(sel);
+}
+"""
+
+# Collects every detail panel field candidate. arguments[0] is a config dict
+# built by scraper.build_panel_script_config(); the result mirrors the order
+# in which extract_detail_panel() tries its selectors.
+DETAIL_PANEL_SCRIPT = _HELPERS + r"""
+var cfg = arguments[0];
+var noise = {};
+cfg.noise.forEach(function (v) { noise[v] = true; });
+function isNoise(t) { var n = norm(t).toLowerCase(); return !n || noise[n] === true; }
+
+function panelRoot(el) {
+    if (!el || !el.parentElement) return null;
+    var ancestors = ['div[data-attrid]', 'div[class*="kp-wholepage"]', 'div[class*="xpdopen"]', 'div[role="main"]'];
+    for (var i = 0; i < ancestors.length; i++) {
+        var found = el.parentElement.closest(ancestors[i]);
+        if (found) return found;
+    }
+    return null;
+}
+
+var out = {url: location.href, name: '', rating: null};
+
+// Name: first visible non-noise heading, then any visible heading
+var nameEl = null;
+if (!cfg.keep_name) {
+    for (var i = 0; i < cfg.name_selectors.length && !nameEl; i++) {
+        var el = docFirst(cfg.name_selectors[i]);
+        if (el && visible(el) && !isNoise(text(el))) { nameEl = el; }
+    }
+    if (!nameEl) {
+        var headings = docAll('h1, h2, [role="heading"]');
+        for (var h = 0; h < headings.length; h++) {
+            var t = norm(text(headings[h]));
+            if (visible(headings[h]) && t.length > 2 && !isNoise(t)) { nameEl = headings[h]; break; }
+        }
+    }
+    out.name = text(nameEl);
+}
+var root = panelRoot(nameEl || docFirst('h1.DUwDvf, h2.qrShPb'));
+
+// Rating / reviews raw texts, only needed when the listing card had none
+if (cfg.need_rating) {
+    var ratingNameEl = null;
+    for (var r = 0; r < cfg.rating_name_selectors.length; r++) {
+        var candidate = docFirst(cfg.rating_name_selectors[r]);
+        if (!candidate) continue;
+        ratingNameEl = candidate;
+        var ct = text(candidate);
+        if (ct && ct !== 'N/A') break;
+    }
+    out.rating = {
+        near_name: ratingNameEl && ratingNameEl.parentElement ? text(ratingNameEl.parentElement) : '',
+        y0a0hc: text(docFirst('span.Y0A0hc')),
+        f7nice: text(docFirst('div.F7nice')),
+        separate: cfg.rating_selectors.map(function (sel) { return text(docFirst(sel)); }),
+        review: text(docFirst(cfg.review_selector))
+    };
+}
+
+out.category = cfg.category_selectors.map(function (sel) {
+    return rootAll(root, sel).slice(0, 5).map(function (el) { return text(el) || attr(el, 'aria-label'); });
+});
+
+out.address = cfg.address_selectors.map(function (sel) {
+    var el = rootFirst(root, sel);
+    if (!el) return null;
+    return {inner: text(el.querySelector('span.LrzXr')), aria: attr(el, 'aria-label'), text: text(el)};
+});
+
+out.phone = cfg.phone_selectors.map(function (sel) {
+    return docAll(sel).map(function (el) {
+        var item = {aria: attr(el, 'aria-label'), text: text(el), nested: []};
+        if (!item.aria && !item.text) {
+            item.nested = Array.prototype.slice.call(el.querySelectorAll('span, a')).map(text);
+        }
+        return item;
+    });
+});
+
+out.website = cfg.website_selectors.map(function (sel) {
+    var el = rootFirst(root, sel);
+    if (!el) return null;
+    return {href: el.href || attr(el, 'href'), text: text(el)};
+});
+
+out.price = cfg.price_selectors.map(function (sel) {
+    return docAll(sel).map(function (el) { return text(el) || attr(el, 'aria-label'); });
+});
+
+out.hours = cfg.hours_selectors.map(function (sel) { return text(docFirst(sel)); });
+
+var mapsUrls = [];
+cfg.maps_href_selectors.forEach(function (sel) {
+    rootAll(root, sel).forEach(function (el) { mapsUrls.push(el.href || attr(el, 'href')); });
+});
+cfg.maps_data_url_selectors.forEach(function (sel) {
+    rootAll(root, sel).forEach(function (el) { mapsUrls.push(attr(el, 'data-url')); });
+});
+out.maps_urls = mapsUrls;
+
+return out;
+"""
+
+# Scrolls the listing into view and records which panel is showing before the
+# click, under a per-click token. arguments: [listing element, token, heading selectors, noise]
+ARM_PANEL_SCRIPT = _HELPERS + r"""
+var listing = arguments[0], token = arguments[1], headingSelectors = arguments[2], noise = arguments[3];
+function currentName() {
+    for (var i = 0; i < headingSelectors.length; i++) {
+        var t = norm(text(docFirst(headingSelectors[i])));
+        if (t && noise.indexOf(t.toLowerCase()) === -1) return t;
+    }
+    return '';
+}
+listing.scrollIntoView({block: 'center'});
+if (window.__gpsPanelState) window.__gpsPanelState.stop();
+window.__gpsPanelState = null;
+window.__gpsPanel = {token: token, name: currentName(), href: location.href};
+window.__gpsPanelWaiting = null;
+"""
+
+# Async script: resolves as soon as a MutationObserver sees the panel for the
+# armed token render (heading differs from the armed one, or the URL fragment
+# changed) and the DOM has been quiet for quietMs. The wait runs in slices: a
+# slice that ends first resolves with ready=false and reason 'slice', and the
+# observer plus its quiet/settle clocks stay installed for the next slice with
+# the same token (window.__gpsPanelState). Resolves with ready=false at the hard
+# deadline (remainingMs from now). arguments: [token, sliceMs, remainingMs,
+# quietMs, settleMaxMs, heading selectors, noise, callback]
+PANEL_READY_SCRIPT = _HELPERS + r"""
+var token = arguments[0], sliceMs = arguments[1], remainingMs = arguments[2];
+var quietMs = arguments[3], settleMaxMs = arguments[4], headingSelectors = arguments[5], noise = arguments[6];
+var done = arguments[arguments.length - 1];
+var armed = (window.__gpsPanel && window.__gpsPanel.token === token) ? window.__gpsPanel : {name: '', href: ''};
+var finished = false, timer = null, lastSlice = remainingMs <= sliceMs;
+var sliceEnd = Date.now() + Math.min(sliceMs, remainingMs);
+window.__gpsPanelWaiting = token;
+
+function currentName() {
+    for (var i = 0; i < headingSelectors.length; i++) {
+        var t = norm(text(docFirst(headingSelectors[i])));
+        if (t && noise.indexOf(t.toLowerCase()) === -1) return t;
+    }
+    return '';
+}
+function panelChanged() {
+    var name = currentName();
+    return !!name && (name !== armed.name || location.href !== armed.href);
+}
+
+var state = window.__gpsPanelState;
+if (!state || state.token !== token) {
+    if (state) state.stop();
+    state = window.__gpsPanelState = {token: token, start: Date.now(), nameSeenAt: null, changedAt: null, wake: null};
+    var onChange = function () {
+        if (!panelChanged()) return;
+        state.changedAt = Date.now();
+        if (state.nameSeenAt === null) state.nameSeenAt = state.changedAt;
+        if (state.wake) state.wake();
+    };
+    var observer = new MutationObserver(onChange);
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    window.addEventListener('hashchange', onChange);
+    state.stop = function () { observer.disconnect(); window.removeEventListener('hashchange', onChange); };
+    onChange();
+}
+
+function finish(ready, reason) {
+    if (finished) return;
+    finished = true;
+    clearTimeout(timer);
+    state.wake = null;
+    if (reason !== 'slice') {
+        state.stop();
+        if (window.__gpsPanelState === state) window.__gpsPanelState = null;
+    }
+    var now = Date.now();
+    done({token: token, ready: ready, reason: reason, name: currentName(), elapsed_ms: now - state.start,
+          settle_ms: state.nameSeenAt === null ? null : now - state.nameSeenAt});
+}
+function check() {
+    if (finished) return;
+    if (window.__gpsPanelWaiting !== token) { finish(false, 'superseded'); return; }
+    var now = Date.now(), next = sliceEnd;
+    if (state.nameSeenAt !== null) {
+        if (now - state.nameSeenAt >= settleMaxMs) { finish(true, 'settle-cap'); return; }
+        if (now - state.changedAt < quietMs) next = Math.min(next, state.changedAt + quietMs);
+        else if (panelChanged()) { finish(true, 'quiet'); return; }
+        next = Math.min(next, state.nameSeenAt + settleMaxMs);
+    }
+    if (now >= sliceEnd) {
+        if (lastSlice) finish(panelChanged(), 'deadline'); else finish(false, 'slice');
+        return;
+    }
+    clearTimeout(timer);
+    timer = setTimeout(check, next - now);
+}
+
+state.wake = check;
+check();
+"""
+
+# Whether a results page can be read yet: fully loaded, and showing listings or a
+# "no results" message. arguments: [listing selectors, no-results indicators]
+RESULTS_READY_SCRIPT = _HELPERS + r"""
+var listingSelectors = arguments[0], indicators = arguments[1];
+if (document.readyState !== 'complete') return false;
+for (var i = 0; i < listingSelectors.length; i++) {
+    if (docFirst(listingSelectors[i])) return true;
+}
+var body = text(document.body);
+return indicators.some(function (indicator) { return body.indexOf(indicator) !== -1; });
+"""
+
+# One-shot pagination check after a results page was scraped. arguments:
+# [next link selectors (reliable), other next button selectors, listing selectors]
+PAGINATION_STATE_SCRIPT = _HELPERS + r"""
+var nextSelectors = arguments[0], fallbackSelectors = arguments[1], listingSelectors = arguments[2];
+var nextHref = '';
+for (var i = 0; i < nextSelectors.length && !nextHref; i++) {
+    var el = docFirst(nextSelectors[i]);
+    if (el) nextHref = el.href || attr(el, 'href');
+}
+var fallbackNext = false;
+for (var f = 0; f < fallbackSelectors.length && !fallbackNext; f++) {
+    fallbackNext = !!docFirst(fallbackSelectors[f]);
+}
+var listingCount = 0;
+for (var l = 0; l < listingSelectors.length && !listingCount; l++) {
+    listingCount = docAll(listingSelectors[l]).length;
+}
+return {next_href: nextHref, fallback_next: fallbackNext, listing_count: listingCount};
+"""
+
+# Harvests every listing card of a results page in one call: the first listing
+# selector with any match wins (same rule as the replay server), and each card
+# is tagged with a marker attribute so it can be re-located later without
+# re-finding the whole list. arguments: [listing selectors, marker attribute]
+LISTING_CARDS_SCRIPT = _HELPERS + r"""
+var selectors = arguments[0], marker = arguments[1];
+docAll('[' + marker + ']').forEach(function (el) { el.removeAttribute(marker); });
+var cards = [], selector = '';
+for (var s = 0; s < selectors.length && !cards.length; s++) {
+    var found = docAll(selectors[s]);
+    if (!found.length) continue;
+    selector = selectors[s];
+    for (var i = 0; i < found.length; i++) {
+        var el = found[i];
+        el.setAttribute(marker, String(i));
+        var href = el.href || attr(el, 'href');
+        var cidEl = el.hasAttribute('data-cid') ? el : (el.querySelector('[data-cid]') || el.closest('[data-cid]'));
+        var rlimm = /[#&?]rlimm=(\d+)/.exec(href);
+        cards.push({index: i, href: href, cid: attr(cidEl, 'data-cid'), rlimm: rlimm ? rlimm[1] : '', text: text(el)});
+    }
+}
+return {selector: selector, cards: cards};
+"""
+
+# Finds a harvested card again by its href when its marker attribute is gone
+# (the results list re-rendered). arguments: [listing selector, href]
+FIND_CARD_BY_HREF_SCRIPT = r"""
+var all = document.querySelectorAll(arguments[0]), href = arguments[1];
+for (var i = 0; i < all.length; i++) {
+    if (all[i].href === href || all[i].getAttribute('href') === href) return all[i];
+}
+return null;
+"""
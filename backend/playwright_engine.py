@@ -0,0 +1,781 @@
+import asyncio
+import os
+import threading
+import time
+import traceback
+import urllib.parse
+import uuid
+
+from scraper import (SEARCH_BASE_URL, MAX_RESULT_PAGES, MAX_DRIVER_RECOVERIES,
+                     UI_NOISE_VALUES, NO_RESULTS_INDICATORS, LISTING_SELECTORS, LISTING_MARKER_ATTR,
+                     NEXT_LINK_SELECTORS, NEXT_BUTTON_SELECTORS, PANEL_HEADING_SELECTORS,
+                     PANEL_READY_DEADLINE_MS, PANEL_QUIET_MS, PANEL_SETTLE_MAX_MS, PANEL_WAIT_SLICE_MS,
+                     WAIT_POLL_INTERVAL, redirect_outcome, business_key, is_ui_noise, clean_name_value,
+                     has_core_details, is_valid_maps_url, build_panel_script_config, apply_panel_snapshot,
+                     card_business_key, is_sponsored_card, parse_listing_card, save_business_row,
+                     build_next_page_url, page_step)
+from page_scripts import (DETAIL_PANEL_SCRIPT, ARM_PANEL_SCRIPT, PANEL_READY_SCRIPT, PAGINATION_STATE_SCRIPT,
+                          LISTING_CARDS_SCRIPT, FIND_CARD_BY_HREF_SCRIPT)
+from driver_pool import USER_AGENT, DriverLostError
+from csv_writer import BufferedCSVWriter
+from fanout import SeenSet, PageBuffer, OrderedPageMerger, PageFanout
+from rate_limiter import pace
+from adaptive import report_page
+from circuit_breaker import breaker, BlockedError
+from cancellation import child_token, POLL_SLICE, PAGE_DEADLINE, LISTING_DEADLINE
+
+try:
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    async_playwright = None
+    PlaywrightTimeoutError = None
+
+AVAILABLE = async_playwright is not None
+MISSING_MESSAGE = "The playwright engine needs `pip install playwright` and `playwright install chromium`"
+
+# Browser settings (overridable through the environment); headed by default like the Selenium browsers
+HEADLESS = os.environ.get("SCRAPER_PLAYWRIGHT_HEADLESS", "0") in ("1", "true", "yes")
+NAVIGATION_TIMEOUT_MS = 8000  # Same page load timeout as the Selenium browsers
+ACTION_TIMEOUT_MS = 5000
+HARVEST_TIMEOUT = 5  # Seconds to wait for a results page's listing cards to render
+# Navigations return at DOMContentLoaded; the listing harvest waits for the cards itself
+WAIT_UNTIL = "domcontentloaded"
+
+CHROMIUM_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-search-engine-choice-screen",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--no-first-run",
+]
+HIDE_WEBDRIVER_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+# The consent buttons of scraper.CONSENT_BUTTON_LOCATORS as Playwright selectors
+CONSENT_SELECTORS = [
+    "button:has-text('Accept all')",
+    "button:has-text('Reject all')",
+    "button:has-text('I agree')",
+    "#L2AGLb",
+]
+
+# page.evaluate() takes a function while the page scripts are WebDriver-style bodies
+# that read `arguments` and `return`; async ones get their callback as the last argument
+_RUN_SCRIPT = "([source, args]) => new Function(source).apply(null, args)"
+_RUN_ASYNC_SCRIPT = "([source, args]) => new Promise(done => new Function(source).apply(null, args.concat([done])))"
+
+
+class PlaywrightEngine:
+    """One Chromium process driven from one asyncio event loop on a background thread.
+
+    Every query runs as a coroutine on that loop inside its own browser
+    context (its own cookies and tabs), so N queries in flight cost N
+    contexts instead of N browser processes. Callers stay synchronous: run()
+    hands a coroutine to the loop and blocks the calling worker thread until
+    it is done. The browser is started on first use and again if it dies.
+    """
+
+    def __init__(self, headless=HEADLESS):
+        self.headless = headless
+        self.contexts_opened = 0
+        self.browser_launches = 0
+        self._loop = None
+        self._playwright = None
+        self._browser = None
+        self._launching = None
+        self._storage_state = None
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="playwright-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """Run `coro` on the engine's loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _browser_ready(self):
+        if self._launching is None:
+            self._launching = asyncio.Lock()
+        async with self._launching:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                print(f"DEBUG: Launching Chromium for the playwright engine (headless={self.headless})")
+                self._browser = await self._playwright.chromium.launch(headless=self.headless, args=CHROMIUM_ARGS)
+                self.browser_launches += 1
+        return self._browser
+
+    async def new_context(self, job_id=None):
+        """A fresh browser context for one query, with the consent cookies once they are known"""
+        browser = await self._browser_ready()
+        context = await browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={'width': 1920, 'height': 1080},
+            ignore_https_errors=True,
+            bypass_csp=True,  # The page scripts run through new Function()
+            storage_state=self._storage_state
+        )
+        context.set_default_timeout(ACTION_TIMEOUT_MS)
+        context.set_default_navigation_timeout(NAVIGATION_TIMEOUT_MS)
+        await context.add_init_script(HIDE_WEBDRIVER_SCRIPT)
+        with self._lock:
+            self._contexts.setdefault(job_id, set()).add(context)
+            self.contexts_opened += 1
+        return context
+
+    async def close_context(self, context, job_id=None):
+        with self._lock:
+            contexts = self._contexts.get(job_id)
+            if contexts is not None:
+                contexts.discard(context)
+                if not contexts:
+                    del self._contexts[job_id]
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def handle_consent(self, tab, termination_flag=None):
+        """Click through the consent dialog; False if the job was terminated meanwhile.
+
+        The cookies are kept afterwards and every later context starts with
+        them, so consent only needs handling once per engine.
+        """
+        if self._storage_state is not None:
+            return True
+        print(f"DEBUG: Checking for consent/popups...")
+        for selector in CONSENT_SELECTORS:
+            if termination_flag and termination_flag():
+                return False
+            try:
+                button = await tab.query_selector(selector)
+                if button and await button.is_visible():
+                    await button.click()
+                    print(f"DEBUG: Clicked consent button: {selector}")
+                    if await cancellable_sleep(1, termination_flag):
+                        return False
+                    break
+            except Exception:
+                continue
+        try:
+            self._storage_state = await tab.context.storage_state()
+        except Exception as e:
+            print(f"DEBUG: Could not keep the consent cookies: {e}")
+        return True
+
+    def close_job(self, job_id):
+        """Close every context a job still has open (its tabs fail and its queries stop); returns how many"""
+        loop = self._loop
+        with self._lock:
+            contexts = list(self._contexts.get(job_id, ()))
+        if loop is None or not contexts:
+            return 0
+
+        async def close():
+            for context in contexts:
+                await self.close_context(context, job_id)
+
+        try:
+            asyncio.run_coroutine_threadsafe(close(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"[WARNING] Could not close browser contexts of job {job_id}: {e}")
+        return len(contexts)
+
+    def shutdown(self):
+        """Close the browser and stop the loop; the next run() starts over"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            contexts = [context for job_contexts in self._contexts.values() for context in job_contexts]
+            self._contexts = {}
+        if loop is None:
+            return
+
+        async def stop():
+            for context in contexts:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if self._browser is not None:
+                await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(stop(), loop).result(timeout=30)
+        except Exception as e:
+            print(f"[WARNING] Playwright engine did not shut down cleanly: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._browser = None
+        self._playwright = None
+        self._launching = None
+
+    def status(self):
+        with self._lock:
+            open_contexts = sum(len(contexts) for contexts in self._contexts.values())
+            jobs = [job_id for job_id in self._contexts if job_id]
+        browser = self._browser
+        return {
+            'available': AVAILABLE,
+            'running': bool(browser is not None and browser.is_connected()),
+            'headless': self.headless,
+            'browser_launches': self.browser_launches,
+            'open_contexts': open_contexts,
+            'contexts_opened': self.contexts_opened,
+            'jobs': jobs,
+            'consent_cookies': self._storage_state is not None,
+        }
+
+
+# Shared by every job in the process
+engine = PlaywrightEngine()
+
+
+async def run_script(tab, script, *args):
+    return await tab.evaluate(_RUN_SCRIPT, [script, list(args)])
+
+
+async def run_async_script(tab, script, *args):
+    return await tab.evaluate(_RUN_ASYNC_SCRIPT, [script, list(args)])
+
+
+async def cancellable_sleep(seconds, cancelled=None):
+    """asyncio.sleep() that returns early (True) once `cancelled` fires"""
+    end = time.monotonic() + seconds
+    while True:
+        if cancelled is not None and cancelled():
+            return True
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(remaining, POLL_SLICE))
+
+
+async def pace_async(tab, action='click', termination_flag=None, stats=None):
+    """rate_limiter.pace() off the loop, so a throttled tab does not hold up the others"""
+    return await asyncio.to_thread(pace, tab, action, termination_flag, stats)
+
+
+async def load_page(tab, url, stats=None, metric=None, termination_flag=None):
+    """tab.goto() with the same breaker and adaptive controller reporting as scraper.load_page()"""
+    # Tabs share the loop thread, so each one is its own breaker probe
+    if not await asyncio.to_thread(breaker.wait_until_clear, termination_flag, id(tab)):
+        return 'terminated'
+    started = time.time()
+    try:
+        await tab.goto(url, wait_until=WAIT_UNTIL)
+    except PlaywrightTimeoutError:
+        report_page('timeout')
+        raise
+    except Exception:
+        report_page('error')
+        raise
+    latency_ms = round((time.time() - started) * 1000, 1)
+    if stats is not None and metric:
+        stats.observe(metric, latency_ms)
+    outcome = redirect_outcome(tab.url)
+    report_page(outcome, latency_ms)
+    if outcome == 'blocked':
+        if stats is not None:
+            stats.incr('blocked_pages')
+        breaker.trip(f"block page at {tab.url[:120]}")
+    elif outcome == 'ok':
+        breaker.record_success(id(tab))
+    return outcome
+
+
+async def read_pagination_state(tab):
+    try:
+        return await run_script(
+            tab, PAGINATION_STATE_SCRIPT, NEXT_LINK_SELECTORS, NEXT_BUTTON_SELECTORS[len(NEXT_LINK_SELECTORS):],
+            LISTING_SELECTORS
+        ) or {}
+    except Exception as e:
+        print(f"DEBUG: Pagination check failed: {e}")
+        return {}
+
+
+async def harvest_listing_cards(tab, termination_flag=None, timeout=HARVEST_TIMEOUT):
+    """(selector, cards) once the page's listing cards have rendered, or None (see scraper.harvest_listing_cards)"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = await run_script(tab, LISTING_CARDS_SCRIPT, LISTING_SELECTORS, LISTING_MARKER_ATTR) or {}
+        except Exception as e:
+            print(f"DEBUG: Listing harvest failed: {e}")
+            result = {}
+        if result.get('cards'):
+            return result.get('selector'), result['cards']
+        if time.monotonic() >= deadline or await cancellable_sleep(WAIT_POLL_INTERVAL, termination_flag):
+            return None
+
+
+async def locate_listing(tab, card, selector):
+    """A fresh element handle for a harvested card: by its marker, else by its href"""
+    try:
+        listing = await tab.query_selector(f'[{LISTING_MARKER_ATTR}="{card["index"]}"]')
+        if listing is not None:
+            return listing
+    except Exception as e:
+        print(f"DEBUG: Marker lookup failed for listing {card['index'] + 1}: {e}")
+    if card.get('href'):
+        try:
+            handle = await tab.evaluate_handle(_RUN_SCRIPT, [FIND_CARD_BY_HREF_SCRIPT, [selector, card['href']]])
+            return handle.as_element()
+        except Exception as e:
+            print(f"DEBUG: href lookup failed for listing {card['index'] + 1}: {e}")
+    return None
+
+
+async def wait_for_panel_ready(tab, token, deadline_ms=PANEL_READY_DEADLINE_MS, termination_flag=None):
+    """Await the in-page MutationObserver for the panel armed with `token` (see scraper.wait_for_panel_ready)"""
+    started = time.time()
+    slice_ms = PANEL_WAIT_SLICE_MS if termination_flag is not None else deadline_ms
+    while True:
+        elapsed_ms = (time.time() - started) * 1000
+        if termination_flag is not None and termination_flag():
+            return {'ready': False, 'reason': 'cancelled', 'elapsed_ms': round(elapsed_ms)}
+        remaining_ms = max(1, deadline_ms - elapsed_ms)
+        try:
+            result = await run_async_script(
+                tab, PANEL_READY_SCRIPT, token, slice_ms, remaining_ms, PANEL_QUIET_MS, PANEL_SETTLE_MAX_MS,
+                PANEL_HEADING_SELECTORS, sorted(UI_NOISE_VALUES)
+            )
+        except Exception as e:
+            print(f"DEBUG: Panel readiness script failed: {e}")
+            return {'ready': False, 'reason': 'script-error'}
+        if not result or result.get('token') != token:
+            return {'ready': False, 'reason': 'stale-token'}
+        if result.get('reason') != 'slice':
+            result['elapsed_ms'] = round((time.time() - started) * 1000)
+            return result
+
+
+async def extract_detail_panel(tab, listing_data=None):
+    """The detail panel row from one DETAIL_PANEL_SCRIPT call, or None if the script failed"""
+    listing_data = listing_data or {}
+    keep_name = not is_ui_noise(clean_name_value(listing_data.get('name', '')))
+    need_rating = listing_data.get('rating', "N/A") == "N/A" or listing_data.get('total_reviews', "N/A") == "N/A"
+    try:
+        snapshot = await run_script(tab, DETAIL_PANEL_SCRIPT, build_panel_script_config(keep_name, need_rating))
+    except Exception as e:
+        print(f"[ERROR] Detail panel script failed: {e}")
+        return None
+    if not snapshot:
+        return None
+    return apply_panel_snapshot(snapshot, listing_data)
+
+
+class QueryScrape:
+    """One query on the Playwright engine: its tabs, dedup sets and counters.
+
+    Result pages are handed out by a PageFanout to `page_workers` tabs of the
+    query's context, which work on them concurrently on the engine's loop;
+    rows go through an OrderedPageMerger so the CSV stays in page order.
+    """
+
+    def __init__(self, context, location, fieldnames, termination_flag, stats, event_callback, seen_maps_urls,
+                 seen_businesses, business_index, known_business_mode, detail_cache, detail_cache_ttl, total_rows=0):
+        self.context = context
+        self.location = location
+        self.fieldnames = fieldnames
+        self.termination_flag = termination_flag
+        self.stats = stats
+        self.event_callback = event_callback
+        self.seen_maps_urls = seen_maps_urls
+        self.seen_businesses = seen_businesses
+        self.business_index = business_index
+        self.known_business_mode = known_business_mode
+        self.detail_cache = detail_cache
+        self.detail_cache_ttl = detail_cache_ttl
+        self.total_rows = total_rows
+        self.pages_scraped = 0
+        self.blocked = {}  # Block page URL by page; those pages stay a gap in the merger
+        self._crashed = set()
+
+    def cancelled(self):
+        return bool(self.termination_flag and self.termination_flag())
+
+    def incr(self, name):
+        if self.stats is not None:
+            self.stats.incr(name)
+
+    async def open_tab(self):
+        tab = await self.context.new_page()
+        tab.on("crash", lambda crashed: self._crashed.add(crashed))
+        return tab
+
+    def tab_lost(self, tab):
+        return tab.is_closed() or tab in self._crashed
+
+    def add_row(self, row, buffer, page):
+        save_business_row(row, self.fieldnames, buffer, "")
+        self.total_rows += 1
+        if self.event_callback:
+            self.event_callback('row_scraped', page=page + 1, name=row.get('name', 'N/A'), total_rows=self.total_rows)
+
+    async def scrape_pages(self, first_tab, merger, page_workers=1, first_page=0, max_pages=MAX_RESULT_PAGES):
+        """Scrape result pages from `first_page` on; `first_tab` shows the first results page.
+
+        A block page ends the fan-out at the page before it (see self.blocked).
+        """
+        first_url = first_tab.url
+        state = await read_pagination_state(first_tab)
+        step = page_step(state, first_url)
+        fanout = PageFanout(first_page=first_page, max_pages=max_pages)
+        if not state.get('next_href'):
+            # Later pages are opened by URL, so without a next link the first page is the only one
+            fanout.mark_end(0)
+            page_workers = 1
+        buffers = {}
+
+        async def worker(tab, showing=None):
+            recoveries = 0
+            retry = None
+            while not self.cancelled():
+                page, start_index = retry or (fanout.claim(), 0)
+                retry = None
+                if page is None:
+                    return
+                rows = None
+                try:
+                    if page != showing:
+                        url = build_next_page_url(first_url, page * step)
+                        print(f"DEBUG: Opening page {page + 1} directly: {url}")
+                        if not await pace_async(tab, 'navigate', self.termination_flag, self.stats):
+                            return
+                        if await load_page(tab, url, self.stats, 'next_page_ms', self.termination_flag) == 'blocked':
+                            self.blocked[page] = tab.url
+                            fanout.mark_end(page - 1)
+                            continue
+                        page_state = await read_pagination_state(tab)
+                        if not page_state.get('listing_count') and not page_state.get('next_href'):
+                            print(f"✓ Page {page + 1} is past the end of results")
+                            fanout.mark_end(page - 1)
+                            continue
+                        if not page_state.get('next_href'):
+                            fanout.mark_end(page)
+                    showing = None
+
+                    print(f"\n📄 SCRAPING PAGE {page + 1} (playwright)")
+                    rows = await self.scrape_page(tab, page, buffers, start_index)
+                    print(f"\n✅ Scraped {len(rows)} new businesses from page {page + 1}")
+                    if self.event_callback:
+                        self.event_callback('page_advanced', page=page + 1, total_rows=self.total_rows)
+                except Exception as e:
+                    print(f"[ERROR] Page {page + 1} failed: {e}")
+                    if not self.cancelled() and self.tab_lost(tab) and recoveries < MAX_DRIVER_RECOVERIES:
+                        # A crashed tab is replaced by a new one in the same context, resuming at the same listing
+                        try:
+                            tab = await self.open_tab()
+                            recoveries += 1
+                            self.incr('driver_recoveries')
+                            retry = (page, getattr(e, 'listing_index', start_index))
+                        except Exception as open_error:
+                            print(f"[ERROR] Could not replace crashed tab: {open_error}")
+                finally:
+                    if retry is None and page not in self.blocked:
+                        # Writes the CSV and the checkpoint: off the loop, which every query shares
+                        await asyncio.to_thread(merger.complete, page,
+                                                rows if rows is not None else buffers.pop(page, PageBuffer()).rows)
+
+        tabs = [first_tab]
+        for _ in range(page_workers - 1):
+            try:
+                tabs.append(await self.open_tab())
+            except Exception as e:
+                print(f"[WARNING] Could not open an extra tab for page fan-out: {e}")
+                break
+        if len(tabs) > 1:
+            print(f"DEBUG: Fanning out pages across {len(tabs)} tabs (start step {step})")
+        await asyncio.gather(*(worker(tab, 0 if tab is first_tab and first_page == 0 else None) for tab in tabs))
+        return self.pages_scraped
+
+    async def scrape_page(self, tab, page, buffers, start_index=0):
+        buffer = buffers.setdefault(page, PageBuffer())
+        # The page deadline ends this page only; the query goes on with the next one
+        page_flag = child_token(self.termination_flag, PAGE_DEADLINE)
+        await self.scrape_listings(tab, page, page_flag, buffer, start_index)
+        if self.stats is not None and page_flag is not self.termination_flag and page_flag.reason == 'deadline':
+            self.stats.incr('page_deadlines')
+        self.pages_scraped += 1
+        return buffers.pop(page).rows
+
+    async def scrape_listings(self, tab, page, page_flag, buffer, start_index=0):
+        """Click and extract every listing of the results page `tab` shows (see scraper.scrape_current_page).
+
+        Always the script extractor with the observer panel wait. Listings
+        before `start_index` are left out; a tab that crashes mid-page raises
+        DriverLostError with the listing to resume at.
+        """
+        outcome = redirect_outcome(tab.url)
+        if outcome in ('blocked', 'redirect'):
+            print(f"[ERROR] Detected invalid page during scraping: {tab.url}")
+            if outcome == 'blocked':
+                breaker.trip(f"block page at {tab.url[:120]}")
+            return
+
+        harvest = await harvest_listing_cards(tab, page_flag)
+        if not harvest:
+            print("[WARNING] DEBUG: No clickable listings found on this page")
+            report_page('no_listings' if page == 0 else 'empty')
+            return
+        selector, cards = harvest
+        print(f"Found {len(cards)} listings using: {selector}")
+
+        def stopped():
+            return bool(page_flag and page_flag())
+
+        for i, card in enumerate(cards[start_index:], start=start_index):
+            card_key = ''
+            listing_flag = child_token(page_flag, LISTING_DEADLINE)
+            if stopped():
+                print(f"[TERMINATION] Terminating during scraping of listing {i+1}")
+                return
+            try:
+                if is_sponsored_card(card):
+                    print(f"DEBUG: Skipping sponsored listing {i+1}")
+                    self.incr('skipped_sponsored')
+                    continue
+                card_key = card_business_key(card)
+                if card_key and self.seen_businesses is not None and not self.seen_businesses.add_new(card_key):
+                    print(f"DEBUG: Skipping listing {i+1}, business {card_key} was already scraped in this job")
+                    self.incr('skipped_duplicates')
+                    continue
+                known = None
+                if card_key and self.business_index is not None and self.known_business_mode != "off":
+                    known = await asyncio.to_thread(self.business_index.get, card_key)
+                if known is not None:
+                    if self.known_business_mode == "skip":
+                        print(f"DEBUG: Skipping listing {i+1}, business {card_key} is already in the index")
+                        self.incr('skipped_known')
+                        continue
+                    known['search_location'] = self.location or "N/A"
+                    self.add_row(known, buffer, page)
+                    self.incr('referenced_known')
+                    continue
+                if card_key and self.detail_cache is not None and self.detail_cache_ttl != 0:
+                    cached, cache_outcome = await asyncio.to_thread(self.detail_cache.lookup, card_key, self.detail_cache_ttl)
+                    self.incr({'hit': 'detail_cache_hits', 'stale': 'detail_cache_stale'}.get(cache_outcome, 'detail_cache_misses'))
+                    if cached is not None:
+                        cached['search_location'] = self.location or "N/A"
+                        self.add_row(cached, buffer, page)
+                        continue
+
+                listing_data = parse_listing_card(card)
+                listing = await locate_listing(tab, card, selector)
+                if listing is None:
+                    print(f"[WARNING] Listing {i+1} is no longer on the page, skipping")
+                    self.incr('listings_lost')
+                    continue
+
+                click_token = uuid.uuid4().hex
+                await run_script(tab, ARM_PANEL_SCRIPT, listing, click_token, PANEL_HEADING_SELECTORS, sorted(UI_NOISE_VALUES))
+                if not await pace_async(tab, 'click', listing_flag, self.stats) or stopped():
+                    print(f"[TERMINATION] Terminating before clicking listing {i+1}")
+                    return
+
+                clicked_at = time.time()
+                try:
+                    await listing.click()
+                except Exception:
+                    try:
+                        await listing.evaluate("el => el.click()")
+                    except Exception as click_error:
+                        print(f"DEBUG: Click failed for listing {i+1}, error: {click_error}")
+
+                readiness = await wait_for_panel_ready(tab, click_token, termination_flag=listing_flag)
+                print(f"DEBUG: Panel readiness for listing {i+1}: {readiness.get('reason')} after {readiness.get('elapsed_ms')} ms")
+                if not readiness.get('ready'):
+                    self.incr('panel_ready_timeouts')
+                if stopped():
+                    print(f"[TERMINATION] Terminating during wait for panel load")
+                    return
+                panel_wait_ms = (time.time() - clicked_at) * 1000
+
+                extract_started = time.time()
+                business_data = await extract_detail_panel(tab, listing_data)
+                if self.stats is not None:
+                    self.stats.incr('listings_visited')
+                    self.stats.observe('panel_wait_ms', round(panel_wait_ms, 1))
+                    self.stats.observe('extract_ms', round((time.time() - extract_started) * 1000, 1))
+                    self.stats.observe('listing_latency_ms', round((time.time() - clicked_at) * 1000, 1))
+
+                if not business_data or business_data.get('name') == "N/A":
+                    print("[WARNING] Could not extract data for this item")
+                    continue
+                business_data['search_location'] = self.location or "N/A"
+                maps_url = business_data.get('google_maps_url', '').strip()
+                if self.seen_maps_urls is not None and is_valid_maps_url(maps_url):
+                    if not self.seen_maps_urls.add_new(maps_url):
+                        print(f"[WARNING] Duplicate google_maps_url detected, skipping: {maps_url}")
+                        self.incr('duplicates_after_click')
+                        continue
+                panel_key = '' if card_key else business_key(maps_url)
+                if panel_key and self.seen_businesses is not None and not self.seen_businesses.add_new(panel_key):
+                    print(f"[WARNING] Business {panel_key} was already scraped in this job, skipping")
+                    self.incr('duplicates_after_click')
+                    continue
+                if not has_core_details(business_data):
+                    print("[WARNING] Skipping item with missing core details (address/category)")
+                    continue
+
+                self.add_row(business_data, buffer, page)
+                stored_key = card_key or business_key(maps_url)
+                stored_row = {field: business_data[field] for field in self.fieldnames}
+                if self.business_index is not None:
+                    await asyncio.to_thread(self.business_index.add, stored_key, stored_row)
+                if self.detail_cache is not None:
+                    await asyncio.to_thread(self.detail_cache.put, stored_key, stored_row)
+                print(f"[INFO] Scraped: {business_data.get('name', 'N/A')}")
+                print(f"   Rating: {business_data.get('rating', 'N/A')} - Reviews: {business_data.get('total_reviews', 'N/A')}")
+                print(f"   Category: {business_data.get('category', 'N/A')}")
+                print(f"   Address: {business_data.get('address', 'N/A')}")
+                print("-" * 80)
+
+            except Exception as e:
+                print(f"[ERROR] Error on listing {i+1}: {e}")
+                if not stopped() and self.tab_lost(tab):
+                    # Every further listing would fail too: hand this one back so it is retried on a new tab
+                    if card_key and self.seen_businesses is not None:
+                        self.seen_businesses.discard(card_key)
+                    raise DriverLostError(i, e)
+                continue
+
+
+async def scrape_query(search_query, location="", csv_filepath="", fieldnames=None, termination_flag=None,
+                       job_id=None, stats=None, event_callback=None, page_workers=1, seen_businesses=None,
+                       business_index=None, known_business_mode="off", detail_cache=None, detail_cache_ttl=None,
+                       resume=None, on_checkpoint=None):
+    """Coroutine behind scrape_google_search(); runs on the engine's loop"""
+    context = None
+    csv_writer = None
+    merger = None
+    resumed_rows = []
+    try:
+        if termination_flag and termination_flag():
+            print(f"[TERMINATION] Job terminated before starting for query: {search_query}")
+            return []
+
+        if fieldnames is None:
+            fieldnames = ['name', 'rating', 'total_reviews', 'category', 'address',
+                          'phone', 'website', 'price_range', 'hours_status', 'google_maps_url', 'search_location']
+        query = f"{search_query} in {location}" if location else search_query
+        search_url = f"{SEARCH_BASE_URL}/search?q={urllib.parse.quote_plus(query)}&udm=1"
+        print(f"\n🔍 Searching: {query} (playwright)")
+        print(f"🌐 URL: {search_url}")
+
+        context = await engine.new_context(job_id)
+        scrape = QueryScrape(context, location, fieldnames, termination_flag, stats, event_callback, SeenSet(),
+                             seen_businesses if seen_businesses is not None else SeenSet(), business_index,
+                             known_business_mode, detail_cache, detail_cache_ttl)
+        tab = await scrape.open_tab()
+
+        if not await pace_async(tab, 'navigate', termination_flag, stats) or scrape.cancelled():
+            print(f"[TERMINATION] Job terminated before navigation for query: {search_query}")
+            return []
+        if await load_page(tab, search_url, stats, 'page_load_ms', termination_flag) == 'blocked':
+            # Nothing scraped yet: let the caller retry the query once the breaker lets it
+            raise BlockedError(tab.url)
+        if redirect_outcome(tab.url) == 'redirect':
+            print(f"[ERROR] Redirected to invalid page: {tab.url}")
+            return []
+        try:
+            page_text = await tab.inner_text('body')
+            if any(indicator in page_text for indicator in NO_RESULTS_INDICATORS):
+                print(f"[WARNING] No results found for query: {query}")
+                report_page('empty')
+                return []
+        except Exception:
+            pass
+        if not await engine.handle_consent(tab, termination_flag):
+            print(f"[TERMINATION] Job terminated during consent for query: {search_query}")
+            return []
+
+        resumed_pages = 0
+        if resume:
+            resumed_pages = resume['page']
+            resumed_rows = list(resume['rows'])
+            scrape.seen_maps_urls = SeenSet(row['google_maps_url'] for row in resumed_rows if row.get('google_maps_url'))
+            for row in resumed_rows:
+                scrape.seen_businesses.add_new(business_key(row.get('google_maps_url')))
+            scrape.total_rows = len(resumed_rows)
+            print(f"DEBUG: Resuming after page {resumed_pages} with {len(resumed_rows)} rows already in the CSV")
+            if resumed_pages >= MAX_RESULT_PAGES:
+                return resumed_rows
+        if csv_filepath:
+            csv_writer = await asyncio.to_thread(BufferedCSVWriter, csv_filepath, fieldnames)
+
+        # Runs in merger.complete(), which is called off the loop
+        def on_pages_written(pages, rows):
+            if on_checkpoint and csv_writer and not scrape.cancelled():
+                on_checkpoint(pages, len(resumed_rows) + len(rows), csv_writer.checkpoint())
+
+        merger = OrderedPageMerger(csv_writer, first_page=resumed_pages, on_written=on_pages_written)
+        pages = await scrape.scrape_pages(tab, merger, page_workers=page_workers, first_page=resumed_pages)
+        all_businesses = resumed_rows + await asyncio.to_thread(merger.finish)
+        if scrape.blocked:
+            # Let the caller resume after the last checkpointed page once the breaker lets it
+            raise BlockedError(scrape.blocked[min(scrape.blocked)], rows=all_businesses)
+
+        print("\n" + "=" * 80)
+        print(f"✅ Scraping completed!")
+        print(f"📊 Total businesses scraped: {len(all_businesses)}")
+        print(f"📄 Total pages scraped: {resumed_pages + pages}")
+        print("=" * 80)
+        return all_businesses
+
+    except BlockedError:
+        raise
+    except Exception as e:
+        print(f"[ERROR] ERROR in playwright scrape_query: {e}")
+        traceback.print_exc()
+        # Rows of finished pages are in the CSV already
+        return resumed_rows + (await asyncio.to_thread(merger.finish) if merger is not None else [])
+    finally:
+        if csv_writer:
+            try:
+                await asyncio.to_thread(csv_writer.close)
+                if stats is not None:
+                    writer_stats = csv_writer.stats()
+                    stats.incr('csv_flushes', writer_stats['flushes'])
+                    stats.incr('csv_write_syscalls', writer_stats['write_syscalls'])
+            except Exception as e:
+                print(f"[ERROR] Failed to close CSV writer for {csv_filepath}: {e}")
+        if context is not None:
+            await engine.close_context(context, job_id)
+
+
+def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=None, termination_flag=None, job_id=None,
+                         driver_pool=None, extraction_mode="script", stats=None, panel_wait_mode="observer",
+                         event_callback=None, pagination_mode="url", page_workers=1, seen_businesses=None,
+                         business_index=None, known_business_mode="off", detail_cache=None, detail_cache_ttl=None,
+                         resume=None, on_checkpoint=None):
+    """scraper.scrape_google_search() on the shared Playwright engine.
+
+    Same arguments, return value, CSV output, checkpoints and BlockedError.
+    The calling thread only waits; the query runs as a coroutine in its own
+    browser context, and page_workers > 1 fans its pages out across that
+    many tabs (no pool capacity needed). driver_pool, extraction_mode,
+    panel_wait_mode and pagination_mode are Selenium options: this engine
+    always uses the script extractor, the observer panel wait and URL
+    pagination, and ends a query at the first page without a next link.
+    """
+    if not AVAILABLE:
+        raise RuntimeError(MISSING_MESSAGE)
+    return engine.run(scrape_query(
+        search_query, location=location, csv_filepath=csv_filepath, fieldnames=fieldnames,
+        termination_flag=termination_flag, job_id=job_id, stats=stats, event_callback=event_callback,
+        page_workers=page_workers, seen_businesses=seen_businesses, business_index=business_index,
+        known_business_mode=known_business_mode, detail_cache=detail_cache, detail_cache_ttl=detail_cache_ttl,
+        resume=resume, on_checkpoint=on_checkpoint
+    ))
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# How long a finished query's CSV answers repeats of that query (seconds)
+QUERY_CACHE_TTL = int(os.environ.get("SCRAPER_QUERY_CACHE_TTL", "3600"))
+FLIGHT_POLL_INTERVAL = 0.1
+
+
+def canonical_query_key(query, location=""):
+    """The search the scraper will actually run, case- and whitespace-normalized"""
+    search = f"{query} in {location}" if location else query
+    return " ".join((search or "").lower().split())
+
+
+class QueryFlight:
+    """One in-progress scrape of a query that later requesters can wait on"""
+
+    def __init__(self, key):
+        self.key = key
+        self.result = None
+        self.done = threading.Event()
+
+
+class QueryResultCache:
+    """Answers repeated queries from the CSV of a recent scrape, and coalesces
+    identical queries that are running at the same time.
+
+    begin() either returns a fresh cached result, waits for an identical
+    query already in flight and returns its result, or makes the caller the
+    one that scrapes (returning a QueryFlight to finish()/release()). Results
+    are kept in the job store, so they survive a restart.
+    """
+
+    def __init__(self, store, output_dir, ttl=QUERY_CACHE_TTL):
+        self.store = store
+        self.output_dir = Path(output_dir)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _fresh(self, key):
+        found = self.store.get_query_result(key)
+        if found is None:
+            return None
+        completed_at, result = found
+        if time.time() - completed_at > self.ttl or not (self.output_dir / result['csv_file']).exists():
+            self.store.delete_query_result(key)
+            return None
+        return result
+
+    def begin(self, key, cancelled=None):
+        """(cached result, None) or (None, QueryFlight owned by the caller); (None, None) if cancelled"""
+        while True:
+            with self._lock:
+                result = self._fresh(key)
+                if result is not None:
+                    return result, None
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    flight = QueryFlight(key)
+                    self._in_flight[key] = flight
+                    return None, flight
+
+            print(f"DEBUG: Query '{key}' is already being scraped, waiting for it")
+            while not flight.done.wait(FLIGHT_POLL_INTERVAL):
+                if cancelled and cancelled():
+                    return None, None
+            if flight.result is not None:
+                return flight.result, None
+            # The other scrape failed or was cut short; try again (possibly as the scraper)
+
+    def finish(self, flight, result):
+        """Publish a completed scrape to waiting requesters and the cache"""
+        flight.result = result
+        try:
+            self.store.save_query_result(flight.key, time.time(), result)
+        except Exception as e:
+            print(f"[WARNING] Could not cache result of query '{flight.key}': {e}")
+
+    def release(self, flight):
+        """Always called by the flight's owner once its scrape is over"""
+        with self._lock:
+            if self._in_flight.get(flight.key) is flight:
+                del self._in_flight[flight.key]
+        flight.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return sorted(self._in_flight)
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import weakref
+
+from cancellation import interruptible_sleep
+
+
+# Request budget (overridable through the environment). One token is one click;
+# a navigation (driver.get or a pagination click) costs NAVIGATION_COST tokens.
+GLOBAL_RATE = float(os.environ.get("SCRAPER_RATE_GLOBAL", "4"))  # tokens/s across every browser
+GLOBAL_BURST = float(os.environ.get("SCRAPER_RATE_GLOBAL_BURST", "8"))
+WORKER_RATE = float(os.environ.get("SCRAPER_RATE_WORKER", "1.5"))  # tokens/s for one browser
+WORKER_BURST = float(os.environ.get("SCRAPER_RATE_WORKER_BURST", "3"))
+NAVIGATION_COST = float(os.environ.get("SCRAPER_RATE_NAVIGATION_COST", "2"))
+
+ACTION_COSTS = {'click': 1.0, 'navigate': NAVIGATION_COST}
+WAIT_SLICE = 0.1
+
+
+class TokenBucket:
+    """Refills at `rate` tokens/s up to `burst`; rate <= 0 means unlimited"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, cost):
+        """Take `cost` tokens if available; else return the seconds until they will be"""
+        if self.rate <= 0:
+            return 0.0
+        cost = min(cost, self.burst)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0.0
+            return (cost - self.tokens) / self.rate
+
+    def give_back(self, cost):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + min(cost, self.burst))
+
+
+class RateLimiter:
+    """Paces browser actions with one global bucket plus one bucket per browser.
+
+    acquire() returns immediately while both budgets have tokens and only
+    sleeps (in short, cancellable slices) once one of them is exhausted.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 worker_rate=WORKER_RATE, worker_burst=WORKER_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.worker_rate = worker_rate
+        self.worker_burst = worker_burst
+        self._workers = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def _worker_bucket(self, worker):
+        if worker is None:
+            return None
+        with self._lock:
+            bucket = self._workers.get(worker)
+            if bucket is None:
+                bucket = TokenBucket(self.worker_rate, self.worker_burst)
+                self._workers[worker] = bucket
+            return bucket
+
+    def acquire(self, action='click', worker=None, cancelled=None):
+        """Block until `action` fits both budgets; False if cancelled meanwhile"""
+        cost = ACTION_COSTS.get(action, 1.0)
+        worker_bucket = self._worker_bucket(worker)
+        started = time.monotonic()
+        throttled = False
+        while True:
+            wait = worker_bucket.try_take(cost) if worker_bucket else 0.0
+            if not wait:
+                wait = self.global_bucket.try_take(cost)
+                if not wait:
+                    break
+                if worker_bucket:
+                    # Only spend the browser's tokens together with global ones
+                    worker_bucket.give_back(cost)
+            throttled = True
+            if interruptible_sleep(min(wait, WAIT_SLICE), cancelled):
+                return False
+        with self._lock:
+            self.acquired += 1
+            if throttled:
+                self.throttled += 1
+                self.waited_seconds += time.monotonic() - started
+        return True
+
+    def status(self):
+        with self._lock:
+            return {
+                'global_rate': self.global_bucket.rate,
+                'global_burst': self.global_bucket.burst,
+                'worker_rate': self.worker_rate,
+                'worker_burst': self.worker_burst,
+                'navigation_cost': ACTION_COSTS['navigate'],
+                'acquired': self.acquired,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited_seconds, 2),
+            }
+
+
+# Shared by every job and worker in the process
+limiter = RateLimiter()
+
+
+def pace(driver, action='click', termination_flag=None, stats=None):
+    """Wait for budget before a browser action; False if the job was terminated while waiting"""
+    started = time.monotonic()
+    allowed = limiter.acquire(action, worker=driver, cancelled=termination_flag)
+    if stats is not None:
+        waited_ms = (time.monotonic() - started) * 1000
+        if waited_ms >= 1:
+            stats.incr('rate_limited')
+            stats.observe('rate_wait_ms', round(waited_ms, 1))
+    return allowed
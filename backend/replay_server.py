@@ -0,0 +1,165 @@
+"""Local HTTP server that replays recorded search fixtures.
+
+Record fixtures by running the backend with SCRAPER_RECORD_DIR set, then:
+
+    python replay_server.py --fixtures ../fixtures --port 8765
+    SCRAPER_BASE_URL=http://127.0.0.1:8765 python server.py
+
+GET /search?q=...&start=N serves the recorded results page (scripts removed,
+plus a small replay script). Clicking a listing swaps in the page recorded
+after that click, so the scraper goes through the same DOM states offline.
+"""
+import argparse
+import json
+import re
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixtures import FixtureStore, FIXTURES_DIR, start_offset, url_path
+from scraper import LISTING_SELECTORS
+
+
+_SCRIPT_TAG = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+_HEAD_OPEN = re.compile(r'<head\b[^>]*>', re.IGNORECASE)
+
+# Injected into every replayed page. Finds which listing was clicked the same
+# way scrape_current_page() does (first selector with any match, index in it).
+REPLAY_SCRIPT = r"""
+(function () {
+    var selectors = %(selectors)s, query = %(query)s, start = %(start)d;
+    function listingIndex(target) {
+        for (var s = 0; s < selectors.length; s++) {
+            var all = document.querySelectorAll(selectors[s]);
+            if (!all.length) continue;
+            for (var i = 0; i < all.length; i++) {
+                if (all[i] === target || all[i].contains(target)) return i;
+            }
+            return -1;
+        }
+        return -1;
+    }
+    document.addEventListener('click', function (e) {
+        var index = listingIndex(e.target);
+        if (index < 0) return;
+        e.preventDefault();
+        e.stopPropagation();
+        fetch('/__replay/panel?q=' + encodeURIComponent(query) + '&start=' + start + '&index=' + index)
+            .then(function (r) { return r.ok ? r.json() : null; })
+            .then(function (panel) {
+                if (!panel) return;
+                var doc = new DOMParser().parseFromString(panel.html, 'text/html');
+                document.body.innerHTML = doc.body.innerHTML;
+                if (panel.path) history.replaceState(null, '', panel.path);
+                window.dispatchEvent(new HashChangeEvent('hashchange'));
+            });
+    }, true);
+})();
+"""
+
+
+def prepare_html(html):
+    """Strip the recorded page's scripts and keep search links on the replay host"""
+    html = _SCRIPT_TAG.sub('', html)
+    return html.replace('https://www.google.com/search', '/search')
+
+
+def inject_replay_script(html, query, start):
+    script = REPLAY_SCRIPT % {'selectors': json.dumps(LISTING_SELECTORS), 'query': json.dumps(query), 'start': start}
+    tag = f"<script>{script}</script>"
+    match = _HEAD_OPEN.search(html)
+    if match:
+        return html[:match.end()] + tag + html[match.end():]
+    return tag + html
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(parts.query)
+        query = params.get('q', [''])[0]
+
+        if parts.path == '/search':
+            start = start_offset(self.path)
+            page = self.store.load_page(query, start)
+            if page is None:
+                self._send(404, f"<html><body>No fixture for {query!r} at start={start}</body></html>", 'text/html')
+                return
+            html = inject_replay_script(prepare_html(page['html']), query, start)
+            self._send(200, html, 'text/html; charset=utf-8')
+        elif parts.path == '/__replay/panel':
+            try:
+                start = int(params.get('start', ['0'])[0])
+                index = int(params.get('index', ['-1'])[0])
+            except ValueError:
+                self._send(400, '{}', 'application/json')
+                return
+            panel = self.store.load_panel(query, start, index)
+            if panel is None:
+                self._send(404, '{}', 'application/json')
+                return
+            body = json.dumps({'path': url_path(panel['url']), 'html': prepare_html(panel['html'])})
+            self._send(200, body, 'application/json')
+        elif parts.path == '/__replay/queries':
+            self._send(200, json.dumps(self.store.queries()), 'application/json')
+        else:
+            self._send(404, '', 'text/plain')
+
+
+class ReplayServer:
+    """Serves a fixtures directory on a background thread"""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, host='127.0.0.1', port=0):
+        handler = type('BoundReplayHandler', (ReplayHandler,), {'store': FixtureStore(fixtures_dir)})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded search fixtures")
+    parser.add_argument('--fixtures', default=str(FIXTURES_DIR))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = ReplayServer(args.fixtures, args.host, args.port)
+    print(f"Replaying {len(server.httpd.RequestHandlerClass.store.queries())} recorded queries on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+
+# Lower rank is dispatched first
+PRIORITY_RANKS = {
+    'interactive': 0,
+    'bulk': 1,
+}
+
+
+class ScheduledJob:
+    def __init__(self, job_id, tasks, priority, concurrency, seq):
+        self.job_id = job_id
+        self.pending = deque(tasks)
+        self.priority = priority
+        self.concurrency = max(1, concurrency)
+        self.seq = seq
+        self.running = 0
+        self.dispatched = 0
+        self.last_dispatch = 0
+        self.submitted_at = time.time()
+        self.done = threading.Event()
+
+    def dispatchable(self):
+        return bool(self.pending) and self.running < self.concurrency
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'priority': self.priority,
+            'concurrency': self.concurrency,
+            'pending': len(self.pending),
+            'running': self.running,
+            'dispatched': self.dispatched,
+            'waiting_seconds': round(time.time() - self.submitted_at, 1),
+        }
+
+
+class JobScheduler:
+    """Single queue for the query tasks of every job.
+
+    A fixed set of worker threads runs at most `limit` tasks at once, so the
+    number of browsers is capped globally no matter how many jobs are
+    submitted. Interactive jobs are dispatched before bulk ones; within a
+    priority class the job with the fewest running tasks (then the one served
+    least recently) goes next, which shares workers fairly between jobs.
+    Each job additionally never runs more than its own `concurrency` tasks.
+    """
+
+    def __init__(self, max_workers, on_job_done=None):
+        self.max_workers = max(1, max_workers)
+        self.limit = self.max_workers
+        self.on_job_done = on_job_done
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._busy = 0
+        self._seq = itertools.count(1)
+        self._dispatch_clock = itertools.count(1)
+        self._threads = []
+        self.tasks_completed = 0
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            for n in range(self.max_workers):
+                thread = threading.Thread(target=self._worker_loop, name=f"scrape-worker-{n + 1}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def set_limit(self, limit):
+        """Change how many tasks may run at once (1..max_workers)"""
+        with self._cond:
+            self.limit = max(1, min(self.max_workers, int(limit)))
+            self._cond.notify_all()
+            return self.limit
+
+    # --- jobs ----------------------------------------------------------------------
+
+    def submit_job(self, job_id, tasks, priority='bulk', concurrency=1):
+        """Queue a job's tasks (callables); on_job_done(job_id) runs after the last one"""
+        self.start()
+        job = ScheduledJob(job_id, tasks, priority, concurrency, next(self._seq))
+        with self._cond:
+            self._jobs[job_id] = job
+            self._cond.notify_all()
+        if not tasks:
+            self._finish(job)
+        return job.done
+
+    def cancel_job(self, job_id):
+        """Drop a job's pending tasks; running ones finish (and check their own termination flag)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.pending.clear()
+            finished = job.running == 0
+        if finished:
+            self._finish(job)
+        return True
+
+    def wait(self, job_id, timeout=None):
+        with self._cond:
+            job = self._jobs.get(job_id)
+        return job.done.wait(timeout) if job else True
+
+    def queue_position(self, job_id):
+        """1-based position among jobs that have not started any task yet, else None"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.dispatched > 0:
+                return None
+            waiting = sorted(
+                (j for j in self._jobs.values() if j.dispatched == 0 and j.pending),
+                key=lambda j: (PRIORITY_RANKS.get(j.priority, len(PRIORITY_RANKS)), j.seq)
+            )
+            for position, queued in enumerate(waiting, start=1):
+                if queued.job_id == job_id:
+                    return position
+            return None
+
+    def status(self):
+        with self._cond:
+            jobs = [j.to_dict() for j in self._jobs.values()]
+            return {
+                'max_workers': self.max_workers,
+                'limit': self.limit,
+                'busy_workers': self._busy,
+                'queued_tasks': sum(j['pending'] for j in jobs),
+                'tasks_completed': self.tasks_completed,
+                'jobs': jobs,
+            }
+
+    # --- dispatch ------------------------------------------------------------------
+
+    def _next_job(self):
+        candidates = [j for j in self._jobs.values() if j.dispatchable()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda j: (
+            PRIORITY_RANKS.get(j.priority, len(PRIORITY_RANKS)), j.running, j.last_dispatch, j.seq
+        ))
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    job = self._next_job() if self._busy < self.limit else None
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                task = job.pending.popleft()
+                job.running += 1
+                job.dispatched += 1
+                job.last_dispatch = next(self._dispatch_clock)
+                self._busy += 1
+
+            try:
+                task()
+            except Exception as e:
+                print(f"[ERROR] Scheduled task for job {job.job_id} failed: {e}")
+
+            with self._cond:
+                job.running -= 1
+                self._busy -= 1
+                self.tasks_completed += 1
+                finished = not job.pending and job.running == 0
+                self._cond.notify_all()
+            if finished:
+                self._finish(job)
+
+    def _finish(self, job):
+        with self._cond:
+            if self._jobs.get(job.job_id) is not job:
+                return
+            del self._jobs[job.job_id]
+        try:
+            if self.on_job_done:
+                self.on_job_done(job.job_id)
+        except Exception as e:
+            print(f"[ERROR] Finishing job {job.job_id} failed: {e}")
+        finally:
+            job.done.set()
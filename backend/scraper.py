@@ -2,14 +2,71 @@ import time
 import csv
 import re
 import os
-from random import randint
-from selenium import webdriver
+import uuid
+import urllib.parse
+import threading
+import itertools
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-
+from driver_pool import create_driver, driver_alive, DriverLostError
+from metrics import CommandCounter
+from csv_writer import BufferedCSVWriter
+from page_scripts import (DETAIL_PANEL_SCRIPT, ARM_PANEL_SCRIPT, PANEL_READY_SCRIPT, PAGINATION_STATE_SCRIPT,
+                          LISTING_CARDS_SCRIPT, FIND_CARD_BY_HREF_SCRIPT, RESULTS_READY_SCRIPT)
+from fixtures import recorder_for, start_offset
+from fanout import SeenSet, PageBuffer, OrderedPageMerger, PageFanout
+from rate_limiter import pace
+from adaptive import report_page
+from circuit_breaker import breaker, BlockedError
+from cancellation import child_token, interruptible_sleep, PAGE_DEADLINE, LISTING_DEADLINE
+
+
+# Search host; point it at replay_server.py to scrape recorded fixtures offline
+SEARCH_BASE_URL = os.environ.get("SCRAPER_BASE_URL", "https://www.google.com").rstrip('/')
+
+# Clickable listing cards on a results page, tried in order (order matched to test.py)
+LISTING_SELECTORS = [
+    'a.vwVdIc',
+    'div.VkpGBb a',
+    'a[jsname]',
+    'div[role="article"] a',
+    'div.g a',
+    'a.sVXRqc',
+    'a[data-cid]',
+    'div.tF2Cxc a',
+]
+
+# Next page controls. The first group are real links whose href carries the next
+# start offset; the rest are only clicked when pagination falls back to the button.
+NEXT_LINK_SELECTORS = [
+    'a#pnnext',  # Standard Google next button
+    'a[aria-label*="Next"]',
+    'a[aria-label*="next"]',
+]
+NEXT_BUTTON_SELECTORS = NEXT_LINK_SELECTORS + [
+    'td.b a',  # Pagination table cell
+    'span.SJajHc.NVbCr a',  # Google pagination
+    'a.nBDE1b.G5eFlf',  # Another pagination selector
+    '#pnnext',
+    'span[style*="background:url"] a',  # Next arrow image
+    'table#nav td:last-child a',  # Last pagination cell
+]
+DEFAULT_PAGE_STEP = 10
+# Set on each harvested listing card so it can be located again directly
+LISTING_MARKER_ATTR = 'data-scraper-card'
+MAX_RESULT_PAGES = 100  # Safety limit to prevent infinite loops
+# Browser crashes a query (or a fan-out page worker) recovers from before giving up
+MAX_DRIVER_RECOVERIES = int(os.environ.get("SCRAPER_DRIVER_RECOVERIES", "3"))
+
+CONSENT_BUTTON_LOCATORS = [
+    (By.XPATH, "//button[contains(., 'Accept all')]"),
+    (By.XPATH, "//button[contains(., 'Reject all')]"),
+    (By.XPATH, "//button[contains(., 'I agree')]"),
+    (By.ID, "L2AGLb"),
+]
 
 UI_NOISE_VALUES = {
     "search",
@@ -19,6 +76,196 @@ UI_NOISE_VALUES = {
     "sponsored",
 }
 
+# Where Google sends a browser it does not want to serve, by outcome for the adaptive controller
+BLOCK_PAGE_MARKERS = ['google.com/sorry', 'accounts.google.com']
+CONSENT_PAGE_MARKERS = ['consent.google.']
+REDIRECT_PAGE_MARKERS = ['support.google.com', 'policies.google.com',
+                         'google.com/webhp', 'google.com/preferences']
+
+# Body text of a search that found nothing
+NO_RESULTS_INDICATORS = [
+    "did not match any documents",
+    "No results found",
+    "Try different keywords",
+    "did not match any places"
+]
+
+# Card label lines that mark a listing as an ad
+SPONSORED_LABELS = {"sponsored", "ad", "ads"}
+
+# Business identifier in a listing/maps URL: #rlimm=, ludocid= or cid= (all the same CID)
+BUSINESS_ID_PATTERN = re.compile(r'(?:[#&]rlimm=|[?&]ludocid=|[?&]cid=)(\d+)')
+
+# Detail panel selectors, shared by the Selenium extractor and the in-page script
+PANEL_NAME_SELECTORS = [
+    'h2.qrShPb',
+    'h1.DUwDvf',
+    'div.SPZz6b h2',
+    'div.SPZz6b h1',
+    'div.x0H67.r9fE8',
+    'div.v93No.H7V2N.fEByN',
+    '[role="heading"]',
+    '.rG09U',
+    '.H07f0c',
+    'div.PZPZ1c h2',
+    'div.PZPZ1c h1'
+]
+
+PANEL_HEADING_SELECTORS = [
+    'h1.DUwDvf',
+    'h2.qrShPb',
+    'div.SPZz6b h1',
+    'div.SPZz6b h2',
+    '[role="heading"]',
+    '.rG09U',
+    '.H07f0c',
+    'div.PZPZ1c h2',
+    'div.PZPZ1c h1'
+]
+
+RATING_NAME_SELECTORS = [
+    'h1.DUwDvf',  # Main business name
+    'h2.qrShPb',
+    'div.SPZz6b h1',
+    'div.SPZz6b h2',
+    '[role="banner"] h1',
+    '.rG09U',
+    '.H07f0c'
+]
+
+RATING_SELECTORS = [
+    'span.Aq14fc',
+    'span.ceNzKf[aria-hidden="true"]',
+    'span.gsrt.By079',
+    'div.F7nice span[aria-hidden="true"]',
+    'span.yi40Hd.YrbPuc[aria-hidden="true"]'
+]
+
+REVIEW_SELECTOR = 'span.RDApEe.YrbPuc[role="text"]'
+
+# Priority order - span.YhemCb is most common for categories
+CATEGORY_SELECTORS = [
+    'div.zloOqf span.YhemCb',  # Specific parent from user example
+    'div.MaBy9 span.YhemCb',   # Another common parent
+    'span.YhemCb',             # Generic fallback
+    'button.DkEaL',
+    'div.LBgpqf button',
+    'div.PZPZ1c span:nth-of-type(1)',
+    'span[class*="YhemCb"]',
+    'button[jsaction*="category"]',
+    'span.mgr77e',
+    'div.fontBodyMedium button',
+    'span[class*="fontBody"]',
+    'div.RWPxGd button',
+    'button[class*="DkEaL"]',
+    'div[jsaction*="category"] button',
+    'div.LBgpqf span',
+    '[aria-label*="Categories"]',
+    'div > button:first-of-type'
+]
+
+ADDRESS_SELECTORS = [
+    'div[data-local-attribute="d3adr"]',  # New address container (includes label + LrzXr)
+    'div[data-dtype="d3ifr"]',            # Fallback container seen with address label
+    'span.LrzXr',
+    'button[data-item-id="address"]',
+    'button[data-tooltip*="Address"]',
+    'div.rogA2c[data-item-id="address"]',
+    'div[data-item-id="address"]',
+    'span.fMghS'
+]
+
+PHONE_SELECTORS = [
+    'button[data-item-id*="phone"]',
+    'button[aria-label*="Phone"]',
+    'a[data-item-id*="phone"]',
+    'a[data-dtype="d3ph"]',
+    'span[data-dtype="d3ph"]',
+    'span.LrzXr.zdqRlf.kno-fv a',
+    'span.w8qArf.FoJoyf a.fl',
+    'span.LrzXr'
+]
+
+WEBSITE_SELECTORS = [
+    'a.n1obkb.mI8Pwc',
+    'a[data-item-id="authority"]',
+    'a[aria-label*="Website"]',
+    'button[data-item-id="authority"]',
+    'a.ab_button[href*="http"]'
+]
+
+PRICE_SELECTORS = [
+    'div.zloOqf.kpS1Ac.vk_gy span.YhemCb',  # Specific container from user example
+    'div.zloOqf span.YhemCb',                # Fallback without all classes
+    'div.TLYLSe.MaBy9 div.zloOqf span',      # Parent container approach
+    'span[aria-label*="Price"]',
+    'span.mgr77e',
+    'span.YhemCb'
+]
+
+HOURS_SELECTORS = [
+    'div.OqCZI',
+    'span[aria-label*="Hours"]',
+    'div.MkXq9e',
+    'div.J77u9c'
+]
+
+MAPS_HREF_SELECTORS = [
+    'a[aria-label*="Directions"]',
+    'a[data-item-id*="directions"]',
+    'a[href*="/maps"]',
+    'a[href*="maps.google.com"]',
+    'a[href*="google.com/maps"]',
+]
+
+# Try data-url attributes (sometimes used for share/directions)
+MAPS_DATA_URL_SELECTORS = [
+    '[data-url]',
+    'a[data-url]',
+    'button[data-url]',
+]
+
+# Panel readiness: hard deadline for the in-page observer, quiet window after the
+# new heading appears, and cap on how long we wait for the DOM to settle
+PANEL_READY_DEADLINE_MS = 6000
+PANEL_QUIET_MS = 150
+PANEL_SETTLE_MAX_MS = 1000
+
+# Poll interval for the remaining WebDriverWait calls (Selenium's default is 0.5s)
+WAIT_POLL_INTERVAL = 0.1
+# The observer wait runs in slices this long so a cancelled job is noticed between them
+PANEL_WAIT_SLICE_MS = 300
+# Longest wait for the first results page to show listings (or say it has none)
+RESULTS_READY_TIMEOUT = 5
+
+
+class WaitCancelled(TimeoutException):
+    """A wait given up because its job, query, page or listing was cancelled"""
+
+
+class CancellableWait(WebDriverWait):
+    """WebDriverWait that gives up at the next poll once `cancelled` fires, and never outlives its deadline"""
+
+    def __init__(self, driver, timeout, cancelled=None, poll_frequency=WAIT_POLL_INTERVAL):
+        remaining = cancelled.remaining() if hasattr(cancelled, 'remaining') else None
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        super().__init__(driver, timeout, poll_frequency=poll_frequency)
+        self.cancelled = cancelled
+
+    def until(self, method, message=""):
+        if self.cancelled is None:
+            return super().until(method, message)
+
+        def checked(driver):
+            if self.cancelled():
+                raise WaitCancelled("Wait cancelled")
+            return method(driver)
+        return super().until(checked, message)
+
+
+RATING_REVIEWS_PATTERN = r'(\d+\.?\d*)\s*\(\s*(\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\s*\)'
+
 
 def is_ui_noise(value: str) -> bool:
     if not value:
@@ -64,6 +311,231 @@ def is_valid_maps_url(value: str) -> bool:
     return True
 
 
+def redirect_outcome(url: str) -> str:
+    """'blocked', 'consent_redirect' or 'redirect' if the browser landed off the results, else 'ok'"""
+    url = url or ''
+    if any(marker in url for marker in BLOCK_PAGE_MARKERS):
+        return 'blocked'
+    if any(marker in url for marker in CONSENT_PAGE_MARKERS):
+        return 'consent_redirect'
+    if any(marker in url for marker in REDIRECT_PAGE_MARKERS):
+        return 'redirect'
+    return 'ok'
+
+
+def load_page(driver, url, stats=None, metric=None, termination_flag=None):
+    """driver.get() that reports the load (outcome, latency) to the adaptive controller.
+
+    Waits first while the circuit breaker is open; a block page trips it and
+    only a results page counts as a successful probe (a consent or other
+    redirect leaves the breaker half-open). Returns the redirect_outcome() of
+    where the browser ended up; errors from driver.get() are reported and re-raised.
+    """
+    if not breaker.wait_until_clear(termination_flag):
+        return 'terminated'
+    started = time.time()
+    try:
+        driver.get(url)
+    except TimeoutException:
+        report_page('timeout')
+        raise
+    except Exception:
+        report_page('error')
+        raise
+    latency_ms = round((time.time() - started) * 1000, 1)
+    if stats is not None and metric:
+        stats.observe(metric, latency_ms)
+    outcome = redirect_outcome(driver.current_url)
+    report_page(outcome, latency_ms)
+    if outcome == 'blocked':
+        if stats is not None:
+            stats.incr('blocked_pages')
+        breaker.trip(f"block page at {driver.current_url[:120]}")
+    elif outcome == 'ok':
+        breaker.record_success()
+    return outcome
+
+
+def results_page_ready(driver) -> bool:
+    """True once the results page shows listings or a "no results" message, or the browser left the results"""
+    if redirect_outcome(driver.current_url) != 'ok':
+        return True
+    return bool(driver.execute_script(RESULTS_READY_SCRIPT, LISTING_SELECTORS, NO_RESULTS_INDICATORS))
+
+
+def wait_for_results_page(driver, termination_flag=None, timeout=RESULTS_READY_TIMEOUT):
+    """Wait until results_page_ready(); False if the job was terminated meanwhile.
+
+    A page that is still not ready after `timeout` is left to the checks that follow.
+    """
+    try:
+        CancellableWait(driver, timeout, termination_flag).until(results_page_ready)
+    except WaitCancelled:
+        return False
+    except TimeoutException:
+        print(f"DEBUG: Results page not ready after {timeout}s, continuing")
+    except Exception as e:
+        print(f"DEBUG: Results page readiness check failed: {e}")
+    return not (termination_flag and termination_flag())
+
+
+def business_key(url: str) -> str:
+    """The business CID in a listing or maps URL, '' if it has none"""
+    match = BUSINESS_ID_PATTERN.search(url or '')
+    return match.group(1) if match else ''
+
+
+def parse_rating_reviews(text: str):
+    """Return (rating, reviews) from text like "4.8(312)", or None if there is no valid pair"""
+    if not text:
+        return None
+    match = re.search(RATING_REVIEWS_PATTERN, text, re.IGNORECASE)
+    if not match:
+        return None
+    rating_val = match.group(1)
+    reviews_val = match.group(2).replace(',', '').strip()
+    try:
+        rating_float = float(rating_val)
+    except ValueError:
+        print(f"DEBUG: Rating {rating_val} is not a valid float")
+        return None
+    if 0.0 <= rating_float <= 5.0:
+        return str(rating_float), reviews_val
+    return None
+
+
+def parse_rating_value(text: str) -> str:
+    """Return a standalone rating like "4.5" if the text is one, else "" """
+    text = (text or "").strip()
+    if text and text.replace('.', '').isdigit():
+        try:
+            rating_float = float(text)
+        except ValueError:
+            return ""
+        if 0.0 <= rating_float <= 5.0:
+            return str(rating_float)
+    return ""
+
+
+def parse_review_count(text: str) -> str:
+    """Extract the number from parentheses like "(478)" """
+    paren_match = re.search(r'\((\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\)', text or "", re.IGNORECASE)
+    if paren_match:
+        return paren_match.group(1).replace(',', '').strip()
+    return ""
+
+
+def clean_category_text(raw_text: str) -> str:
+    """Turn a candidate category element text into a category, or "" if it is not one"""
+    raw_text = (raw_text or "").strip()
+    if not raw_text or is_ui_noise(raw_text):
+        return ""
+
+    # CHECK 1: Is it just a price, rating, or number? (e.g. "$50-100", "4.8", "(500)")
+    # If it contains NO letters, it's not a category. (Categories names have letters)
+    if not any(c.isalpha() for c in raw_text):
+        return ""
+
+    # CHECK 2: Is it a common functional button?
+    if any(x in raw_text.lower() for x in ['phone', 'website', 'address', 'open', 'close', 'menu', 'copy', 'send to', 'search', 'zoom in']):
+        if len(raw_text) < 20:  # Long text might contain these words legitimately
+            return ""
+
+    # CLEANING: Remove ratings, prices, etc.
+    category = raw_text
+
+    # Remove rating patterns "4.0(1K)"
+    category = re.sub(r'\d+\.?\d*\s*\(\s*\d+\.?\d*\s*[KMB]?\s*\)', '', category)
+    # Remove price patterns "$$", "$50-100"
+    category = re.sub(r'\$+\s*\d*[-–—]?\s*\d*\+?', '', category)
+    category = re.sub(r'\$+', '', category)
+    # Remove separators
+    category = re.sub(r'[·•]|Â·|â€¢', ' ', category)
+    
+    # Clean up spaces
+    category = ' '.join(category.split())
+
+    # If cleaning left us with nothing (or just symbols), skip
+    if not category or len(category) < 2:
+        return ""
+    return category
+
+
+def clean_address_text(address: str) -> str:
+    if not address:
+        return ""
+    address = address.replace('Address: ', '').replace('Copy address', '').strip()
+    if address.lower().startswith('address'):
+        # If text includes label, remove it and any separator
+        address = address.replace('Address', '').replace(':', '').strip()
+    if address and not is_ui_noise(address):
+        return address
+    return ""
+
+
+def looks_like_phone(text: str) -> bool:
+    return bool(text) and ('+' in text or sum(c.isdigit() for c in text) >= 7)
+
+
+def clean_phone_text(phone: str) -> str:
+    """Strip labels from a phone candidate; returns "" unless it looks like a phone number"""
+    if not phone or phone == "N/A":
+        return ""
+    # Remove common prefixes
+    original_phone = phone
+    phone = phone.replace('Phone: ', '').replace('Copy phone number', '').strip()
+    phone = phone.replace('Call', '').replace('phone number', '').strip()
+    phone = phone.replace('Tel:', '').replace('T:', '').strip()
+
+    print(f"DEBUG: Processing phone '{original_phone}' -> '{phone}'")
+
+    # Check if it looks like a phone number (has enough digits and not an address)
+    digit_count = sum(c.isdigit() for c in phone)
+    is_address_like = any(word in phone.lower() for word in ['street', 'st', 'avenue', 'ave', 'road', 'rd', 'drive', 'dr', 'lane', 'ln', 'blvd', 'boulevard', 'circle', 'cir', 'court', 'ct', 'place', 'pl', 'park', 'square', 'sq'])
+
+    if digit_count >= 7 and not is_address_like:  # At least 7 digits for a valid phone number and not address-like
+        return phone
+    if is_address_like:
+        print(f"DEBUG: Skipping phone (appears to be address): {phone}")
+    else:
+        print(f"DEBUG: Skipping phone (not enough digits): {phone}, digit count: {digit_count}")
+    return ""
+
+
+def is_valid_website(website: str) -> bool:
+    return bool(website) and not is_ui_noise(website) and 'http' in website and 'google' not in website.lower()
+
+
+def clean_price_text(price_text: str) -> str:
+    """Normalise a price range like "$50–100"; returns "" if the text is not a price"""
+    price_text = (price_text or "").strip()
+    if not price_text:
+        return ""
+    # Check if it contains a dollar sign or price-like pattern
+    if '$' in price_text or '₹' in price_text or '£' in price_text or '€' in price_text:
+        # Make sure it's not part of category text (e.g., "$$$ Restaurant")
+        # and contains actual numbers or is just dollar signs
+        if any(c.isdigit() for c in price_text) or price_text.count('$') >= 1:
+            # Avoid capturing text that looks like "Bar" without price info
+            # But accept formats like: "$3050", "$$", "$50-100", etc.
+
+            # Skip if it's a category indicator mixed with price symbols
+            category_words = ['restaurant', 'bar', 'cafe', 'hotel', 'shop', 'store']
+            is_category = any(word in price_text.lower() for word in category_words)
+
+            if not is_category or '$' in price_text:
+                # Fix encoding issues: â100 -> -100, â€" -> -, etc.
+                price_text = price_text.replace('â€"', '-')  # Em dash
+                price_text = price_text.replace('â€"', '-')  # En dash
+                price_text = price_text.replace('â', '-')    # Common encoding issue
+                price_text = price_text.replace('–', '-')    # En dash (proper)
+                price_text = price_text.replace('—', '-')    # Em dash (proper)
+                price_text = price_text.replace('\u2013', '-')  # Unicode en dash
+                price_text = price_text.replace('\u2014', '-')  # Unicode em dash
+                return price_text
+    return ""
+
+
 def get_detail_panel_root(driver, name_element=None):
     if name_element is not None:
         xpaths = [
@@ -108,14 +580,7 @@ def find_element_with_fallback(root, driver, selector):
 
 
 def extract_maps_url(root, driver):
-    href_selectors = [
-        'a[aria-label*="Directions"]',
-        'a[data-item-id*="directions"]',
-        'a[href*="/maps"]',
-        'a[href*="maps.google.com"]',
-        'a[href*="google.com/maps"]',
-    ]
-    for selector in href_selectors:
+    for selector in MAPS_HREF_SELECTORS:
         elements = find_elements_with_fallback(root, driver, selector)
         for elem in elements:
             href = elem.get_attribute('href') or ''
@@ -124,12 +589,7 @@ def extract_maps_url(root, driver):
                 return href
 
     # Try data-url attributes (sometimes used for share/directions)
-    data_url_selectors = [
-        '[data-url]',
-        'a[data-url]',
-        'button[data-url]',
-    ]
-    for selector in data_url_selectors:
+    for selector in MAPS_DATA_URL_SELECTORS:
         elements = find_elements_with_fallback(root, driver, selector)
         for elem in elements:
             data_url = elem.get_attribute('data-url') or ''
@@ -141,18 +601,7 @@ def extract_maps_url(root, driver):
 
 
 def get_panel_name_text(driver):
-    name_selectors = [
-        'h1.DUwDvf',
-        'h2.qrShPb',
-        'div.SPZz6b h1',
-        'div.SPZz6b h2',
-        '[role="heading"]',
-        '.rG09U',
-        '.H07f0c',
-        'div.PZPZ1c h2',
-        'div.PZPZ1c h1'
-    ]
-    for selector in name_selectors:
+    for selector in PANEL_HEADING_SELECTORS:
         try:
             elem = driver.find_element(By.CSS_SELECTOR, selector)
             text = clean_name_value(elem.text.strip())
@@ -163,8 +612,12 @@ def get_panel_name_text(driver):
     return ""
 
 
-def extract_detail_panel(driver, listing_data=None, search_location=""):
-    """Extract data from the right side detail panel after clicking"""
+def extract_detail_panel(driver, listing_data=None, search_location="", panel_ready=False, termination_flag=None):
+    """Extract data from the right side detail panel after clicking
+
+    panel_ready=True means wait_for_panel_ready() already confirmed the panel
+    rendered, so the settle sleep is skipped.
+    """
     business_data = listing_data.copy() if listing_data else {}
     if 'name' not in business_data: business_data['name'] = "N/A"
 
@@ -172,23 +625,8 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
     business_data['search_location'] = search_location or "N/A"
 
     try:
-        # Define selectors
-        name_selectors = [
-            'h2.qrShPb',
-            'h1.DUwDvf',
-            'div.SPZz6b h2',
-            'div.SPZz6b h1',
-            'div.x0H67.r9fE8',
-            'div.v93No.H7V2N.fEByN',
-            '[role="heading"]',
-            '.rG09U',
-            '.H07f0c',
-            'div.PZPZ1c h2',
-            'div.PZPZ1c h1'
-        ]
-
         # Wait for any name selector to appear
-        wait = WebDriverWait(driver, 4) # Further reduced wait time
+        wait = CancellableWait(driver, 4, termination_flag) # Further reduced wait time
         current_name = clean_name_value(business_data.get('name', ''))
         nameFound = current_name and not is_ui_noise(current_name)
         if nameFound:
@@ -196,7 +634,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
 
         panel_root = None
         if not nameFound:
-            for selector in name_selectors:
+            for selector in PANEL_NAME_SELECTORS:
                 try:
                     name_elem = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, selector)))
                     name = name_elem.text.strip()
@@ -252,23 +690,15 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             rating_found = False
 
             # Add a small wait to ensure page is fully loaded after click
-            time.sleep(0.5)
+            if not panel_ready:
+                interruptible_sleep(0.5, termination_flag)
 
             # First, let's try to find the business name element and then look for rating/reviews nearby
             # This ensures we get data from the same business box
             name_element = None
-            name_selectors = [
-                'h1.DUwDvf',  # Main business name
-                'h2.qrShPb',
-                'div.SPZz6b h1',
-                'div.SPZz6b h2',
-                '[role="banner"] h1',
-                '.rG09U',
-                '.H07f0c'
-            ]
 
             # Find the name element first
-            for selector in name_selectors:
+            for selector in RATING_NAME_SELECTORS:
                 try:
                     name_element = driver.find_element(By.CSS_SELECTOR, selector)
                     name_text = name_element.text.strip()
@@ -288,22 +718,11 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                     print(f"DEBUG: Text near name element: {nearby_text[:100]}...")  # First 100 chars
 
                     # Look for rating (review_count) pattern in the same area as the name
-                    pattern = r'(\d+\.?\d*)\s*\(\s*(\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\s*\)'
-                    match = re.search(pattern, nearby_text, re.IGNORECASE)
-
-                    if match:
-                        rating_val = match.group(1)
-                        reviews_val = match.group(2).replace(',', '').strip()
-
-                        try:
-                            rating_float = float(rating_val)
-                            if 0.0 <= rating_float <= 5.0:
-                                business_data['rating'] = str(rating_float)
-                                business_data['total_reviews'] = reviews_val
-                                rating_found = True
-                                print(f"DEBUG: SUCCESS - Found paired rating and reviews near name: {rating_val} ({reviews_val})")
-                        except ValueError:
-                            print(f"DEBUG: Rating {rating_val} is not a valid float")
+                    paired = parse_rating_reviews(nearby_text)
+                    if paired:
+                        business_data['rating'], business_data['total_reviews'] = paired
+                        rating_found = True
+                        print(f"DEBUG: SUCCESS - Found paired rating and reviews near name: {paired[0]} ({paired[1]})")
                     else:
                         print(f"DEBUG: No rating(review) pattern found near name element")
 
@@ -314,7 +733,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             if not rating_found:
                 try:
                     # Look for the Y0A0hc container which should be near the name
-                    wait = WebDriverWait(driver, 3)
+                    wait = CancellableWait(driver, 3, termination_flag)
                     rating_container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'span.Y0A0hc')))
 
                     # Verify this container is in the same area as the name by checking proximity
@@ -322,22 +741,11 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                     print(f"DEBUG: Found Y0A0hc container text: {container_text}")
 
                     # Look for the pattern "rating (review_count)" like "5.0 (478)" in the same container
-                    pattern = r'(\d+\.?\d*)\s*\(\s*(\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\s*\)'
-                    match = re.search(pattern, container_text, re.IGNORECASE)
-
-                    if match:
-                        rating_val = match.group(1)
-                        reviews_val = match.group(2).replace(',', '').strip()
-
-                        try:
-                            rating_float = float(rating_val)
-                            if 0.0 <= rating_float <= 5.0:
-                                business_data['rating'] = str(rating_float)
-                                business_data['total_reviews'] = reviews_val
-                                rating_found = True
-                                print(f"DEBUG: SUCCESS - Found paired rating and reviews from Y0A0hc: {rating_val} ({reviews_val})")
-                        except ValueError:
-                            print(f"DEBUG: Rating {rating_val} is not a valid float")
+                    paired = parse_rating_reviews(container_text)
+                    if paired:
+                        business_data['rating'], business_data['total_reviews'] = paired
+                        rating_found = True
+                        print(f"DEBUG: SUCCESS - Found paired rating and reviews from Y0A0hc: {paired[0]} ({paired[1]})")
                     else:
                         print(f"DEBUG: No rating(review) pattern found in Y0A0hc container")
 
@@ -349,29 +757,18 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             # Fallback to F7nice container
             if not rating_found:
                 try:
-                    wait = WebDriverWait(driver, 3)
+                    wait = CancellableWait(driver, 3, termination_flag)
                     rating_container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.F7nice')))
                     container_text = rating_container.text.strip()
 
                     print(f"DEBUG: Found F7nice container text: {container_text}")
 
                     # Look for the exact pattern "rating (review_count)" like "4.9 (855)"
-                    pattern = r'(\d+\.?\d*)\s*\(\s*(\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\s*\)'
-                    match = re.search(pattern, container_text, re.IGNORECASE)
-
-                    if match:
-                        rating_val = match.group(1)
-                        reviews_val = match.group(2).replace(',', '').strip()
-
-                        try:
-                            rating_float = float(rating_val)
-                            if 0.0 <= rating_float <= 5.0:
-                                business_data['rating'] = str(rating_float)
-                                business_data['total_reviews'] = reviews_val
-                                rating_found = True
-                                print(f"DEBUG: SUCCESS - Found paired rating and reviews from F7nice: {rating_val} ({reviews_val})")
-                        except ValueError:
-                            print(f"DEBUG: Rating {rating_val} is not a valid float")
+                    paired = parse_rating_reviews(container_text)
+                    if paired:
+                        business_data['rating'], business_data['total_reviews'] = paired
+                        rating_found = True
+                        print(f"DEBUG: SUCCESS - Found paired rating and reviews from F7nice: {paired[0]} ({paired[1]})")
                     else:
                         print(f"DEBUG: No rating(review) pattern found in F7nice container")
 
@@ -385,29 +782,15 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                 print("DEBUG: Falling back to general selectors")
 
                 # Try to find rating with waits
-                rating_selectors = [
-                    'span.Aq14fc',
-                    'span.ceNzKf[aria-hidden="true"]',
-                    'span.gsrt.By079',
-                    'div.F7nice span[aria-hidden="true"]',
-                    'span.yi40Hd.YrbPuc[aria-hidden="true"]'
-                ]
-
-                for selector in rating_selectors:
+                for selector in RATING_SELECTORS:
                     try:
-                        wait = WebDriverWait(driver, 2)
+                        wait = CancellableWait(driver, 2, termination_flag)
                         rating_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
-                        rating_text = rating_elem.text.strip()
-
-                        if rating_text and rating_text.replace('.', '').isdigit():
-                            try:
-                                rating_float = float(rating_text)
-                                if 0.0 <= rating_float <= 5.0:
-                                    business_data['rating'] = str(rating_float)
-                                    print(f"DEBUG: Found rating separately: {rating_text}")
-                                    break
-                            except ValueError:
-                                continue
+                        rating_value = parse_rating_value(rating_elem.text)
+                        if rating_value:
+                            business_data['rating'] = rating_value
+                            print(f"DEBUG: Found rating separately: {rating_value}")
+                            break
                     except TimeoutException:
                         continue
                     except:
@@ -415,14 +798,10 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
 
                 # Try to find reviews
                 try:
-                    wait = WebDriverWait(driver, 2)
-                    review_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'span.RDApEe.YrbPuc[role="text"]')))
-                    review_text = review_elem.text.strip()
-
-                    # Extract the number from parentheses like "(478)"
-                    paren_match = re.search(r'\((\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\)', review_text, re.IGNORECASE)
-                    if paren_match:
-                        reviews_val = paren_match.group(1).replace(',', '').strip()
+                    wait = CancellableWait(driver, 2, termination_flag)
+                    review_elem = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, REVIEW_SELECTOR)))
+                    reviews_val = parse_review_count(review_elem.text.strip())
+                    if reviews_val:
                         business_data['total_reviews'] = reviews_val
                         print(f"DEBUG: Found reviews from specific element: {reviews_val}")
                 except TimeoutException:
@@ -444,29 +823,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
 
         # Category/Type - ALWAYS extract from detail panel (after clicking)
         # Do NOT preserve from listing card - we want the accurate category from detail page
-        
-        # Priority order - span.YhemCb is most common for categories
-        category_selectors = [
-            'div.zloOqf span.YhemCb',  # Specific parent from user example
-            'div.MaBy9 span.YhemCb',   # Another common parent
-            'span.YhemCb',             # Generic fallback
-            'button.DkEaL',
-            'div.LBgpqf button',
-            'div.PZPZ1c span:nth-of-type(1)',
-            'span[class*="YhemCb"]',
-            'button[jsaction*="category"]',
-            'span.mgr77e',
-            'div.fontBodyMedium button',
-            'span[class*="fontBody"]',
-            'div.RWPxGd button',
-            'button[class*="DkEaL"]',
-            'div[jsaction*="category"] button',
-            'div.LBgpqf span',
-            '[aria-label*="Categories"]',
-            'div > button:first-of-type'
-        ]
-
-        for selector in category_selectors:
+        for selector in CATEGORY_SELECTORS:
             try:
                 # Use find_elements to catch ALL matches
                 elements = find_elements_with_fallback(panel_root, driver, selector)
@@ -479,38 +836,9 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                     if not raw_text:
                         raw_text = category_elem.get_attribute('aria-label') or ''
                         raw_text = raw_text.strip()
-                    
-                    if not raw_text:
-                        continue
-                    if is_ui_noise(raw_text):
-                        continue
 
-                    # CHECK 1: Is it just a price, rating, or number? (e.g. "$50-100", "4.8", "(500)")
-                    # If it contains NO letters, it's not a category. (Categories names have letters)
-                    if not any(c.isalpha() for c in raw_text):
-                        continue
-                        
-                    # CHECK 2: Is it a common functional button?
-                    if any(x in raw_text.lower() for x in ['phone', 'website', 'address', 'open', 'close', 'menu', 'copy', 'send to', 'search', 'zoom in']):
-                         if len(raw_text) < 20: # Long text might contain these words legitimately
-                             continue
-
-                    # CLEANING: Remove ratings, prices, etc.
-                    category = raw_text
-                    
-                    # Remove rating patterns "4.0(1K)"
-                    category = re.sub(r'\d+\.?\d*\s*\(\s*\d+\.?\d*\s*[KMB]?\s*\)', '', category)
-                    # Remove price patterns "$$", "$50-100"
-                    category = re.sub(r'\$+\s*\d*[-–—]?\s*\d*\+?', '', category)
-                    category = re.sub(r'\$+', '', category)
-                    # Remove separators
-                    category = re.sub(r'[·•]|Â·|â€¢', ' ', category)
-                    
-                    # Clean up spaces
-                    category = ' '.join(category.split())
-                    
-                    # If cleaning left us with nothing (or just symbols), skip
-                    if not category or len(category) < 2:
+                    category = clean_category_text(raw_text)
+                    if not category:
                         continue
 
                     # If we survived, this is likely the category
@@ -530,18 +858,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             business_data['category'] = "N/A"
 
         # Address
-        address_selectors = [
-            'div[data-local-attribute="d3adr"]',  # New address container (includes label + LrzXr)
-            'div[data-dtype="d3ifr"]',            # Fallback container seen with address label
-            'span.LrzXr',
-            'button[data-item-id="address"]',
-            'button[data-tooltip*="Address"]',
-            'div.rogA2c[data-item-id="address"]',
-            'div[data-item-id="address"]',
-            'span.fMghS'
-        ]
-
-        for selector in address_selectors:
+        for selector in ADDRESS_SELECTORS:
             try:
                 addr_elem = find_element_with_fallback(panel_root, driver, selector)
                 if not addr_elem:
@@ -558,14 +875,10 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                 if not address:
                     address = addr_elem.text.strip()
 
+                address = clean_address_text(address)
                 if address:
-                    address = address.replace('Address: ', '').replace('Copy address', '').strip()
-                    if address.lower().startswith('address'):
-                        # If text includes label, remove it and any separator
-                        address = address.replace('Address', '').replace(':', '').strip()
-                    if address and not is_ui_noise(address):
-                        business_data['address'] = address
-                        break
+                    business_data['address'] = address
+                    break
             except:
                 continue
 
@@ -573,19 +886,8 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             business_data['address'] = "N/A"
 
         # Phone Number - Enhanced extraction with better debugging
-        phone_selectors = [
-            'button[data-item-id*="phone"]',
-            'button[aria-label*="Phone"]',
-            'a[data-item-id*="phone"]',
-            'a[data-dtype="d3ph"]',
-            'span[data-dtype="d3ph"]',
-            'span.LrzXr.zdqRlf.kno-fv a',
-            'span.w8qArf.FoJoyf a.fl',
-            'span.LrzXr'
-        ]
-
         phone_found = False
-        for selector in phone_selectors:
+        for selector in PHONE_SELECTORS:
             try:
                 phone_elements = driver.find_elements(By.CSS_SELECTOR, selector)
                 print(f"DEBUG: Found {len(phone_elements)} elements for selector: {selector}")
@@ -607,7 +909,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                             nested_spans = phone_elem.find_elements(By.CSS_SELECTOR, 'span, a')
                             for nested in nested_spans:
                                 nested_text = nested.text.strip()
-                                if nested_text and ('+' in nested_text or sum(c.isdigit() for c in nested_text) >= 7):
+                                if looks_like_phone(nested_text):
                                     phone = nested_text
                                     print(f"DEBUG: Found phone in nested element: {phone}")
                                     break
@@ -615,29 +917,12 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                             pass
 
                     # Clean up
-                    if phone and phone != "N/A":
-                        # Remove common prefixes
-                        original_phone = phone
-                        phone = phone.replace('Phone: ', '').replace('Copy phone number', '').strip()
-                        phone = phone.replace('Call', '').replace('phone number', '').strip()
-                        phone = phone.replace('Tel:', '').replace('T:', '').strip()
-
-                        print(f"DEBUG: Processing phone '{original_phone}' -> '{phone}'")
-
-                        # Check if it looks like a phone number (has enough digits and not an address)
-                        digit_count = sum(c.isdigit() for c in phone)
-                        is_address_like = any(word in phone.lower() for word in ['street', 'st', 'avenue', 'ave', 'road', 'rd', 'drive', 'dr', 'lane', 'ln', 'blvd', 'boulevard', 'circle', 'cir', 'court', 'ct', 'place', 'pl', 'park', 'square', 'sq'])
-
-                        if digit_count >= 7 and not is_address_like:  # At least 7 digits for a valid phone number and not address-like
-                            business_data['phone'] = phone
-                            phone_found = True
-                            print(f"DEBUG: Valid phone number found: {phone}")
-                            break
-                        else:
-                            if is_address_like:
-                                print(f"DEBUG: Skipping phone (appears to be address): {phone}")
-                            else:
-                                print(f"DEBUG: Skipping phone (not enough digits): {phone}, digit count: {digit_count}")
+                    phone = clean_phone_text(phone)
+                    if phone:
+                        business_data['phone'] = phone
+                        phone_found = True
+                        print(f"DEBUG: Valid phone number found: {phone}")
+                        break
 
                 if phone_found:
                     break
@@ -651,15 +936,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             print(f"DEBUG: Phone number successfully extracted: {business_data['phone']}")
 
         # Website
-        website_selectors = [
-            'a.n1obkb.mI8Pwc',
-            'a[data-item-id="authority"]',
-            'a[aria-label*="Website"]',
-            'button[data-item-id="authority"]',
-            'a.ab_button[href*="http"]'
-        ]
-
-        for selector in website_selectors:
+        for selector in WEBSITE_SELECTORS:
             try:
                 website_elem = find_element_with_fallback(panel_root, driver, selector)
                 if not website_elem:
@@ -668,7 +945,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                 if not website:
                     website = website_elem.text.strip()
 
-                if website and not is_ui_noise(website) and 'http' in website and 'google' not in website.lower():
+                if is_valid_website(website):
                     business_data['website'] = website
                     break
             except:
@@ -678,17 +955,8 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             business_data['website'] = "N/A"
 
         # Price Range - Enhanced extraction
-        price_selectors = [
-            'div.zloOqf.kpS1Ac.vk_gy span.YhemCb',  # Specific container from user example
-            'div.zloOqf span.YhemCb',                # Fallback without all classes
-            'div.TLYLSe.MaBy9 div.zloOqf span',      # Parent container approach
-            'span[aria-label*="Price"]',
-            'span.mgr77e',
-            'span.YhemCb'
-        ]
-
         price_found = False
-        for selector in price_selectors:
+        for selector in PRICE_SELECTORS:
             try:
                 # Use find_elements to check all matches
                 price_elements = driver.find_elements(By.CSS_SELECTOR, selector)
@@ -706,33 +974,13 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
                         continue
                     
                     print(f"DEBUG: Checking price text: '{price_text}'")
-                    
-                    # Check if it contains a dollar sign or price-like pattern
-                    if '$' in price_text or '₹' in price_text or '£' in price_text or '€' in price_text:
-                        # Make sure it's not part of category text (e.g., "$$$ Restaurant")
-                        # and contains actual numbers or is just dollar signs
-                        if any(c.isdigit() for c in price_text) or price_text.count('$') >= 1:
-                            # Avoid capturing text that looks like "Bar" without price info
-                            # But accept formats like: "$3050", "$$", "$50-100", etc.
-                            
-                            # Skip if it's a category indicator mixed with price symbols
-                            category_words = ['restaurant', 'bar', 'cafe', 'hotel', 'shop', 'store']
-                            is_category = any(word in price_text.lower() for word in category_words)
-                            
-                            if not is_category or '$' in price_text:
-                                # Fix encoding issues: â100 -> -100, â€" -> -, etc.
-                                price_text = price_text.replace('â€"', '-')  # Em dash
-                                price_text = price_text.replace('â€"', '-')  # En dash
-                                price_text = price_text.replace('â', '-')    # Common encoding issue
-                                price_text = price_text.replace('–', '-')    # En dash (proper)
-                                price_text = price_text.replace('—', '-')    # Em dash (proper)
-                                price_text = price_text.replace('\u2013', '-')  # Unicode en dash
-                                price_text = price_text.replace('\u2014', '-')  # Unicode em dash
-                                
-                                business_data['price_range'] = price_text
-                                price_found = True
-                                print(f"DEBUG: Successfully extracted price range: {price_text}")
-                                break
+
+                    price_text = clean_price_text(price_text)
+                    if price_text:
+                        business_data['price_range'] = price_text
+                        price_found = True
+                        print(f"DEBUG: Successfully extracted price range: {price_text}")
+                        break
                 
                 if price_found:
                     break
@@ -746,14 +994,7 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
             print("DEBUG: No price range found, setting to N/A")
 
         # Hours Status
-        hours_selectors = [
-            'div.OqCZI',
-            'span[aria-label*="Hours"]',
-            'div.MkXq9e',
-            'div.J77u9c'
-        ]
-
-        for selector in hours_selectors:
+        for selector in HOURS_SELECTORS:
             try:
                 hours = driver.find_element(By.CSS_SELECTOR, selector).text.strip()
                 if hours:
@@ -795,9 +1036,325 @@ def extract_detail_panel(driver, listing_data=None, search_location=""):
         return None
 
 
-def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, location, termination_flag=None, seen_maps_urls=None):
-    """Scrape listings from the current search results page"""
-    wait = WebDriverWait(driver, 5)  # Reduced from 8 to 5 seconds for faster failure
+def wait_for_panel_ready(driver, token, deadline_ms=PANEL_READY_DEADLINE_MS, termination_flag=None):
+    """Block until the in-page MutationObserver reports the panel armed with `token` rendered.
+
+    Returns the observer result dict ({'ready', 'reason', 'name', 'elapsed_ms', ...});
+    ready is False if the hard deadline passed first or the script failed.
+    With a termination_flag the observer runs in PANEL_WAIT_SLICE_MS slices
+    (the observer and its quiet window stay installed between slices, so a
+    slice never reports ready early) and stops with reason 'cancelled'.
+    """
+    started = time.time()
+    slice_ms = PANEL_WAIT_SLICE_MS if termination_flag is not None else deadline_ms
+    while True:
+        elapsed_ms = (time.time() - started) * 1000
+        if termination_flag is not None and termination_flag():
+            return {'ready': False, 'reason': 'cancelled', 'elapsed_ms': round(elapsed_ms)}
+        remaining_ms = max(1, deadline_ms - elapsed_ms)
+        try:
+            driver.set_script_timeout(min(slice_ms, remaining_ms) / 1000.0 + 2)
+            result = driver.execute_async_script(
+                PANEL_READY_SCRIPT, token, slice_ms, remaining_ms, PANEL_QUIET_MS, PANEL_SETTLE_MAX_MS,
+                PANEL_HEADING_SELECTORS, sorted(UI_NOISE_VALUES)
+            )
+        except Exception as e:
+            print(f"DEBUG: Panel readiness script failed: {e}")
+            return {'ready': False, 'reason': 'script-error'}
+        if not result or result.get('token') != token:
+            return {'ready': False, 'reason': 'stale-token'}
+        if result.get('reason') != 'slice':
+            result['elapsed_ms'] = round((time.time() - started) * 1000)
+            return result
+
+
+def build_panel_script_config(keep_name, need_rating):
+    """Arguments for DETAIL_PANEL_SCRIPT, built from the shared selector lists"""
+    return {
+        'noise': sorted(UI_NOISE_VALUES),
+        'keep_name': keep_name,
+        'need_rating': need_rating,
+        'name_selectors': PANEL_NAME_SELECTORS,
+        'rating_name_selectors': RATING_NAME_SELECTORS,
+        'rating_selectors': RATING_SELECTORS,
+        'review_selector': REVIEW_SELECTOR,
+        'category_selectors': CATEGORY_SELECTORS,
+        'address_selectors': ADDRESS_SELECTORS,
+        'phone_selectors': PHONE_SELECTORS,
+        'website_selectors': WEBSITE_SELECTORS,
+        'price_selectors': PRICE_SELECTORS,
+        'hours_selectors': HOURS_SELECTORS,
+        'maps_href_selectors': MAPS_HREF_SELECTORS,
+        'maps_data_url_selectors': MAPS_DATA_URL_SELECTORS,
+    }
+
+
+def apply_panel_snapshot(snapshot, listing_data=None, search_location=""):
+    """Build a business row from DETAIL_PANEL_SCRIPT output.
+
+    Applies the same selector priority and Python-side cleanup as
+    extract_detail_panel(), so both modes produce identical columns.
+    """
+    business_data = listing_data.copy() if listing_data else {}
+    if 'name' not in business_data: business_data['name'] = "N/A"
+    business_data['search_location'] = search_location or "N/A"
+
+    # Name: keep the listing card name when it is usable
+    current_name = clean_name_value(business_data.get('name', ''))
+    if current_name and not is_ui_noise(current_name):
+        business_data['name'] = current_name
+    else:
+        panel_name = clean_name_value(snapshot.get('name') or '')
+        business_data['name'] = panel_name if panel_name and not is_ui_noise(panel_name) else "N/A"
+
+    # Rating and reviews: same cascade as the Selenium extractor
+    rating_texts = snapshot.get('rating')
+    if rating_texts is not None:
+        business_data['rating'] = "N/A"
+        business_data['total_reviews'] = "N/A"
+        paired = None
+        for key in ['near_name', 'y0a0hc', 'f7nice']:
+            paired = parse_rating_reviews(rating_texts.get(key, ''))
+            if paired:
+                business_data['rating'], business_data['total_reviews'] = paired
+                break
+        if not paired:
+            for rating_text in rating_texts.get('separate', []):
+                rating_value = parse_rating_value(rating_text)
+                if rating_value:
+                    business_data['rating'] = rating_value
+                    break
+            reviews_val = parse_review_count(rating_texts.get('review', ''))
+            if reviews_val:
+                business_data['total_reviews'] = reviews_val
+
+    # Category
+    for candidates in snapshot.get('category', []):
+        category = next((c for c in (clean_category_text(raw) for raw in candidates) if c), "")
+        if category:
+            business_data['category'] = category
+            break
+    if is_ui_noise(business_data.get('category', '')):
+        business_data['category'] = "N/A"
+
+    # Address
+    for candidate in snapshot.get('address', []):
+        if not candidate:
+            continue
+        address = clean_address_text(candidate.get('inner') or candidate.get('aria') or candidate.get('text'))
+        if address:
+            business_data['address'] = address
+            break
+    if is_ui_noise(business_data.get('address', '')):
+        business_data['address'] = "N/A"
+
+    # Phone
+    business_data['phone'] = "N/A"
+    for elements in snapshot.get('phone', []):
+        phone = ""
+        for item in elements:
+            raw = item.get('aria') or item.get('text') or next((t for t in item.get('nested', []) if looks_like_phone(t)), "")
+            phone = clean_phone_text(raw)
+            if phone:
+                break
+        if phone:
+            business_data['phone'] = phone
+            break
+
+    # Website
+    for candidate in snapshot.get('website', []):
+        if not candidate:
+            continue
+        website = candidate.get('href') or candidate.get('text')
+        if is_valid_website(website):
+            business_data['website'] = website
+            break
+    if is_ui_noise(business_data.get('website', '')):
+        business_data['website'] = "N/A"
+
+    # Price range
+    business_data['price_range'] = "N/A"
+    for candidates in snapshot.get('price', []):
+        price = next((p for p in (clean_price_text(raw) for raw in candidates) if p), "")
+        if price:
+            business_data['price_range'] = price
+            break
+
+    # Hours status
+    if 'hours_status' not in business_data:
+        business_data['hours_status'] = next((h for h in snapshot.get('hours', []) if h), "N/A")
+
+    # Google Maps URL: listing card, then current URL, then links in the panel
+    existing_url = business_data.get('google_maps_url', '')
+    if not is_valid_maps_url(existing_url):
+        current_url = snapshot.get('url', '')
+        if is_valid_maps_url(current_url):
+            business_data['google_maps_url'] = current_url
+        else:
+            business_data['google_maps_url'] = next(
+                (url.strip() for url in snapshot.get('maps_urls', []) if is_valid_maps_url((url or '').strip())),
+                "N/A"
+            )
+
+    business_data.setdefault('rating', "N/A")
+    business_data.setdefault('total_reviews', "N/A")
+    return business_data
+
+
+def extract_detail_panel_script(driver, listing_data=None, search_location=""):
+    """Extract the detail panel with a single execute_script round trip.
+
+    Returns None if the script fails so the caller can fall back to
+    extract_detail_panel().
+    """
+    listing_data = listing_data or {}
+    keep_name = not is_ui_noise(clean_name_value(listing_data.get('name', '')))
+    need_rating = listing_data.get('rating', "N/A") == "N/A" or listing_data.get('total_reviews', "N/A") == "N/A"
+    try:
+        snapshot = driver.execute_script(DETAIL_PANEL_SCRIPT, build_panel_script_config(keep_name, need_rating))
+    except Exception as e:
+        print(f"[ERROR] Detail panel script failed: {e}")
+        return None
+    if not snapshot:
+        return None
+    business_data = apply_panel_snapshot(snapshot, listing_data, search_location)
+    print(f"DEBUG: Script extraction - name: {business_data['name']}, rating: {business_data['rating']}, category: {business_data['category']}")
+    return business_data
+
+
+def harvest_listing_cards(driver):
+    """(selector, cards) for the listings on the page, or None if there are none yet.
+
+    Each card is {index, href, cid, rlimm, text}, collected by one script call
+    that also tags the element so locate_listing() can find it again.
+    """
+    try:
+        result = driver.execute_script(LISTING_CARDS_SCRIPT, LISTING_SELECTORS, LISTING_MARKER_ATTR) or {}
+    except Exception as e:
+        print(f"DEBUG: Listing harvest failed: {e}")
+        return None
+    cards = result.get('cards') or []
+    if not cards:
+        return None
+    return result.get('selector'), cards
+
+
+def locate_listing(driver, card, selector):
+    """A fresh element for a harvested card: by its marker, else by its href"""
+    try:
+        return driver.find_element(By.CSS_SELECTOR, f'[{LISTING_MARKER_ATTR}="{card["index"]}"]')
+    except NoSuchElementException:
+        pass
+    except Exception as e:
+        print(f"DEBUG: Marker lookup failed for listing {card['index'] + 1}: {e}")
+    if card.get('href'):
+        try:
+            return driver.execute_script(FIND_CARD_BY_HREF_SCRIPT, selector, card['href'])
+        except Exception as e:
+            print(f"DEBUG: href lookup failed for listing {card['index'] + 1}: {e}")
+    return None
+
+
+def card_business_key(card):
+    """Business CID of a harvested card, from its rlimm / data-cid / href"""
+    return card.get('rlimm') or card.get('cid') or business_key(card.get('href'))
+
+
+def is_sponsored_card(card):
+    lines = [line.strip().lower() for line in (card.get('text') or '').split('\n') if line.strip()]
+    return any(line in SPONSORED_LABELS for line in lines[:3])
+
+
+def parse_listing_card(card):
+    """Fallback listing data (name, rating, reviews, maps URL) from a harvested card.
+
+    Category is left to the detail panel; the card often shows a generic term.
+    """
+    listing_data = {'name': 'N/A', 'address': 'N/A', 'rating': 'N/A', 'total_reviews': 'N/A', 'category': 'N/A', 'google_maps_url': 'N/A'}
+
+    listing_href = (card.get('href') or '').strip()
+    if listing_href and not is_ui_noise(listing_href):
+        if any(x in listing_href for x in ['#rlimm=', 'ludocid=', 'cid=', '/maps', 'google.com/maps']):
+            listing_data['google_maps_url'] = listing_href
+            print(f"DEBUG: Extracted google_maps_url from listing card: {listing_href}")
+
+    card_text = card.get('text') or ''
+    lines = [line.strip() for line in card_text.split('\n') if line.strip()]
+    # Pick the first non-noise line as name (skip "Sponsored")
+    for line in lines:
+        candidate = clean_name_value(line)
+        if candidate and not is_ui_noise(candidate):
+            listing_data['name'] = candidate
+            break
+
+    # Rating and reviews from the card text (e.g., "4.8(312)")
+    match = re.search(RATING_REVIEWS_PATTERN, card_text, re.IGNORECASE)
+    if match:
+        rating_val = match.group(1)
+        reviews_val = match.group(2).replace(',', '').strip()
+        try:
+            rating_float = float(rating_val)
+            if 0.0 <= rating_float <= 5.0:
+                listing_data['rating'] = str(rating_float)
+                listing_data['total_reviews'] = reviews_val
+                print(f"DEBUG: Extracted from listing card - Rating: {rating_val}, Reviews: {reviews_val}")
+        except ValueError:
+            pass
+    return listing_data
+
+
+def save_business_row(business_data, fieldnames, csv_writer, csv_filepath):
+    """Fill missing fields with N/A and append the row to the query's CSV"""
+    for field in fieldnames:
+        if field not in business_data:
+            business_data[field] = "N/A"
+
+    if csv_writer is not None:
+        # Buffered; flushed by the writer's row/interval policy
+        csv_writer.writerow(business_data)
+    else:
+        # Save to CSV immediately and flush to disk
+        with open(csv_filepath, 'a', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writerow(business_data)
+            csvfile.flush()
+
+
+def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, location, termination_flag=None, seen_maps_urls=None,
+                        extraction_mode="script", stats=None, commands=None, panel_wait_mode="observer",
+                        event_callback=None, csv_writer=None, recorder=None, seen_businesses=None,
+                        business_index=None, known_business_mode="off", detail_cache=None, detail_cache_ttl=None,
+                        start_index=0):
+    """Scrape listings from the current search results page
+
+    Before any click, sponsored cards and cards whose business CID is already
+    in `seen_businesses` (shared by the whole job) are skipped; a CID is
+    claimed when its card is visited, so it is not retried if that visit fails
+    (unless the browser died: see below).
+
+    Every scraped business is recorded in `business_index` (a
+    business_index.BusinessIndex shared by all jobs). known_business_mode
+    "skip" leaves businesses already in the index out; "reference" copies their
+    stored row into this query's CSV without clicking; "off" scrapes them again.
+
+    `detail_cache` (a detail_cache.DetailCache) fills the row of a card whose
+    CID was scraped less than `detail_cache_ttl` seconds ago (default: the
+    cache's TTL, 0 bypasses it); only misses and stale entries are clicked.
+
+    extraction_mode "script" reads the detail panel with one injected script
+    (falling back to Selenium lookups if it fails); "selenium" uses the
+    element-by-element extractor. When a CommandCounter is passed, per-listing
+    WebDriver command counts are recorded in `stats`.
+
+    panel_wait_mode "observer" waits for the clicked listing's panel with an
+    in-page MutationObserver; "polling" keeps the WebDriverWait/name polling loop.
+    Per-listing latencies go to `stats` either way so the two can be compared.
+
+    Listings before `start_index` are left out (resuming after a browser
+    crash). If the browser dies mid-page, DriverLostError tells the caller
+    which listing to resume at; rows scraped so far stay in `all_businesses`.
+    """
+    wait = CancellableWait(driver, 5, termination_flag)  # Reduced from 8 to 5 seconds for faster failure
     
     # Check termination before starting
     if termination_flag and termination_flag():
@@ -805,17 +1362,13 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
     
     # Validate URL - check if we're still on a valid search page
     current_url = driver.current_url
-    invalid_urls = [
-        'support.google.com',
-        'accounts.google.com', 
-        'policies.google.com',
-        'google.com/sorry',
-        'google.com/webhp'
-    ]
-    
-    if any(invalid in current_url for invalid in invalid_urls):
+    outcome = redirect_outcome(current_url)
+    if outcome in ('blocked', 'redirect'):
         print(f"[ERROR] Detected invalid page during scraping: {current_url}")
         print(f"[ERROR] Stopping scrape - may be redirected or blocked")
+        if outcome == 'blocked':
+            # Reached by a click rather than load_page(): pause every worker all the same
+            breaker.trip(f"block page at {current_url[:120]}")
         return all_businesses
 
     # Handle consent if appears
@@ -825,49 +1378,41 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
             return all_businesses
         consent = driver.find_element(By.XPATH, "//button[contains(., 'Accept all') or contains(., 'Reject all')]")
         consent.click()
-        time.sleep(0.5)  # Reduced from 1 to 0.5 second
+        interruptible_sleep(0.5, termination_flag)  # Reduced from 1 to 0.5 second
     except:
         pass
 
-    # Find clickable listings (Order matched to test.py)
-    clickable_selectors = [
-        'a.vwVdIc',
-        'div.VkpGBb a',
-        'a[jsname]',
-        'div[role="article"] a',
-        'div.g a',
-        'a.sVXRqc',
-        'a[data-cid]',
-        'div.tF2Cxc a',
-    ]
-
-    listings = []
-    successful_selector = None
-
-    for selector in clickable_selectors:
-        # Check termination before trying each selector
-        if termination_flag and termination_flag():
-            return all_businesses
-        try:
-            listings = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector)))
-            if len(listings) > 0:
-                successful_selector = selector
-                print(f"Found {len(listings)} listings using: {selector}")
-                break
-        except:
-            continue
+    # Harvest every listing card (href, ids, text) in one in-page call, waiting for them to render
+    try:
+        harvest = wait.until(lambda d: harvest_listing_cards(d) or False)
+    except TimeoutException:
+        harvest = None
 
-    if not listings:
+    if not harvest:
         print("[WARNING] DEBUG: No clickable listings found on this page")
+        # Only the first page is expected to have listings; a later one may just be past the end
+        report_page('no_listings' if start_offset(driver.current_url) == 0 else 'empty')
         return all_businesses
-    else:
-        print(f"DEBUG: Found {len(listings)} listings using {successful_selector}")
 
-    total_to_scrape = len(listings)
+    successful_selector, cards = harvest
+    print(f"Found {len(cards)} listings using: {successful_selector}")
+
+    total_to_scrape = len(cards)
     print(f"Will scrape ALL {total_to_scrape} listings from current page")
 
+    def emit_stored_row(row, source):
+        row['search_location'] = location or "N/A"
+        all_businesses.append(row)
+        save_business_row(row, fieldnames, csv_writer, csv_filepath)
+        print(f"[INFO] Filled from {source}: {row.get('name', 'N/A')}")
+        if event_callback:
+            event_callback('row_scraped', name=row.get('name', 'N/A'), total_rows=len(all_businesses))
+
     last_detail_name = None
-    for i in range(total_to_scrape):
+    for i, card in enumerate(cards[start_index:], start=start_index):
+        card_key = ''
+        # Waits for this listing give up at the listing deadline; the job's own checks stay on termination_flag
+        listing_flag = child_token(termination_flag, LISTING_DEADLINE)
         # Check termination at the beginning of each listing iteration
         if termination_flag and termination_flag():
             print(f"[TERMINATION] Terminating during scraping of listing {i+1}")
@@ -875,102 +1420,71 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
 
         try:
             print(f"\n[{len(all_businesses)+1}] Processing listing {i+1}...")
+            listing_commands_start = commands.count if commands else 0
 
-            # Re-find listings to avoid stale elements
-            current_listings = driver.find_elements(By.CSS_SELECTOR, successful_selector)
-            print(f"DEBUG: Found {len(current_listings)} listings on page, attempting index {i}")
-            if i >= len(current_listings):
-                print(f"[WARNING] Ran out of listings at index {i}, only {len(current_listings)} available")
-                break
+            card_text = card.get('text') or ''
+            print(f"DEBUG: Selected listing {i+1} for processing, content preview: '{card_text[:30] or 'NO TEXT'}...'")
 
-            listing = current_listings[i]
-            
-            # Print text content of the listing to verify it's different
-            listing_preview = listing.text[:30] if listing.text else "NO TEXT"
-            print(f"DEBUG: Selected listing {i+1} for processing, content preview: '{listing_preview}...'")
+            # Pre-click filter: ads and businesses the job already has cost no click
+            if is_sponsored_card(card):
+                print(f"DEBUG: Skipping sponsored listing {i+1}")
+                if stats is not None:
+                    stats.incr('skipped_sponsored')
+                continue
+            card_key = card_business_key(card)
+            if card_key and seen_businesses is not None and not seen_businesses.add_new(card_key):
+                print(f"DEBUG: Skipping listing {i+1}, business {card_key} was already scraped in this job")
+                if stats is not None:
+                    stats.incr('skipped_duplicates')
+                continue
+            known = None
+            if card_key and business_index is not None and known_business_mode != "off":
+                known = business_index.get(card_key)
+            if known is not None:
+                if known_business_mode == "skip":
+                    print(f"DEBUG: Skipping listing {i+1}, business {card_key} is already in the index")
+                    if stats is not None:
+                        stats.incr('skipped_known')
+                    continue
+                emit_stored_row(known, "known business")
+                if stats is not None:
+                    stats.incr('referenced_known')
+                continue
+            if card_key and detail_cache is not None and detail_cache_ttl != 0:
+                cached, outcome = detail_cache.lookup(card_key, detail_cache_ttl)
+                if stats is not None:
+                    stats.incr({'hit': 'detail_cache_hits', 'stale': 'detail_cache_stale'}.get(outcome, 'detail_cache_misses'))
+                if cached is not None:
+                    emit_stored_row(cached, "cached details")
+                    continue
 
             # CLICK AND EXTRACT
-            # 1. Capture basic info from listing first (fallback)
-            listing_data = {'name': 'N/A', 'address': 'N/A', 'rating': 'N/A', 'total_reviews': 'N/A', 'category': 'N/A', 'google_maps_url': 'N/A'}
-            
-            # Try to extract google_maps_url from listing card href
-            try:
-                listing_href = listing.get_attribute('href') or ''
-                listing_href = listing_href.strip()
-                if listing_href and not is_ui_noise(listing_href):
-                    if any(x in listing_href for x in ['#rlimm=', 'ludocid=', 'cid=', '/maps', 'google.com/maps']):
-                        listing_data['google_maps_url'] = listing_href
-                        print(f"DEBUG: Extracted google_maps_url from listing card: {listing_href}")
-            except:
-                pass
-            try:
-                # Try to find name/address/rating/reviews/category in the result card before clicking
-                card_text = listing.text
-                if card_text:
-                    lines = [line.strip() for line in card_text.split('\n') if line.strip()]
-                    if lines:
-                        # Pick the first non-noise line as name (skip "Sponsored")
-                        for line in lines:
-                            candidate = clean_name_value(line)
-                            if candidate and not is_ui_noise(candidate):
-                                listing_data['name'] = candidate
-                                break
-                    
-                    # Extract rating and reviews from the card text (e.g., "4.8(312)")
-                    pattern = r'(\d+\.?\d*)\s*\(\s*(\d+\.?\d*\s*[KMB]?|\d{1,3}(?:,\d{3})*)\s*\)'
-                    match = re.search(pattern, card_text, re.IGNORECASE)
-                    if match:
-                        rating_val = match.group(1)
-                        reviews_val = match.group(2).replace(',', '').strip()
-                        try:
-                            rating_float = float(rating_val)
-                            if 0.0 <= rating_float <= 5.0:
-                                listing_data['rating'] = str(rating_float)
-                                listing_data['total_reviews'] = reviews_val
-                                print(f"DEBUG: Extracted from listing card - Rating: {rating_val}, Reviews: {reviews_val}")
-                        except ValueError:
-                            pass
-                    
-                    # CATEGORY EXTRACTION DISABLED FROM LISTING CARD
-                    # We only want category from the DETAIL PANEL after clicking
-                    # Not from the listing preview (which may show generic terms like "Dentist")
-                    
-                    # Pattern 2: DISABLED - If not found, try looking at lines directly
-                    # if listing_data['category'] == 'N/A' and len(lines) > 1:
-                    #     for line in lines[1:4]:  # Check lines 2-4
-                    #         # Common category keywords
-                    #         category_indicators = ['shop', 'store', 'restaurant', 'bar', 'cafe', 'salon', 'service', 
-                    #                               'center', 'clinic', 'hospital', 'hotel', 'gym', 'studio', 'office',
-                    #                               'company', 'agency', 'firm', 'market', 'bakery', 'lounge', 'club']
-                    #         if any(indicator in line.lower() for indicator in category_indicators):
-                    #             # Make sure it's not an address or other data
-                    #             if not any(x in line.lower() for x in ['street', 'st,', 'ave', 'road', 'rd,', 'blvd', 'united states', 'open', 'close', '+1 ', 'http']):
-                    #                 if len(line) < 50:
-                    #                     listing_data['category'] = line
-                    #                     print(f"DEBUG: Extracted category from listing card (pattern 2): {line}")
-                    #                     break
-            except Exception as e:
-                print(f"DEBUG: Error extracting from listing card: {e}")
-                pass
-            
-            # Pattern 3: DISABLED - Try to find category element directly in the listing
-            # We only want category from detail panel, not from listing preview
-
-
-            # Scroll into view
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", listing)
-            time.sleep(randint(0, 1))  # Reduced from randint(1, 2) to randint(0, 1)
+            # 1. Basic info from the harvested card (fallback for the detail panel)
+            listing_data = parse_listing_card(card)
+
+            # 2. Fresh handle on just this card, by its stable marker/href
+            listing = locate_listing(driver, card, successful_selector)
+            if listing is None:
+                print(f"[WARNING] Listing {i+1} is no longer on the page, skipping")
+                if stats is not None:
+                    stats.incr('listings_lost')
+                continue
 
-            # Check termination before clicking
-            if termination_flag and termination_flag():
+            # Scroll into view (and arm the readiness observer with a per-click token)
+            click_token = uuid.uuid4().hex
+            if panel_wait_mode == "observer":
+                driver.execute_script(ARM_PANEL_SCRIPT, listing, click_token, PANEL_HEADING_SELECTORS, sorted(UI_NOISE_VALUES))
+            else:
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", listing)
+            # Wait for click budget (shared by every browser) instead of a fixed random sleep
+            if not pace(driver, 'click', listing_flag, stats) or (termination_flag and termination_flag()):
                 print(f"[TERMINATION] Terminating before clicking listing {i+1}")
                 return all_businesses
 
-            # Get listing information before clicking
-            listing_text = listing.text[:50] if listing.text else "NO TEXT"
-            print(f"DEBUG: About to click listing {i+1}, text preview: '{listing_text}...'")
+            print(f"DEBUG: About to click listing {i+1}, text preview: '{card_text[:50] or 'NO TEXT'}...'")
 
             # Click
+            clicked_at = time.time()
             try:
                 # Try clicking the parent or the link
                 listing.click()
@@ -983,28 +1497,65 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
 
             # Wait for content or panel to load with dynamic checking
             print(f"DEBUG: Waiting for detail page to load after click {i+1}")
-            wait = WebDriverWait(driver, 8)  # Reduced timeout
-            try:
-                # Wait for the main content to be present instead of fixed time
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1.DUwDvf, h2.qrShPb, [role='heading']")))
-            except TimeoutException:
-                # If main elements don't load, wait a bit more but check termination
-                for _ in range(3):
-                    if termination_flag and termination_flag():
-                        print(f"[TERMINATION] Terminating during wait for panel load")
-                        return all_businesses
-                    time.sleep(0.5)
-            # Ensure the detail panel updated to the new listing
-            if last_detail_name:
+            panel_ready = False
+            if panel_wait_mode == "observer":
+                readiness = wait_for_panel_ready(driver, click_token, termination_flag=listing_flag)
+                panel_ready = readiness.get('ready', False)
+                print(f"DEBUG: Panel readiness for listing {i+1}: {readiness.get('reason')} after {readiness.get('elapsed_ms')} ms")
+                if not panel_ready and stats is not None:
+                    stats.incr('panel_ready_timeouts')
+                if termination_flag and termination_flag():
+                    print(f"[TERMINATION] Terminating during wait for panel load")
+                    return all_businesses
+            else:
+                wait = CancellableWait(driver, 8, listing_flag)  # Reduced timeout
                 try:
-                    wait.until(lambda d: get_panel_name_text(d) and get_panel_name_text(d) != last_detail_name)
-                except:
-                    pass
+                    # Wait for the main content to be present instead of fixed time
+                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1.DUwDvf, h2.qrShPb, [role='heading']")))
+                except TimeoutException:
+                    # If main elements don't load, wait a bit more but check termination
+                    for _ in range(3):
+                        if termination_flag and termination_flag():
+                            print(f"[TERMINATION] Terminating during wait for panel load")
+                            return all_businesses
+                        interruptible_sleep(0.5, listing_flag)
+                # Ensure the detail panel updated to the new listing
+                if last_detail_name:
+                    try:
+                        wait.until(lambda d: get_panel_name_text(d) and get_panel_name_text(d) != last_detail_name)
+                    except:
+                        pass
+            panel_wait_ms = (time.time() - clicked_at) * 1000
 
             # Extract detailed data
             current_page_url = driver.current_url
             print(f"DEBUG: About to extract detail panel for listing {i+1}, current URL: {current_page_url[-50:]}")
-            business_data = extract_detail_panel(driver, listing_data)
+            extract_commands_start = commands.count if commands else 0
+            extract_started = time.time()
+            if extraction_mode == "script":
+                business_data = extract_detail_panel_script(driver, listing_data)
+                if business_data is None:
+                    print("DEBUG: Falling back to Selenium extraction")
+                    if stats is not None:
+                        stats.incr('script_fallbacks')
+                    business_data = extract_detail_panel(driver, listing_data, panel_ready=panel_ready,
+                                                         termination_flag=listing_flag)
+            else:
+                business_data = extract_detail_panel(driver, listing_data, panel_ready=panel_ready,
+                                                     termination_flag=listing_flag)
+            if recorder:
+                recorder.record_panel(driver, i)
+            if stats is not None:
+                stats.incr('listings_visited')
+                stats.observe('panel_wait_ms', round(panel_wait_ms, 1))
+                stats.observe('extract_ms', round((time.time() - extract_started) * 1000, 1))
+                stats.observe('listing_latency_ms', round((time.time() - clicked_at) * 1000, 1))
+                if commands:
+                    extract_commands = commands.count - extract_commands_start
+                    listing_commands = commands.count - listing_commands_start
+                    stats.observe('extract_commands_per_listing', extract_commands)
+                    stats.observe('webdriver_commands_per_listing', listing_commands)
+                    print(f"DEBUG: WebDriver commands for listing {i+1}: {listing_commands} total, {extract_commands} for extraction ({extraction_mode})")
             if business_data and business_data.get('name') and business_data.get('name') != "N/A":
                 last_detail_name = business_data.get('name')
 
@@ -1015,26 +1566,35 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
             if business_data and business_data.get('name') != "N/A":
                 maps_url = business_data.get('google_maps_url', '').strip()
                 if seen_maps_urls is not None and is_valid_maps_url(maps_url):
-                    if maps_url in seen_maps_urls:
+                    # Check-and-add in one step: other page workers share this set
+                    if not seen_maps_urls.add_new(maps_url):
                         print(f"[WARNING] Duplicate google_maps_url detected, skipping: {maps_url}")
+                        if stats is not None:
+                            stats.incr('duplicates_after_click')
                         continue
-                    seen_maps_urls.add(maps_url)
+                # Cards without an identifier are only known after the click
+                panel_key = '' if card_key else business_key(maps_url)
+                if panel_key and seen_businesses is not None and not seen_businesses.add_new(panel_key):
+                    print(f"[WARNING] Business {panel_key} was already scraped in this job, skipping")
+                    if stats is not None:
+                        stats.incr('duplicates_after_click')
+                    continue
 
                 if not has_core_details(business_data):
                     print("[WARNING] Skipping item with missing core details (address/category)")
                 else:
                     all_businesses.append(business_data)
-
-                    # Ensure all expected fields are present in business_data
-                    for field in fieldnames:
-                        if field not in business_data:
-                            business_data[field] = "N/A"
-
-                    # Save to CSV immediately and flush to disk
-                    with open(csv_filepath, 'a', newline='', encoding='utf-8') as csvfile:
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                        writer.writerow(business_data)
-                        csvfile.flush()
+                    save_business_row(business_data, fieldnames, csv_writer, csv_filepath)
+                    stored_key = card_key or business_key(maps_url)
+                    stored_row = {field: business_data[field] for field in fieldnames}
+                    if business_index is not None:
+                        business_index.add(stored_key, stored_row)
+                    if detail_cache is not None:
+                        detail_cache.put(stored_key, stored_row)
+
+                    if event_callback:
+                        event_callback('row_scraped', name=business_data.get('name', 'N/A'),
+                                       total_rows=len(all_businesses))
 
                     # Display comprehensive information
                     name = business_data.get('name', 'N/A')
@@ -1063,10 +1623,13 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
                 print(f"[TERMINATION] Terminating after processing listing {i+1}")
                 return all_businesses
 
-            time.sleep(randint(0, 1))  # Reduced wait time
-
         except Exception as e:
             print(f"[ERROR] Error on listing {i+1}: {e}")
+            if not (termination_flag and termination_flag()) and not driver_alive(driver):
+                # Every further listing would fail too: hand this one back so it is retried on a new browser
+                if card_key and seen_businesses is not None:
+                    seen_businesses.discard(card_key)
+                raise DriverLostError(i, e)
             try:
                 # Check termination before error recovery
                 if termination_flag and termination_flag():
@@ -1079,7 +1642,7 @@ def scrape_current_page(driver, all_businesses, csv_filepath, fieldnames, locati
     return all_businesses
 
 
-def click_next_page_with_termination(driver, termination_flag):
+def click_next_page_with_termination(driver, termination_flag, stats=None):
     """Click next page button with termination check - IMPROVED VERSION from test.py"""
 
     # Check termination before starting
@@ -1088,26 +1651,14 @@ def click_next_page_with_termination(driver, termination_flag):
 
     # Scroll to bottom first
     driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-    time.sleep(1)  # Reduced from 2 to 1 second
+    interruptible_sleep(1, termination_flag)  # Reduced from 2 to 1 second
 
     # Check termination after scrolling
     if termination_flag and termination_flag():
         return False
 
     # Try multiple next button selectors
-    next_selectors = [
-        'a#pnnext',  # Standard Google next button
-        'a[aria-label*="Next"]',
-        'a[aria-label*="next"]',
-        'td.b a',  # Pagination table cell
-        'span.SJajHc.NVbCr a',  # Google pagination
-        'a.nBDE1b.G5eFlf',  # Another pagination selector
-        '#pnnext',
-        'span[style*="background:url"] a',  # Next arrow image
-        'table#nav td:last-child a',  # Last pagination cell
-    ]
-
-    for selector in next_selectors:
+    for selector in NEXT_BUTTON_SELECTORS:
         # Check termination before trying each selector
         if termination_flag and termination_flag():
             return False
@@ -1116,7 +1667,7 @@ def click_next_page_with_termination(driver, termination_flag):
             print(f"🔍 Trying selector: {selector}")
 
             # Wait for element with shorter timeout
-            wait = WebDriverWait(driver, 5)
+            wait = CancellableWait(driver, 5, termination_flag)
             next_button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
 
             # Check termination after finding element
@@ -1135,7 +1686,8 @@ def click_next_page_with_termination(driver, termination_flag):
             if termination_flag and termination_flag():
                 return False
 
-            time.sleep(0.5)  # Reduced from 1 to 0.5 seconds
+            if not pace(driver, 'navigate', termination_flag, stats):
+                return False
 
             # Try clicking
             try:
@@ -1144,7 +1696,13 @@ def click_next_page_with_termination(driver, termination_flag):
                 driver.execute_script("arguments[0].click();", next_button)
 
             print("✅ Next button clicked successfully!")
-            time.sleep(randint(2, 4))  # Reduced wait for page load
+            # Wait for the old page to go away and the new one to load, not a fixed sleep
+            try:
+                CancellableWait(driver, 10, termination_flag).until(EC.staleness_of(next_button))
+                CancellableWait(driver, 10, termination_flag).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete")
+            except TimeoutException:
+                print("DEBUG: Next page still loading after 10s, continuing")
 
             # Check termination after clicking
             if termination_flag and termination_flag():
@@ -1159,11 +1717,383 @@ def click_next_page_with_termination(driver, termination_flag):
     return False
 
 
-def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=None, termination_flag=None, job_id=None, thread_drivers=None):
-    """Main scraping with UNLIMITED pagination - Scrapes ALL available results from test.py"""
+def build_next_page_url(current_url, step):
+    """Same search URL (q, udm=1, ...) with the start offset advanced by `step`, fragment dropped"""
+    parts = urllib.parse.urlsplit(current_url)
+    params = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k != 'start']
+    params.append(('start', str(start_offset(current_url) + step)))
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, urllib.parse.urlencode(params), ''))
+
+
+def read_pagination_state(driver):
+    """Next link href, weaker next control and listing count of the current page, in one script call"""
+    try:
+        return driver.execute_script(
+            PAGINATION_STATE_SCRIPT, NEXT_LINK_SELECTORS, NEXT_BUTTON_SELECTORS[len(NEXT_LINK_SELECTORS):],
+            LISTING_SELECTORS
+        ) or {}
+    except Exception as e:
+        print(f"DEBUG: Pagination check failed ({e}), falling back to the next button")
+        return {'next_href': '', 'fallback_next': True, 'listing_count': 0}
+
+
+def page_step(state, current_url):
+    """How far `start` moves per results page, taken from the page's own next link"""
+    step = start_offset(state.get('next_href') or '') - start_offset(current_url)
+    if step <= 0:
+        step = state.get('listing_count') or DEFAULT_PAGE_STEP
+    return step
+
+
+def goto_next_page(driver, termination_flag, stats=None):
+    """Open the next results page by URL, clicking the button only as a fallback.
+
+    One injected script checks the page for a next link: if there is none at
+    all the results are over (no waiting on selectors); if only a
+    non-link next control exists the old button clicking takes over.
+    Returns (moved, reason).
+    """
+    if termination_flag and termination_flag():
+        return False, "terminated"
+
+    state = read_pagination_state(driver)
+
+    next_href = state.get('next_href') or ''
+    if not next_href:
+        if state.get('fallback_next'):
+            if stats is not None:
+                stats.incr('pagination_fallbacks')
+            return click_next_page_with_termination(driver, termination_flag, stats), "button"
+        print("✓ No next page link: end of results")
+        return False, "end"
+
+    current_url = driver.current_url
+    next_url = build_next_page_url(current_url, page_step(state, current_url))
+
+    if not pace(driver, 'navigate', termination_flag, stats) or (termination_flag and termination_flag()):
+        return False, "terminated"
+    try:
+        print(f"DEBUG: Opening next page directly: {next_url}")
+        if load_page(driver, next_url, termination_flag=termination_flag) == 'blocked':
+            return False, "blocked"
+    except Exception as e:
+        print(f"DEBUG: Direct navigation failed ({e}), falling back to the next button")
+        if stats is not None:
+            stats.incr('pagination_fallbacks')
+        return click_next_page_with_termination(driver, termination_flag, stats), "button"
+
+    if termination_flag and termination_flag():
+        return False, "terminated"
+    return True, "url"
+
+
+def handle_consent(driver, pooled=None, termination_flag=None):
+    """Click through the consent dialog; False if the job was terminated meanwhile.
+
+    Pooled browsers keep their cookies, so consent only needs handling once per browser.
+    """
+    if pooled and pooled.consent_handled:
+        return True
+    print(f"DEBUG: Checking for consent/popups...")
+
+    for by, val in CONSENT_BUTTON_LOCATORS:
+        try:
+            # Check termination flag before clicking consent
+            if termination_flag and termination_flag():
+                return False
+
+            btn = driver.find_element(by, val)
+            if btn.is_displayed():
+                btn.click()
+                print(f"DEBUG: Clicked consent button: {val}")
+                interruptible_sleep(1, termination_flag)  # Reduced from 2 to 1 second
+                break
+        except:
+            continue
+    if pooled:
+        pooled.consent_handled = True
+    return True
+
+
+def skip_to_page(driver, pages_done, termination_flag=None, stats=None):
+    """Open the results page that follows the first `pages_done` pages (resuming a checkpoint).
+
+    The browser must be on the first results page; the target is opened by
+    its start offset whatever the pagination mode. Returns 'ok', 'end' when
+    the results no longer reach that far, 'blocked' or 'terminated'.
+    """
+    current_url = driver.current_url
+    state = read_pagination_state(driver)
+    if not state.get('next_href'):
+        return 'end'
+    url = build_next_page_url(current_url, page_step(state, current_url) * pages_done)
+    if not pace(driver, 'navigate', termination_flag, stats) or (termination_flag and termination_flag()):
+        return 'terminated'
+    print(f"DEBUG: Resuming at page {pages_done + 1}: {url}")
+    outcome = load_page(driver, url, stats, 'next_page_ms', termination_flag)
+    if outcome in ('blocked', 'terminated'):
+        return outcome
+    if not read_pagination_state(driver).get('listing_count'):
+        return 'end'
+    return 'ok'
+
+
+def replace_browser(driver, pooled=None, driver_pool=None, commands=None, stats=None):
+    """A new browser in place of one that crashed (same pool lease when pooled); returns its driver"""
+    if pooled is not None:
+        driver = driver_pool.replace(pooled).driver
+    else:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        driver = create_driver()
+    if commands:
+        commands.rebind(driver)
+    if stats is not None:
+        stats.incr('driver_recoveries')
+    return driver
+
+
+def recover_driver(driver, pooled, driver_pool, commands, search_url, pages_done, termination_flag=None, stats=None):
+    """Replace a crashed browser and reopen the results page that follows `pages_done` pages.
+
+    Returns (driver, outcome): outcome 'ok' when the new browser is on that
+    page, else why not ('blocked', 'end', 'terminated', ...).
+    """
+    driver = replace_browser(driver, pooled, driver_pool, commands, stats)
+    if not pace(driver, 'navigate', termination_flag, stats):
+        return driver, 'terminated'
+    outcome = load_page(driver, search_url, stats, 'page_load_ms', termination_flag)
+    if outcome != 'ok':
+        return driver, outcome
+    if pooled:
+        pooled.mark_page()
+    if not handle_consent(driver, pooled, termination_flag):
+        return driver, 'terminated'
+    if pages_done:
+        outcome = skip_to_page(driver, pages_done, termination_flag, stats)
+        if outcome == 'ok' and pooled:
+            pooled.mark_page()
+    return driver, outcome
+
+
+def scrape_query_fanout(driver, pooled, driver_pool, job_id, page_workers, location, fieldnames, termination_flag,
+                        seen_maps_urls, merger, extraction_mode, stats, commands, panel_wait_mode,
+                        event_callback, max_pages=MAX_RESULT_PAGES, seen_businesses=None, business_index=None,
+                        known_business_mode="off", detail_cache=None, detail_cache_ttl=None, first_page=0):
+    """Scrape one query's result pages in parallel across pooled browsers.
+
+    `driver` is on the first results page. Page N is opened directly at
+    start=N*step, so up to `page_workers` browsers (this one plus any the
+    pool has free right now, never waiting for one) work through the pages
+    at the same time. They share `seen_maps_urls`/`seen_businesses`; finished pages go to
+    `merger` (a fanout.OrderedPageMerger owned by the caller, which also
+    holds the pages written before a failure). `first_page` > 0 (resuming a
+    checkpoint) starts at that page index instead of scraping the first page.
+    A block page ends the fan-out at the page before it; that page is left
+    out of the CSV so the query can be resumed there.
+    Returns (rows, pages_scraped, blocked_url), blocked_url None unless a page
+    was blocked, or None when the first page has no next link to take the step from.
+    """
+    first_url = driver.current_url
+    state = read_pagination_state(driver)
+    if not state.get('next_href'):
+        return None
+    step = page_step(state, first_url)
+
+    fanout = PageFanout(first_page=max(1, first_page), max_pages=max_pages)
+    pages_scraped = itertools.count(1)
+    rows_scraped = itertools.count(1)
+    print(f"DEBUG: Fanning out pages across up to {page_workers} browsers (start step {step})")
+
+    def page_events(page):
+        if not event_callback:
+            return None
+
+        def callback(event_type, **data):
+            if event_type == 'row_scraped':
+                data['total_rows'] = next(rows_scraped)
+            event_callback(event_type, page=page + 1, **data)
+        return callback
+
+    # Rows of each page being scraped; kept across a browser crash so the retry only adds to them
+    buffers = {}
+    # Block page URL by page; those pages stay a gap in the merger
+    blocked = {}
+
+    def scrape_page(page_driver, page_commands, page, start_index=0):
+        buffer = buffers.setdefault(page, PageBuffer())
+        page_flag = child_token(termination_flag, PAGE_DEADLINE)
+        scrape_current_page(
+            page_driver,
+            [],
+            "",
+            fieldnames,
+            location,
+            page_flag,
+            seen_maps_urls=seen_maps_urls,
+            seen_businesses=seen_businesses,
+            business_index=business_index,
+            known_business_mode=known_business_mode,
+            detail_cache=detail_cache,
+            detail_cache_ttl=detail_cache_ttl,
+            extraction_mode=extraction_mode,
+            stats=stats,
+            commands=page_commands,
+            panel_wait_mode=panel_wait_mode,
+            event_callback=page_events(page),
+            csv_writer=buffer,
+            start_index=start_index
+        )
+        next(pages_scraped)
+        return buffers.pop(page).rows
+
+    def recover(page_driver, page_pooled, page_commands, error):
+        """New browser for a page worker whose browser crashed, or None to give up on it"""
+        if (termination_flag and termination_flag()) or page_pooled is None or driver_alive(page_driver):
+            return None
+        try:
+            print(f"[WARNING] Browser #{page_pooled.driver_id} crashed ({error}), replacing it")
+            return replace_browser(page_driver, page_pooled, driver_pool, page_commands, stats)
+        except Exception as e:
+            print(f"[ERROR] Could not replace crashed browser: {e}")
+            return None
+
+    def scrape_pages(page_driver, page_pooled, page_commands, retry=None):
+        recoveries = 0
+        while not (termination_flag and termination_flag()):
+            page, start_index = retry or (fanout.claim(), 0)
+            retry = None
+            if page is None:
+                return
+            rows = None
+            try:
+                url = build_next_page_url(first_url, page * step)
+                print(f"DEBUG: Opening page {page + 1} directly: {url}")
+                if not pace(page_driver, 'navigate', termination_flag, stats):
+                    return
+                if load_page(page_driver, url, stats, 'next_page_ms', termination_flag) == 'blocked':
+                    blocked[page] = page_driver.current_url
+                    fanout.mark_end(page - 1)
+                    continue
+                if page_pooled:
+                    page_pooled.mark_page()
+                if not handle_consent(page_driver, page_pooled, termination_flag):
+                    return
+
+                page_state = read_pagination_state(page_driver)
+                if not page_state.get('listing_count') and not page_state.get('next_href'):
+                    print(f"✓ Page {page + 1} is past the end of results")
+                    fanout.mark_end(page - 1)
+                    continue
+                if not page_state.get('next_href') and not page_state.get('fallback_next'):
+                    fanout.mark_end(page)
+
+                print(f"\n📄 SCRAPING PAGE {page + 1} (browser {page_pooled.driver_id if page_pooled else '-'})")
+                rows = scrape_page(page_driver, page_commands, page, start_index)
+                print(f"\n✅ Scraped {len(rows)} new businesses from page {page + 1}")
+                if event_callback:
+                    event_callback('page_advanced', page=page + 1, total_rows=len(merger.rows) + len(rows))
+            except Exception as e:
+                print(f"[ERROR] Page {page + 1} failed: {e}")
+                new_driver = recover(page_driver, page_pooled, page_commands, e) if recoveries < MAX_DRIVER_RECOVERIES else None
+                if new_driver is not None:
+                    recoveries += 1
+                    page_driver = new_driver
+                    retry = (page, getattr(e, 'listing_index', start_index))
+            finally:
+                if retry is None and page not in blocked:
+                    merger.complete(page, rows if rows is not None else buffers.pop(page, PageBuffer()).rows)
+
+    def extra_worker():
+        try:
+            # Only browsers the pool can hand out right now; never queue behind other jobs
+            extra = driver_pool.acquire(job_id=job_id, timeout=0)
+        except (TimeoutError, RuntimeError):
+            return
+        except Exception as e:
+            print(f"[WARNING] Could not start an extra browser for page fan-out: {e}")
+            return
+        extra_commands = CommandCounter(extra.driver).start() if stats is not None else None
+        try:
+            scrape_pages(extra.driver, extra, extra_commands)
+        finally:
+            if extra_commands:
+                extra_commands.stop()
+                stats.incr('webdriver_commands', extra_commands.count)
+            driver_pool.release(extra)
+
+    threads = [threading.Thread(target=extra_worker, name=f"page-worker-{n}", daemon=True)
+               for n in range(1, page_workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        retry = None
+        if first_page == 0:
+            print(f"\n📄 SCRAPING PAGE 1")
+            first_rows = None
+            try:
+                first_rows = scrape_page(driver, commands, 0)
+            except Exception as e:
+                new_driver = recover(driver, pooled, commands, e)
+                if new_driver is None:
+                    raise
+                driver = new_driver
+                retry = (0, getattr(e, 'listing_index', 0))
+            finally:
+                if retry is None:
+                    merger.complete(0, first_rows if first_rows is not None else buffers.pop(0, PageBuffer()).rows)
+            if event_callback and first_rows is not None:
+                event_callback('page_advanced', page=1, total_rows=len(first_rows))
+        scrape_pages(driver, pooled, commands, retry)
+    except Exception:
+        # Hand out no more pages; the workers stop after the page they are on
+        fanout.mark_end(-1)
+        raise
+    finally:
+        # Joined before the caller closes the CSV writer the workers write to
+        for thread in threads:
+            thread.join()
+    return merger.finish(), next(pages_scraped) - 1, blocked[min(blocked)] if blocked else None
+
+
+def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=None, termination_flag=None, job_id=None, driver_pool=None,
+                         extraction_mode="script", stats=None, panel_wait_mode="observer", event_callback=None,
+                         pagination_mode="url", page_workers=1, seen_businesses=None, business_index=None,
+                         known_business_mode="off", detail_cache=None, detail_cache_ttl=None,
+                         resume=None, on_checkpoint=None):
+    """Main scraping with UNLIMITED pagination - Scrapes ALL available results from test.py
+
+    When a DriverPool is given the browser is leased from it (and returned warm
+    afterwards); otherwise a private Chrome is started and quit at the end.
+    `stats` (a metrics.ScrapeStats) collects counters shared by the whole job.
+    `event_callback(event_type, **data)` is told about 'page_advanced' and
+    'row_scraped' progress as it happens.
+    pagination_mode "url" opens the next page by its start offset (button
+    clicking as fallback); "click" always hunts for the next button.
+    page_workers > 1 (url mode with a pool) scrapes later pages in parallel
+    on whatever extra browsers the pool has free; see scrape_query_fanout().
+    `seen_businesses` (a fanout.SeenSet) lets all queries of a job skip
+    businesses another query already scraped; by default it is per query.
+    `business_index` / known_business_mode and `detail_cache` / detail_cache_ttl:
+    see scrape_current_page().
+    `resume` (a checkpoint: 'page' pages done and their 'rows') continues an
+    interrupted scrape at the next page, and `on_checkpoint(page, rows,
+    csv_bytes)` is called after every results page is safely in the CSV.
+    If the browser crashes, a new one (same pool lease) reopens the page and
+    carries on at the listing it died on, up to MAX_DRIVER_RECOVERIES times;
+    job stats count these as driver_recoveries.
+    """
 
-    import urllib.parse
     driver = None
+    pooled = None
+    commands = None
+    csv_writer = None
+    merger = None
+    resumed_rows = []
+    all_businesses = []
     try:
         # Check termination flag before starting
         if termination_flag and termination_flag():
@@ -1175,44 +2105,16 @@ def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=
             fieldnames = ['name', 'rating', 'total_reviews', 'category', 'address',
                          'phone', 'website', 'price_range', 'hours_status', 'google_maps_url', 'search_location']
 
-        # Chrome Options from test.py
-        option = webdriver.ChromeOptions()
-        # option.add_argument("--headless")
-        option.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
-        option.add_argument("--disable-blink-features=AutomationControlled")
-        option.add_experimental_option("useAutomationExtension", False)
-        option.add_argument('--disable-infobars')
-        option.add_experimental_option("excludeSwitches", ["enable-automation"])
-        option.add_argument("--start-maximized")
-        option.add_argument("--disable-search-engine-choice-screen")
-        option.add_argument("--disable-dev-shm-usage")
-        option.add_argument("--no-sandbox")
-        option.add_argument("--disable-gpu")
-        option.add_argument("--disable-features=IsolateOrigins,site-per-process")
-        # Suppress Errors and Noise
-        option.add_argument("--log-level=3")
-        option.add_argument("--silent")
-        option.add_argument("--disable-logging")
-        option.add_argument("--disable-background-networking")
-        option.add_argument("--disable-sync")
-        option.add_argument("--no-first-run")
-        option.add_argument("--ignore-certificate-errors")
-        option.add_argument("--ignore-ssl-errors")
-        option.add_argument("--allow-running-insecure-content")
-
-        print(f"DEBUG: Starting Chrome for query: {search_query}")
+        print(f"DEBUG: Leasing browser for query: {search_query}")
         try:
-            driver = webdriver.Chrome(options=option)
-            driver.set_page_load_timeout(8)  # Further reduced timeout to allow faster interruption
-            # Hide automation flag from test.py
-            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-                "source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            })
-            print(f"DEBUG: Browser opened successfully for query: {search_query}")
-
-            # Register the driver with the job_id if provided and thread_drivers is not None
-            if job_id and thread_drivers is not None:
-                thread_drivers[job_id] = driver
+            if driver_pool is not None:
+                pooled = driver_pool.acquire(job_id=job_id)
+                driver = pooled.driver
+            else:
+                driver = create_driver()
+            print(f"DEBUG: Browser ready for query: {search_query}")
+            if stats is not None:
+                commands = CommandCounter(driver).start()
         except Exception as e:
             print(f"[CRITICAL] Failed to initialize Chrome: {e}")
             return []
@@ -1222,88 +2124,119 @@ def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=
         else:
             query = search_query
 
-        search_url = f"https://www.google.com/search?q={urllib.parse.quote_plus(query)}&udm=1"
+        search_url = f"{SEARCH_BASE_URL}/search?q={urllib.parse.quote_plus(query)}&udm=1"
 
         print(f"\n🔍 Searching: {query}")
         print(f"🌐 URL: {search_url}")
         print(f"♾️  Mode: UNLIMITED - Will scrape ALL available pages!\n")
 
-        # Check termination flag before navigating
-        if termination_flag and termination_flag():
+        # Check termination flag before navigating (waiting for navigation budget if needed)
+        if not pace(driver, 'navigate', termination_flag, stats) or (termination_flag and termination_flag()):
             print(f"[TERMINATION] Job terminated before navigation for query: {search_query}")
             return []
 
-        driver.get(search_url)
+        if load_page(driver, search_url, stats, 'page_load_ms', termination_flag) == 'blocked':
+            # Nothing scraped yet: let the caller retry the query once the breaker lets it
+            raise BlockedError(driver.current_url)
+        if pooled:
+            pooled.mark_page()
 
         # Check termination flag after navigation
         if termination_flag and termination_flag():
             print(f"[TERMINATION] Job terminated after navigation for query: {search_query}")
             return []
 
-        time.sleep(2)  # Reduced from 3 to 2 seconds
+        if not wait_for_results_page(driver, termination_flag):
+            print(f"[TERMINATION] Job terminated after navigation for query: {search_query}")
+            return []
         
         # Validate URL - check if we're on a valid search page
         current_url = driver.current_url
-        invalid_urls = [
-            'support.google.com',
-            'accounts.google.com',
-            'policies.google.com',
-            'google.com/sorry',
-            'google.com/webhp',
-            'google.com/preferences'
-        ]
-        
-        if any(invalid in current_url for invalid in invalid_urls):
+        if redirect_outcome(current_url) == 'redirect':
             print(f"[ERROR] Redirected to invalid page: {current_url}")
             print(f"[ERROR] Google may have blocked the request or there are no results")
             return []
         
         # Check for "no results" message
         try:
-            no_results_indicators = [
-                "did not match any documents",
-                "No results found",
-                "Try different keywords",
-                "did not match any places"
-            ]
             page_text = driver.find_element(By.TAG_NAME, 'body').text
-            if any(indicator in page_text for indicator in no_results_indicators):
+            if any(indicator in page_text for indicator in NO_RESULTS_INDICATORS):
                 print(f"[WARNING] No results found for query: {query}")
+                report_page('empty')
                 return []
         except:
             pass
 
         # Handle consent - Improved from test.py
-        print(f"DEBUG: Checking for consent/popups...")
-        consent_button_locators = [
-            (By.XPATH, "//button[contains(., 'Accept all')]"),
-            (By.XPATH, "//button[contains(., 'Reject all')]"),
-            (By.XPATH, "//button[contains(., 'I agree')]"),
-            (By.ID, "L2AGLb"),
-        ]
+        if not handle_consent(driver, pooled, termination_flag):
+            print(f"[TERMINATION] Job terminated during consent for query: {search_query}")
+            return []
 
-        for by, val in consent_button_locators:
-            try:
-                # Check termination flag before clicking consent
-                if termination_flag and termination_flag():
-                    print(f"[TERMINATION] Job terminated during consent for query: {search_query}")
-                    return []
-
-                btn = driver.find_element(by, val)
-                if btn.is_displayed():
-                    btn.click()
-                    print(f"DEBUG: Clicked consent button: {val}")
-                    time.sleep(1)  # Reduced from 2 to 1 second
-                    break
-            except:
-                continue
+        recorder = recorder_for(query)
+        if recorder:
+            recorder.record_page(driver)
 
         all_businesses = []
-        seen_maps_urls = set()
+        seen_maps_urls = SeenSet()
+        if seen_businesses is None:
+            seen_businesses = SeenSet()
+        resumed_pages = 0
+        if resume:
+            resumed_pages = resume['page']
+            all_businesses = list(resume['rows'])
+            seen_maps_urls = SeenSet(row['google_maps_url'] for row in all_businesses if row.get('google_maps_url'))
+            for row in all_businesses:
+                seen_businesses.add_new(business_key(row.get('google_maps_url')))
+            print(f"DEBUG: Resuming after page {resumed_pages} with {len(all_businesses)} rows already in the CSV")
+        # One writer for the whole query instead of reopening the file per row
+        if csv_filepath:
+            csv_writer = BufferedCSVWriter(csv_filepath, fieldnames)
         page_num = 1
-        max_pages = 100  # Safety limit to prevent infinite loops
+        max_pages = MAX_RESULT_PAGES
 
-        while page_num <= max_pages:
+        def save_checkpoint(pages, rows):
+            if on_checkpoint and csv_writer and not (termination_flag and termination_flag()):
+                on_checkpoint(pages, len(rows), csv_writer.checkpoint())
+
+        fanned_out = None
+        if resumed_pages >= max_pages:
+            return all_businesses
+        if page_workers > 1 and pagination_mode == "url" and driver_pool is not None and not recorder:
+            resumed_rows = list(all_businesses)
+            merger = OrderedPageMerger(csv_writer, first_page=resumed_pages,
+                                       on_written=lambda pages, rows: save_checkpoint(pages, resumed_rows + rows))
+            fanned_out = scrape_query_fanout(
+                driver, pooled, driver_pool, job_id, page_workers, location, fieldnames, termination_flag,
+                seen_maps_urls, merger, extraction_mode, stats, commands, panel_wait_mode,
+                event_callback, max_pages=max_pages, seen_businesses=seen_businesses,
+                business_index=business_index, known_business_mode=known_business_mode,
+                detail_cache=detail_cache, detail_cache_ttl=detail_cache_ttl, first_page=resumed_pages
+            )
+            if fanned_out is None:
+                # No next link: the pages are scraped one by one below
+                merger = None
+            else:
+                rows, page_num, blocked_url = fanned_out
+                all_businesses = resumed_rows + rows
+                page_num += resumed_pages
+                if blocked_url:
+                    # Let the caller resume after the last checkpointed page once the breaker lets it
+                    raise BlockedError(blocked_url, rows=all_businesses)
+
+        if fanned_out is None and resumed_pages:
+            skipped = skip_to_page(driver, resumed_pages, termination_flag, stats)
+            if skipped == 'blocked':
+                raise BlockedError(driver.current_url, rows=all_businesses)
+            if skipped != 'ok':
+                print(f"DEBUG: Nothing left to resume after page {resumed_pages} ({skipped})")
+                return all_businesses
+            page_num = resumed_pages + 1
+            if pooled:
+                pooled.mark_page()
+
+        start_index = 0
+        recoveries = 0
+        while fanned_out is None and page_num <= max_pages:
             # Check termination flag at the beginning of each page iteration
             if termination_flag and termination_flag():
                 print(f"[TERMINATION] Job terminated during page {page_num} for query: {search_query}")
@@ -1314,33 +2247,94 @@ def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=
             print(f"📊 Current total: {len(all_businesses)}")
             print("=" * 80 + "\n")
 
-            # Scrape current page with termination check
-            previous_count = len(all_businesses)
-            all_businesses = scrape_current_page(
-                driver,
-                all_businesses,
-                csv_filepath,
-                fieldnames,
-                location,
-                termination_flag,
-                seen_maps_urls=seen_maps_urls
-            )
-
-            # Check if any new results were added
-            new_results = len(all_businesses) - previous_count
-            print(f"\n✅ Scraped {new_results} new businesses from page {page_num}")
+            page_done = False
+            # The page deadline ends this page only; the query goes on with the next one
+            page_flag = child_token(termination_flag, PAGE_DEADLINE)
+            try:
+                # Scrape current page with termination check
+                previous_count = len(all_businesses)
+                all_businesses = scrape_current_page(
+                    driver,
+                    all_businesses,
+                    csv_filepath,
+                    fieldnames,
+                    location,
+                    page_flag,
+                    seen_maps_urls=seen_maps_urls,
+                    seen_businesses=seen_businesses,
+                    business_index=business_index,
+                    known_business_mode=known_business_mode,
+                    detail_cache=detail_cache,
+                    detail_cache_ttl=detail_cache_ttl,
+                    extraction_mode=extraction_mode,
+                    stats=stats,
+                    commands=commands,
+                    panel_wait_mode=panel_wait_mode,
+                    event_callback=event_callback,
+                    csv_writer=csv_writer,
+                    recorder=recorder,
+                    start_index=start_index
+                )
+                start_index = 0
+                page_done = True
+                if stats is not None and page_flag is not termination_flag and page_flag.reason == 'deadline':
+                    stats.incr('page_deadlines')
+                if csv_writer:
+                    csv_writer.flush()
+                save_checkpoint(page_num, all_businesses)
+
+                # Check if any new results were added
+                new_results = len(all_businesses) - previous_count
+                print(f"\n✅ Scraped {new_results} new businesses from page {page_num}")
+
+                # Check termination flag before moving to next page
+                if termination_flag and termination_flag():
+                    print(f"[TERMINATION] Job terminated before moving to next page {page_num + 1} for query: {search_query}")
+                    return all_businesses
 
-            # Check termination flag before moving to next page
-            if termination_flag and termination_flag():
-                print(f"[TERMINATION] Job terminated before moving to next page {page_num + 1} for query: {search_query}")
-                return all_businesses
+                # Try to go to next page
+                print(f"\n🔄 Attempting to navigate to page {page_num + 1}...")
 
-            # Try to go to next page
-            print(f"\n🔄 Attempting to navigate to page {page_num + 1}...")
+                next_page_started = time.time()
+                if pagination_mode == "url":
+                    moved, how = goto_next_page(driver, termination_flag, stats=stats)
+                else:
+                    moved, how = click_next_page_with_termination(driver, termination_flag, stats), "button"
+            except Exception as e:
+                if (termination_flag and termination_flag()) or recoveries >= MAX_DRIVER_RECOVERIES or driver_alive(driver):
+                    raise
+                # The browser died: carry on from the same page and listing on a new one, keeping rows and dedup state
+                recoveries += 1
+                resume_page = page_num + 1 if page_done else page_num
+                start_index = 0 if page_done else getattr(e, 'listing_index', start_index)
+                print(f"[WARNING] Browser crashed on page {page_num} ({e}); recovering at page {resume_page}, "
+                      f"listing {start_index + 1} ({recoveries}/{MAX_DRIVER_RECOVERIES})")
+                driver, outcome = recover_driver(driver, pooled, driver_pool, commands, search_url, resume_page - 1,
+                                                 termination_flag, stats)
+                if outcome == 'blocked':
+                    raise BlockedError(driver.current_url, rows=all_businesses)
+                if outcome != 'ok':
+                    print(f"[WARNING] Could not get back to page {resume_page} after the crash ({outcome})")
+                    break
+                page_num = resume_page
+                continue
 
-            if click_next_page_with_termination(driver, termination_flag):
+            if how == "blocked" or (moved and redirect_outcome(driver.current_url) == 'blocked'):
+                # Not the end of results: let the caller resume after this page once the breaker lets it
+                if how != "blocked":
+                    breaker.trip(f"block page at {driver.current_url[:120]}")
+                raise BlockedError(driver.current_url, rows=all_businesses)
+            if moved:
                 page_num += 1
-                print(f"✅ Successfully moved to page {page_num}")
+                if stats is not None:
+                    stats.observe('next_page_ms', round((time.time() - next_page_started) * 1000, 1))
+                if pooled:
+                    pooled.mark_page()
+                if recorder:
+                    recorder.record_page(driver)
+                print(f"✅ Successfully moved to page {page_num} (via {how})")
+                if event_callback:
+                    event_callback('page_advanced', page=page_num, total_rows=len(all_businesses))
 
                 # Check termination flag after moving to next page
                 if termination_flag and termination_flag():
@@ -1354,29 +2348,45 @@ def scrape_google_search(search_query, location="", csv_filepath="", fieldnames=
         print(f"✅ Scraping completed!")
         print(f"📊 Total businesses scraped: {len(all_businesses)}")
         print(f"📄 Total pages scraped: {page_num}")
+        if stats is not None:
+            latency = stats.snapshot().get('listing_latency_ms')
+            if latency:
+                print(f"⏱️  Listing latency ({panel_wait_mode}): p50={latency['p50']} ms, p95={latency['p95']} ms over {latency['count']} listings")
         print("=" * 80)
 
         return all_businesses
 
+    except BlockedError:
+        raise
     except Exception as e:
         print(f"[ERROR] ERROR in scrape_google_search: {e}")
         import traceback
         traceback.print_exc()
-        return []
+        if merger is not None:
+            # Pages the fan-out finished are in the CSV (or go there now) but not in all_businesses yet
+            return resumed_rows + merger.finish()
+        # Rows scraped before the failure are already in the CSV
+        return all_businesses
     finally:
-        if driver:
+        if csv_writer:
+            try:
+                csv_writer.close()
+                if stats is not None:
+                    writer_stats = csv_writer.stats()
+                    stats.incr('csv_flushes', writer_stats['flushes'])
+                    stats.incr('csv_write_syscalls', writer_stats['write_syscalls'])
+            except Exception as e:
+                print(f"[ERROR] Failed to close CSV writer for {csv_filepath}: {e}")
+        if commands:
+            commands.stop()
+            stats.incr('webdriver_commands', commands.count)
+        if pooled:
+            print(f"DEBUG: Returning browser #{pooled.driver_id} to the pool")
+            driver_pool.release(pooled)
+        elif driver:
             print(f"DEBUG: Closing browser for query...")
             try:
                 driver.quit()
                 print(f"Browser closed successfully for query")
             except Exception as e:
                 print(f"DEBUG: Browser already closed or error occurred while closing: {e}")
-        # Remove the driver from thread_drivers if it was registered
-        if job_id and thread_drivers is not None and job_id in thread_drivers:
-            try:
-                del thread_drivers[job_id]
-                print(f"Removed driver for job {job_id} from thread_drivers")
-            except KeyError:
-                print(f"Driver for job {job_id} was already removed from thread_drivers")
-            except Exception as e:
-                print(f"Error removing driver for job {job_id} from thread_drivers: {e}")
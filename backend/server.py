@@ -1,18 +1,35 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 import os
 import csv
 from datetime import datetime
 import threading
+import functools
 import uuid
-from scraper import scrape_google_search
+import asyncio
+from scraper import scrape_google_search, business_key
+import playwright_engine
+from driver_pool import DriverPool, POOL_WARM
+from metrics import ScrapeStats
+from fanout import SeenSet, SeenSetView
+from business_index import BusinessIndex
+from detail_cache import DetailCache
+from query_cache import QueryResultCache, canonical_query_key
+from rate_limiter import limiter
+from adaptive import controller
+from circuit_breaker import breaker, BlockedError, BLOCKED_RETRIES
+from checkpoints import QueryCheckpointer, restore_csv, RESUME_JOBS
+from cancellation import (CancellationToken, child_token, JOB_DEADLINE, QUERY_DEADLINE,
+                          TERMINATE_LATENCY_TARGET_MS)
+from scheduler import JobScheduler
+from job_store import JobStore
+from events import EventBus, format_sse, wants_event
+from zip_stream import ZipArchiveCache, ZipEntry
 from pathlib import Path
-import json
 import time
-import zipfile
 import io
 
 app = FastAPI(title="Google Places Scraper API")
@@ -33,83 +50,154 @@ app.add_middleware(
 # Robust Path Configuration
 BACKEND_DIR = Path(__file__).parent.absolute()
 ROOT_DIR = BACKEND_DIR.parent
-CSV_OUTPUT_DIR = ROOT_DIR / 'csv_outputs'
-JOBS_FILE = ROOT_DIR / 'jobs.json'
-STATE_FILE = ROOT_DIR / 'backend_state.json'
+CSV_OUTPUT_DIR = Path(os.environ.get("SCRAPER_OUTPUT_DIR", ROOT_DIR / 'csv_outputs'))
+JOBS_FILE = ROOT_DIR / 'jobs.json'  # Legacy, imported into JOBS_DB once
+STATE_FILE = ROOT_DIR / 'backend_state.json'  # Legacy, imported into JOBS_DB once
+JOBS_DB = Path(os.environ.get("SCRAPER_JOBS_DB", ROOT_DIR / 'jobs.db'))
+ZIP_CACHE_DIR = Path(os.environ.get("SCRAPER_ZIP_CACHE_DIR", ROOT_DIR / '.zip_cache'))
+BUSINESS_INDEX_FILE = Path(os.environ.get("SCRAPER_BUSINESS_INDEX", ROOT_DIR / 'business_index.jsonl'))
+DETAIL_CACHE_DB = Path(os.environ.get("SCRAPER_DETAIL_CACHE_DB", ROOT_DIR / 'detail_cache.db'))
 
 os.makedirs(CSV_OUTPUT_DIR, exist_ok=True)
 
+CSV_FIELDNAMES = ['name', 'rating', 'total_reviews', 'category', 'address',
+                  'phone', 'website', 'price_range', 'hours_status', 'google_maps_url', 'search_location']
+
+# Read size when streaming CSV files into merged downloads
+MERGE_CHUNK_SIZE = 256 * 1024
+
+# Upper bound for the per-job `concurrency` option
+MAX_JOB_CONCURRENCY = int(os.environ.get("SCRAPER_MAX_JOB_CONCURRENCY", "8"))
+
+# Seconds a terminated job's workers get to stop by themselves before their browsers are closed
+TERMINATE_GRACE = float(os.environ.get("SCRAPER_TERMINATE_GRACE", "2"))
+
 # Global State
 job_status = {}
-running_threads = {}  # Track running threads
-termination_flags = {}  # Track jobs marked for termination
-thread_drivers = {}  # Track WebDriver instances for each thread
-
-def load_backend_state():
-    if STATE_FILE.exists():
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+cancel_tokens = {}  # CancellationToken of each job; cancelled on terminate or at the job deadline
+driver_pool = DriverPool()  # Warm browsers shared by all jobs and queries
+# Global cap on queries running at once across all jobs (defaults to one per pooled browser)
+MAX_WORKERS = int(os.environ.get("SCRAPER_MAX_WORKERS", str(driver_pool.size)))
+job_stats = {}  # ScrapeStats for each running job
+state_lock = threading.RLock()  # Guards job_status and CSV name allocation across worker threads
+events = EventBus()  # Progress pushed to /api/events subscribers
+zip_cache = ZipArchiveCache(ZIP_CACHE_DIR)  # Compressed CSVs and the last "download all" archive
+business_index = BusinessIndex(BUSINESS_INDEX_FILE)  # Every business scraped by any job, by CID
+detail_cache = DetailCache(DETAIL_CACHE_DB)  # Recent detail rows, reused instead of clicking while fresh
+EVENT_KEEPALIVE_SECONDS = 15
+
+job_store = JobStore(JOBS_DB)
+job_store.migrate_json(JOBS_FILE, STATE_FILE)
+query_results = QueryResultCache(job_store, CSV_OUTPUT_DIR)  # Recent query CSVs and queries in flight
 
 def save_backend_state(state):
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state, f)
+        for key, value in state.items():
+            job_store.set_state(key, value)
     except Exception as e:
         print(f"Error saving backend state: {e}")
 
-backend_state = load_backend_state()
-last_created_job_id = backend_state.get('last_job_id')
+resumable_job_ids = []  # Jobs cut off by a restart, queued again on startup
 
 def load_jobs():
     global job_status
-    if JOBS_FILE.exists():
-        try:
-            with open(JOBS_FILE, 'r') as f:
-                jobs = json.load(f)
-                # Cleanup: mark any interrupted jobs as failed on startup
-                for jid in jobs:
-                    if jobs[jid].get('status') in ['processing', 'queued']:
-                        jobs[jid]['status'] = 'failed'
-                        jobs[jid]['error'] = 'Server restarted while job was active'
-                job_status = jobs
-                return jobs
-        except Exception as e:
-            print(f"Error loading jobs.json: {e}")
-            return {}
-    return {}
-
-def save_jobs():
     try:
-        with open(JOBS_FILE, 'w') as f:
-            json.dump(job_status, f, indent=2)
-        print(f"Successfully saved {len(job_status)} jobs to {JOBS_FILE}")
+        # Jobs interrupted by a restart continue from their checkpoints (or fail with SCRAPER_RESUME_JOBS=0)
+        interrupted = job_store.jobs_with_status(['processing', 'queued', 'terminating'])
+        for job in interrupted:
+            if job['status'] == 'terminating':
+                job['status'] = 'terminated'
+                job['error'] = 'Job terminated by user'
+                job['completed_at'] = datetime.now().isoformat()
+            elif RESUME_JOBS:
+                job['status'] = 'queued'
+                job['resumed_at'] = datetime.now().isoformat()
+                job['resume_count'] = job.get('resume_count', 0) + 1
+                # Remember the CSVs the cut-off queries were writing, to restart them in the same files
+                cut_off = {entry['index']: entry['csv_file'] for entry in job.get('interrupted_queries', [])}
+                cut_off.update({entry['index']: entry['csv_file'] for entry in job.get('active_queries', [])})
+                job['interrupted_queries'] = [{'index': index, 'csv_file': csv_file} for index, csv_file in cut_off.items()]
+                resumable_job_ids.append(job['job_id'])
+            else:
+                job['status'] = 'failed'
+                job['error'] = 'Server restarted while job was active'
+            job['active_queries'] = []
+            job['current_query'] = None
+            job['current_query_index'] = None
+            job['current_csv_file'] = None
+        if interrupted:
+            job_store.save_many(interrupted)
+        job_status = job_store.load_jobs()
+        return job_status
+    except Exception as e:
+        print(f"Error loading jobs from {JOBS_DB}: {e}")
+        return {}
+
+def job_state_event(job: dict):
+    """The small part of a job's status sent with every job_state event"""
+    return {
+        'status': job.get('status'),
+        'total_queries': job.get('total_queries'),
+        'completed_queries': job.get('completed_queries'),
+        'current_query': job.get('current_query'),
+        'current_query_index': job.get('current_query_index'),
+        'error': job.get('error'),
+        'completed_at': job.get('completed_at'),
+    }
+
+def save_job(job_id: str):
+    """Persist one job's status row and push the change to event subscribers"""
+    try:
+        with state_lock:
+            job = job_status.get(job_id)
+            if job is None:
+                return
+            job_store.save_job(job)
+            state = job_state_event(job)
     except Exception as e:
-        print(f"CRITICAL: Failed to save jobs.json: {e}")
+        print(f"CRITICAL: Failed to save job {job_id}: {e}")
+        return
+    events.publish('job_state', job_id=job_id, **state)
 
 # Initial Load
 job_status = load_jobs()
 
-# If we don't have a persisted last_job_id, initialize it from the most recent job in job_status
-if not last_created_job_id and job_status:
-    sorted_jobs = sorted(
-        job_status.values(), 
-        key=lambda x: x.get('created_at', ''), 
-        reverse=True
-    )
-    if sorted_jobs:
-        last_created_job_id = sorted_jobs[0].get('job_id')
-        save_backend_state({'last_job_id': last_created_job_id})
+# Last job survives restarts in the state table; fall back to the newest job (indexed lookup)
+if job_store.has_state('last_job_id'):
+    last_created_job_id = job_store.get_state('last_job_id')
+else:
+    last_created_job_id = job_store.latest_job_id()
+    save_backend_state({'last_job_id': last_created_job_id})
 
 print(f"Backend Initialized with {len(job_status)} jobs. Last job: {last_created_job_id}")
 
+def get_active_files():
+    """CSV files still being written by a running job"""
+    active_files = set()
+    with state_lock:
+        for job in job_status.values():
+            if job.get('status') in ['processing', 'queued']:
+                if job.get('current_csv_file'):
+                    active_files.add(job.get('current_csv_file'))
+                for active in job.get('active_queries') or []:
+                    active_files.add(active['csv_file'])
+    return active_files
+
 # Pydantic Models
 class ScrapeRequest(BaseModel):
     queries: List[str]
     location: str = ""
+    extraction_mode: Literal["script", "selenium"] = "script"
+    panel_wait_mode: Literal["observer", "polling"] = "observer"
+    pagination_mode: Literal["url", "click"] = "url"
+    concurrency: int = Field(1, ge=1, le=MAX_JOB_CONCURRENCY)
+    page_workers: int = Field(1, ge=1, le=MAX_JOB_CONCURRENCY)
+    known_business_mode: Literal["off", "skip", "reference"] = "off"
+    detail_cache_ttl: Optional[int] = Field(None, ge=0)
+    reuse_results: bool = True
+    priority: Optional[Literal["interactive", "bulk"]] = None
+    deadline_seconds: Optional[int] = Field(None, ge=1)
+    engine: Literal["selenium", "playwright"] = "selenium"
 
 class JobResponse(BaseModel):
     job_id: str
@@ -118,8 +206,11 @@ class JobResponse(BaseModel):
 
 class QueryResult(BaseModel):
     query: str
+    query_index: Optional[int] = None
     csv_file: Optional[str] = None
     total_results: Optional[int] = None
+    status: Optional[str] = None
+    reused_from_job: Optional[str] = None
     error: Optional[str] = None
     completed_at: str
 
@@ -138,6 +229,24 @@ class JobStatusResponse(BaseModel):
     current_csv_file: Optional[str] = None
     completed_at: Optional[str] = None
     error: Optional[str] = None
+    extraction_mode: Optional[str] = None
+    panel_wait_mode: Optional[str] = None
+    pagination_mode: Optional[str] = None
+    concurrency: Optional[int] = None
+    page_workers: Optional[int] = None
+    known_business_mode: Optional[str] = None
+    detail_cache_ttl: Optional[int] = None
+    reuse_results: Optional[bool] = None
+    active_queries: Optional[List[dict]] = None
+    priority: Optional[str] = None
+    queue_position: Optional[int] = None
+    breaker: Optional[dict] = None
+    resumed_at: Optional[str] = None
+    resume_count: Optional[int] = None
+    deadline_seconds: Optional[int] = None
+    terminate_latency_ms: Optional[float] = None
+    engine: Optional[str] = None
+    stats: Optional[dict] = None
 
 class FileInfo(BaseModel):
     filename: str
@@ -153,43 +262,71 @@ class HealthResponse(BaseModel):
 async def test_route():
     return {"message": "Server is running the LATEST code version 3.0"}
 
+def merged_csv_chunks(filepaths):
+    """Yield the merged CSV: the canonical header, then every file's rows.
+
+    Files whose header is CSV_FIELDNAMES are copied chunk by chunk after their
+    header line without parsing; only files with a different header are
+    re-mapped row by row onto the canonical columns.
+    """
+    yield (','.join(CSV_FIELDNAMES) + '\r\n').encode('utf-8')
+    for filepath in filepaths:
+        try:
+            with open(filepath, 'rb') as f:
+                header_line = f.readline()
+                if not header_line:
+                    continue
+                header = next(csv.reader([header_line.decode('utf-8-sig')]), [])
+                if header == CSV_FIELDNAMES:
+                    last_chunk = b''
+                    while True:
+                        chunk = f.read(MERGE_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        last_chunk = chunk
+                        yield chunk
+                    if last_chunk and not last_chunk.endswith(b'\n'):
+                        yield b'\r\n'
+                else:
+                    yield from remapped_csv_rows(f, header)
+        except Exception as fe:
+            print(f"Error reading {os.path.basename(filepath)}: {fe}")
+
+def remapped_csv_rows(f, header):
+    """Row-level fallback for a file (positioned after its header) with non-canonical columns"""
+    reader = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', newline=''), fieldnames=header)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDNAMES, restval='', extrasaction='ignore')
+    for row in reader:
+        writer.writerow(row)
+        if output.tell() >= MERGE_CHUNK_SIZE:
+            yield output.getvalue().encode('utf-8')
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue().encode('utf-8')
+
 @app.get("/api/download-all-csv")
 async def download_all_merged_csv():
-    """Download all results merged into a single CSV file"""
+    """Download all results merged into a single CSV file, streamed file by file"""
     print("DEBUG: download_all_merged_csv route triggered")
     try:
         # Get list of files currently being processed
-        active_files = set()
-        for job in job_status.values():
-            if job.get('status') in ['processing', 'queued']:
-                if job.get('current_csv_file'):
-                    active_files.add(job.get('current_csv_file'))
+        active_files = get_active_files()
 
-        output = io.StringIO()
-        fieldnames = ['name', 'rating', 'total_reviews', 'category', 'address',
-                     'phone', 'website', 'price_range', 'hours_status', 'google_maps_url']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+        filepaths = [
+            os.path.join(CSV_OUTPUT_DIR, filename)
+            for filename in sorted(os.listdir(CSV_OUTPUT_DIR))
+            if filename.endswith('.csv') and filename not in active_files and not filename.endswith('_EMPTY.csv')
+        ]
 
-        files_added = 0
-        for filename in os.listdir(CSV_OUTPUT_DIR):
-            if filename.endswith('.csv') and filename not in active_files and not filename.endswith('_EMPTY.csv'):
-                filepath = os.path.join(CSV_OUTPUT_DIR, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        reader = csv.DictReader(f)
-                        for row in reader:
-                            writer.writerow(row)
-                    files_added += 1
-                except Exception as fe:
-                    print(f"Error reading {filename}: {fe}")
-
-        if files_added == 0:
+        # Decided before the first byte is sent, so it can still be a proper 404
+        if not filepaths:
             raise HTTPException(status_code=404, detail="No data available to merge. Generate some results first!")
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return Response(
-            content=output.getvalue(),
+        return StreamingResponse(
+            merged_csv_chunks(filepaths),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename=merged_results_{timestamp}.csv"}
         )
@@ -222,283 +359,544 @@ async def get_active_job():
         print(f"Error getting active job: {e}")
         return None
 
-def process_multiple_queries(job_id: str, queries: List[str], location: str):
-    """Process multiple queries one by one"""
-    try:
-        for idx, query in enumerate(queries):
-            # Check if termination was requested for this job
-            if termination_flags.get(job_id):
-                print(f"Job {job_id} was terminated by user request")
-                job_status[job_id]['status'] = 'terminated'
-                job_status[job_id]['error'] = 'Job terminated by user'
-                job_status[job_id]['completed_at'] = datetime.now().isoformat()
-                job_status[job_id]['current_query'] = None
-                job_status[job_id]['current_query_index'] = None
-                save_jobs()
-                return  # Exit the function early
-
-            try:
-                # Update status
-                job_status[job_id]['status'] = 'processing'
-                job_status[job_id]['current_query'] = query
-                job_status[job_id]['current_query_index'] = idx + 1
-
-                # Create CSV file with incremental numbering if file exists and use readable format with spaces
-                # Clean the query and location strings to make them more readable
-                # Replace non-alphanumeric characters with spaces for readability
-                safe_query = "".join([c if c.isalnum() else " " for c in query.strip()])
-                safe_location = "".join([c if c.isalnum() else " " for c in location.strip()])
-
-                # Clean up multiple spaces and strip whitespace
-                safe_query = " ".join(safe_query.split()).strip()
-                safe_location = " ".join(safe_location.split()).strip()
-
-                # Create base filename using spaces between words as requested
-                base_parts = []
-                if safe_query:
-                    base_parts.append(safe_query)
-                if safe_location:
-                    base_parts.append(safe_location)
-
-                base_filename = " ".join(base_parts).strip()
-
-                # Find the next available number for this filename
-                counter = 1
-                csv_filename = f"{base_filename} {counter}.csv"
-                csv_filepath = os.path.join(CSV_OUTPUT_DIR, csv_filename)
-
-                while os.path.exists(csv_filepath):
-                    counter += 1
-                    csv_filename = f"{base_filename} {counter}.csv"
-                    csv_filepath = os.path.join(CSV_OUTPUT_DIR, csv_filename)
-
-                # IMPORTANT: Set active CSV file for frontend tracking
-                job_status[job_id]['current_csv_file'] = csv_filename
-                save_jobs()
-
-                # Initialize CSV
-                fieldnames = ['name', 'rating', 'total_reviews', 'category', 'address',
-                             'phone', 'website', 'price_range', 'hours_status', 'google_maps_url', 'search_location']
-
-                with open(csv_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                
-                # Mark the START TIME using access time (atime)
-                # This ensures list_files can distinguish start from finish
-                start_time = time.time()
-                os.utime(csv_filepath, (start_time, start_time))
-
-                # Scrape data
-                print(f"DEBUG: Calling scraper for query: '{query.strip()}' in location: '{location}'")
-                all_data = scrape_google_search(
-                    search_query=query.strip(),
-                    location=location,
-                    csv_filepath=csv_filepath,
-                    fieldnames=fieldnames,
-                    termination_flag=lambda: termination_flags.get(job_id, False),
-                    job_id=job_id,
-                    thread_drivers=thread_drivers
-                )
-
-                if all_data is None:
-                    all_data = []
-
-                if not all_data:
-                    # If no results found, tag the file as NO_RESULTS
-                    # First, get the base filename without the counter
-                    # For space-separated format: "barber in USA 1.csv" -> "barber in USA"
-                    parts = csv_filename.rsplit(' ', 1)  # Split on the last space
-                    if len(parts) > 1 and parts[1].replace('.csv', '').isdigit():
-                        base_part = parts[0]  # "barber in USA"
-                    else:
-                        base_part = csv_filename.replace('.csv', '')  # Fallback
-
-                    new_filename = f"{base_part} EMPTY.csv"
+def allocate_csv_file(query: str, location: str):
+    """Reserve the next free numbered CSV name for a query and write its header.
+
+    Runs under state_lock so parallel workers never pick the same number.
+    """
+    # Create CSV file with incremental numbering if file exists and use readable format with spaces
+    # Clean the query and location strings to make them more readable
+    # Replace non-alphanumeric characters with spaces for readability
+    safe_query = "".join([c if c.isalnum() else " " for c in query.strip()])
+    safe_location = "".join([c if c.isalnum() else " " for c in location.strip()])
+
+    # Clean up multiple spaces and strip whitespace
+    safe_query = " ".join(safe_query.split()).strip()
+    safe_location = " ".join(safe_location.split()).strip()
+
+    # Create base filename using spaces between words as requested
+    base_parts = []
+    if safe_query:
+        base_parts.append(safe_query)
+    if safe_location:
+        base_parts.append(safe_location)
+
+    base_filename = " ".join(base_parts).strip()
+
+    with state_lock:
+        # Find the next available number for this filename
+        counter = 1
+        csv_filename = f"{base_filename} {counter}.csv"
+        csv_filepath = os.path.join(CSV_OUTPUT_DIR, csv_filename)
+
+        while os.path.exists(csv_filepath):
+            counter += 1
+            csv_filename = f"{base_filename} {counter}.csv"
+            csv_filepath = os.path.join(CSV_OUTPUT_DIR, csv_filename)
+
+        # Initialize CSV
+        with open(csv_filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+            writer.writeheader()
+
+    # Mark the START TIME using access time (atime)
+    # This ensures list_files can distinguish start from finish
+    start_time = time.time()
+    os.utime(csv_filepath, (start_time, start_time))
+    return csv_filename, csv_filepath
+
+def reset_csv(csv_filepath: str):
+    """Cut a query's CSV back to its header, to scrape the query again from the start"""
+    with open(csv_filepath, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+        writer.writeheader()
 
-                    # If that name already exists, find the next available number
-                    counter = 1
-                    final_filename = new_filename
-                    final_filepath = os.path.join(CSV_OUTPUT_DIR, final_filename)
+def resume_csv(csv_filepath: str, checkpoint: Optional[dict]):
+    """The scraper's `resume` for a query's CSV and checkpoint.
 
-                    while os.path.exists(final_filepath):
-                        final_filename = f"{base_part} EMPTY {counter}.csv"
-                        final_filepath = os.path.join(CSV_OUTPUT_DIR, final_filename)
-                        counter += 1
+    Without a checkpoint the CSV cannot be continued: it is cut back to its
+    header and None is returned, so the query starts over in the same file.
+    """
+    rows = restore_csv(csv_filepath, checkpoint) if checkpoint is not None else None
+    if rows is None:
+        reset_csv(csv_filepath)
+        return None
+    return {'page': checkpoint['page'], 'rows': rows}
+
+def businesses_in_results(results: List[dict]):
+    """A SeenSet of the businesses in the CSVs of a job's finished queries.
+
+    After a restart it stands in for the job's dedup set, so resumed queries
+    do not write businesses the finished ones already have. Reused results
+    are left out, as they never added to the set.
+    """
+    seen = SeenSet()
+    for result in results:
+        if not result.get('csv_file') or result.get('reused_from_job'):
+            continue
+        try:
+            with open(os.path.join(CSV_OUTPUT_DIR, result['csv_file']), 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    key = business_key(row.get('google_maps_url'))
+                    if key:
+                        seen.add_new(key)
+        except OSError as e:
+            print(f"[WARNING] Could not read {result['csv_file']} to rebuild the job's dedup set: {e}")
+    return seen
+
+def mark_empty_csv(csv_filename: str, csv_filepath: str, tag: str = "EMPTY"):
+    """Rename a CSV without results to '<query> EMPTY.csv' (or another tag) and return the new name"""
+    # If no results found, tag the file as NO_RESULTS
+    # First, get the base filename without the counter
+    # For space-separated format: "barber in USA 1.csv" -> "barber in USA"
+    parts = csv_filename.rsplit(' ', 1)  # Split on the last space
+    if len(parts) > 1 and parts[1].replace('.csv', '').isdigit():
+        base_part = parts[0]  # "barber in USA"
+    else:
+        base_part = csv_filename.replace('.csv', '')  # Fallback
+
+    new_filename = f"{base_part} {tag}.csv"
+
+    with state_lock:
+        # If that name already exists, find the next available number
+        counter = 1
+        final_filename = new_filename
+        final_filepath = os.path.join(CSV_OUTPUT_DIR, final_filename)
+
+        while os.path.exists(final_filepath):
+            final_filename = f"{base_part} {tag} {counter}.csv"
+            final_filepath = os.path.join(CSV_OUTPUT_DIR, final_filename)
+            counter += 1
 
+        try:
+            if os.path.exists(csv_filepath):
+                os.rename(csv_filepath, final_filepath)
+                return final_filename
+        except Exception as re:
+            print(f"Error renaming empty CSV: {re}")
+            # If rename fails, keep the original filename
+    return csv_filename
+
+def job_cancelled(job_id: str):
+    token = cancel_tokens.get(job_id)
+    return token is not None and token.cancelled()
+
+def mark_job_terminated(job_id: str, error: str = 'Job terminated by user'):
+    with state_lock:
+        job_status[job_id]['status'] = 'terminated'
+        job_status[job_id]['error'] = error
+        job_status[job_id]['completed_at'] = datetime.now().isoformat()
+        job_status[job_id]['current_query'] = None
+        job_status[job_id]['current_query_index'] = None
+        job_status[job_id]['current_csv_file'] = None
+        job_status[job_id]['active_queries'] = []
+    save_job(job_id)
+
+def refresh_active_queries(job: dict):
+    """Point the legacy current_* fields at the most recently started active query"""
+    active = job.get('active_queries') or []
+    latest = active[-1] if active else None
+    job['current_query'] = latest['query'] if latest else None
+    job['current_query_index'] = latest['index'] if latest else None
+    job['current_csv_file'] = latest['csv_file'] if latest else None
+
+def run_query(job_id: str, idx: int, query: str, location: str, stats: ScrapeStats, scrape_options: dict,
+              reuse_results: bool = True, checkpoint: Optional[dict] = None, engine: str = "selenium",
+              csv_file: Optional[str] = None):
+    """Scrape one query of a job into its own CSV and record the result.
+
+    Safe to run from several worker threads of the same job at once: each call
+    leases its own browser from the driver pool. With `reuse_results` a query
+    scraped within the query cache TTL is answered with the existing CSV, and
+    one identical to a query already running waits for that scrape instead.
+    A `checkpoint` left by an interrupted run continues that run's CSV from
+    its last complete page; without a usable one, the `csv_file` an
+    interrupted run was writing is cut back to its header and reused, so no
+    partial copy is left behind. `engine` picks the Selenium scraper or the
+    Playwright one (playwright_engine), which share the scraper contract.
+    """
+    job_token = cancel_tokens.setdefault(job_id, CancellationToken())
+    if job_token():
+        return
+    query_token = child_token(job_token, QUERY_DEADLINE)
+
+    active_entry = None
+    flight = None
+    try:
+        resume = None
+        csv_filename = checkpoint['csv_file'] if checkpoint is not None else csv_file
+        if csv_filename is not None:
+            csv_filepath = os.path.join(CSV_OUTPUT_DIR, csv_filename)
+            resume = resume_csv(csv_filepath, checkpoint)
+            if resume is not None:
+                stats.incr('queries_resumed')
+                print(f"DEBUG: Resuming query '{query}' in {csv_filename} after page {resume['page']} ({len(resume['rows'])} rows)")
+            else:
+                print(f"DEBUG: Restarting query '{query}' from page 1 in {csv_filename}")
+
+        if reuse_results and resume is None:
+            cached, flight = query_results.begin(canonical_query_key(query, location),
+                                                 cancelled=job_token)
+            if cached is None and flight is None:
+                return
+            if cached is not None:
+                print(f"DEBUG: Reusing {cached['csv_file']} for query '{query}'")
+                if csv_filename is not None:
+                    # The interrupted run's file (now just a header) is not needed
                     try:
-                        if os.path.exists(csv_filepath):
-                            os.rename(csv_filepath, final_filepath)
-                            csv_filename = final_filename
-                    except Exception as re:
-                        print(f"Error renaming empty CSV: {re}")
-                        # If rename fails, keep the original filename
-                        pass
-
-                # Check again if termination was requested before saving results
-                if termination_flags.get(job_id):
-                    print(f"Job {job_id} was terminated by user request")
-                    job_status[job_id]['status'] = 'terminated'
-                    job_status[job_id]['error'] = 'Job terminated by user'
-                    job_status[job_id]['completed_at'] = datetime.now().isoformat()
-                    job_status[job_id]['current_query'] = None
-                    job_status[job_id]['current_query_index'] = None
-                    save_jobs()
-                    return  # Exit the function early
-
-                # Clear active CSV file and store result
-                job_status[job_id]['current_csv_file'] = None
-                result = {
-                    'query': query,
-                    'csv_file': csv_filename,
-                    'total_results': len(all_data),
-                    'completed_at': datetime.now().isoformat()
-                }
-                job_status[job_id]['results'].append(result)
-                job_status[job_id]['completed_queries'] = idx + 1
-                save_jobs()
-
-                # Small delay between queries to avoid rate limiting
-                # Check termination flag during the delay
-                for _ in range(2):
-                    if termination_flags.get(job_id):
-                        print(f"Job {job_id} was terminated during delay between queries")
-                        job_status[job_id]['status'] = 'terminated'
-                        job_status[job_id]['error'] = 'Job terminated by user'
-                        job_status[job_id]['completed_at'] = datetime.now().isoformat()
-                        job_status[job_id]['current_query'] = None
-                        job_status[job_id]['current_query_index'] = None
-                        save_jobs()
-                        return  # Exit the function early
-                    time.sleep(1)
-
-            except Exception as e:
-                print(f"❌ Error processing query '{query}': {str(e)}")
-                # Check termination flag before storing error
-                if termination_flags.get(job_id):
-                    print(f"Job {job_id} was terminated during error handling for query '{query}'")
-                    job_status[job_id]['status'] = 'terminated'
-                    job_status[job_id]['error'] = 'Job terminated by user'
-                    job_status[job_id]['completed_at'] = datetime.now().isoformat()
-                    job_status[job_id]['current_query'] = None
-                    job_status[job_id]['current_query_index'] = None
-                    save_jobs()
-                    return  # Exit the function early
-                # Store error but continue
+                        os.remove(csv_filepath)
+                    except OSError as e:
+                        print(f"[WARNING] Could not remove {csv_filename}: {e}")
+                stats.incr('queries_reused')
                 result = {
                     'query': query,
-                    'error': str(e),
-                    'csv_file': None,
+                    'query_index': idx + 1,
+                    'csv_file': cached['csv_file'],
+                    'total_results': cached['total_results'],
+                    'reused_from_job': cached.get('job_id'),
+                    'status': 'completed',
                     'completed_at': datetime.now().isoformat()
                 }
-                job_status[job_id]['results'].append(result)
-                job_status[job_id]['completed_queries'] = idx + 1
-                save_jobs()
-
-        # Mark job as completed (only if not terminated)
-        if not termination_flags.get(job_id):
-            job_status[job_id]['status'] = 'completed'
-            job_status[job_id]['completed_at'] = datetime.now().isoformat()
-            job_status[job_id]['current_query'] = None
-            job_status[job_id]['current_query_index'] = None
-            save_jobs()
+                record_query_result(job_id, result, stats)
+                return
+
+        if csv_filename is None:
+            csv_filename, csv_filepath = allocate_csv_file(query, location)
+        checkpointer = QueryCheckpointer(job_store, job_id, idx + 1, query, csv_filename)
+
+        # IMPORTANT: Set active CSV file for frontend tracking
+        with state_lock:
+            job = job_status[job_id]
+            job['status'] = 'processing'
+            active_entry = {'query': query, 'index': idx + 1, 'csv_file': csv_filename}
+            job.setdefault('active_queries', []).append(active_entry)
+            refresh_active_queries(job)
+        save_job(job_id)
+        if resume is None:
+            events.publish('file_created', job_id=job_id, filename=csv_filename)
+        events.publish('query_started', job_id=job_id, query=query, query_index=idx + 1, csv_file=csv_filename)
+
+        def on_scraper_event(event_type, **data):
+            events.publish(event_type, job_id=job_id, query_index=idx + 1, **data)
+
+        # Scrape data; a block page pauses every worker (circuit breaker) and the
+        # query is tried again once the breaker lets a probe through
+        scrape = playwright_engine.scrape_google_search if engine == "playwright" else scrape_google_search
+        # Counts the businesses left out because another query of this job already has them
+        seen_businesses = SeenSetView(scrape_options['seen_businesses'])
+        blocked = False
+        for attempt in range(BLOCKED_RETRIES + 1):
+            print(f"DEBUG: Calling scraper for query: '{query.strip()}' in location: '{location}'")
+            try:
+                all_data = scrape(
+                    search_query=query.strip(),
+                    location=location,
+                    csv_filepath=csv_filepath,
+                    fieldnames=CSV_FIELDNAMES,
+                    termination_flag=query_token,
+                    job_id=job_id,
+                    driver_pool=driver_pool,
+                    stats=stats,
+                    event_callback=on_scraper_event,
+                    resume=resume,
+                    on_checkpoint=checkpointer,
+                    **dict(scrape_options, seen_businesses=seen_businesses)
+                )
+                blocked = False
+                break
+            except BlockedError as e:
+                print(f"[BREAKER] Query '{query}' blocked (attempt {attempt + 1}/{BLOCKED_RETRIES + 1}): {e}")
+                stats.incr('blocked_attempts')
+                # Rows scraped before the block are in the CSV (a block on the first page may follow resumed rows)
+                all_data = e.rows or (resume['rows'] if resume else [])
+                blocked = True
+                if attempt == BLOCKED_RETRIES or not breaker.wait_until_clear(query_token):
+                    break
+                # Carry on after the last page that made it into the CSV instead of scraping it twice
+                resume = resume_csv(csv_filepath, job_store.get_checkpoints(job_id).get(idx + 1))
+
+        if all_data is None:
+            all_data = []
+
+        if not all_data:
+            empty_filename = mark_empty_csv(csv_filename, csv_filepath, tag="BLOCKED" if blocked else "EMPTY")
+            if empty_filename != csv_filename:
+                events.publish('file_renamed', job_id=job_id, old_filename=csv_filename, filename=empty_filename)
+            csv_filename = empty_filename
+
+        result = {
+            'query': query,
+            'query_index': idx + 1,
+            'csv_file': csv_filename,
+            'total_results': len(all_data),
+            'status': 'blocked' if blocked else ('completed' if all_data else 'empty'),
+            'completed_at': datetime.now().isoformat()
+        }
+        # The CSV only answers the query for other jobs if nothing was left out of it:
+        # no business skipped for the index or for another query of this job
+        complete = scrape_options['known_business_mode'] == "off" and not seen_businesses.rejected
+        if flight is not None and not complete:
+            print(f"DEBUG: Not caching query '{query}': known_business_mode {scrape_options['known_business_mode']}, "
+                  f"{seen_businesses.rejected} businesses left to other queries of the job")
+        if flight is not None and complete and all_data and not blocked and not query_token():
+            query_results.finish(flight, {'csv_file': csv_filename, 'total_results': len(all_data), 'job_id': job_id})
+    except Exception as e:
+        print(f"❌ Error processing query '{query}': {str(e)}")
+        # Store error but continue
+        result = {
+            'query': query,
+            'query_index': idx + 1,
+            'error': str(e),
+            'csv_file': None,
+            'completed_at': datetime.now().isoformat()
+        }
+    finally:
+        if flight is not None:
+            query_results.release(flight)
+        if job_token.reason == 'terminated':
+            # Time from the terminate request until this worker let go of its query
+            stats.observe('terminate_latency_ms', job_token.since_cancel_ms())
+
+    if record_query_result(job_id, result, stats, active_entry):
+        job_store.delete_checkpoint(job_id, idx + 1)
+
+def record_query_result(job_id: str, result: dict, stats: ScrapeStats, active_entry: Optional[dict] = None):
+    """Append a finished query's result to its job and tell subscribers; False if it was not recorded"""
+    with state_lock:
+        job = job_status[job_id]
+        if active_entry in job.get('active_queries', []):
+            job['active_queries'].remove(active_entry)
+        refresh_active_queries(job)
+        job['stats'] = stats.snapshot()
+        # Results of queries cut short by termination are not recorded
+        recorded = not job_cancelled(job_id)
+        if recorded:
+            job['results'].append(result)
+            job['completed_queries'] = len(job['results'])
+    save_job(job_id)
+    if recorded:
+        events.publish('query_finished', job_id=job_id, result=result)
+    return recorded
+
+def finalize_job(job_id: str):
+    """Called by the scheduler once every query of a job has run or was cancelled"""
+    try:
+        if job_id not in job_status:
+            return
+        token = cancel_tokens.get(job_id)
+        reason = token.reason if token is not None else None
+        if reason == 'deadline':
+            print(f"Job {job_id} ran past its deadline")
+            mark_job_terminated(job_id, error=f"Job deadline of {job_status[job_id].get('deadline_seconds') or JOB_DEADLINE:g}s exceeded")
+        elif reason:
+            print(f"Job {job_id} was terminated by user request")
+            latency_ms = token.since_cancel_ms()
+            if latency_ms > TERMINATE_LATENCY_TARGET_MS:
+                print(f"[WARNING] Job {job_id} took {latency_ms:.0f} ms to stop after the terminate request")
+            with state_lock:
+                job_status[job_id]['terminate_latency_ms'] = latency_ms
+            mark_job_terminated(job_id)
+        else:
+            # Mark job as completed (only if not terminated)
+            with state_lock:
+                job_status[job_id]['status'] = 'completed'
+                job_status[job_id]['completed_at'] = datetime.now().isoformat()
+                job_status[job_id]['current_query'] = None
+                job_status[job_id]['current_query_index'] = None
+            save_job(job_id)
     except Exception as e:
         print(f"🔥 Critical failure in background job {job_id}: {str(e)}")
         job_status[job_id]['status'] = 'failed'
         job_status[job_id]['error'] = str(e)
-        save_jobs()
+        save_job(job_id)
     finally:
-        # Clean up the termination flag and thread tracking when job finishes
-        if job_id in termination_flags:
-            del termination_flags[job_id]
-        if job_id in running_threads:
-            del running_threads[job_id]
-        if job_id in thread_drivers:
-            # Close the driver if it's still active
-            try:
-                driver = thread_drivers[job_id]
-                driver.quit()
-                print(f"Closing driver for job {job_id} in finally block")
-            except Exception as e:
-                print(f"Error closing driver for job {job_id} in finally: {e}")
-            finally:
-                del thread_drivers[job_id]
-        # Ensure job status is properly saved when the process ends
-        if job_id in job_status and job_status[job_id]['status'] in ['processing', 'queued', 'terminating']:
-            # If the job was still processing when the function ended, it was likely terminated
-            if termination_flags.get(job_id, False):
-                job_status[job_id]['status'] = 'terminated'
-                if not job_status[job_id].get('error'):
-                    job_status[job_id]['error'] = 'Job terminated by user'
-                job_status[job_id]['completed_at'] = datetime.now().isoformat()
-            elif job_status[job_id]['status'] != 'completed':
-                job_status[job_id]['status'] = 'failed'
-                if not job_status[job_id].get('error'):
-                    job_status[job_id]['error'] = 'Job failed unexpectedly'
-            save_jobs()
+        # Clean up the cancellation token, checkpoints and stats tracking when job finishes
+        cancel_tokens.pop(job_id, None)
+        try:
+            job_store.delete_checkpoints(job_id)
+        except Exception as e:
+            print(f"Error deleting checkpoints of job {job_id}: {e}")
+        stats = job_stats.pop(job_id, None)
+        if stats and job_id in job_status:
+            job_status[job_id]['stats'] = stats.snapshot()
+            save_job(job_id)
+
+# Global queue shared by all jobs: caps concurrent queries (and so browsers) across jobs
+scheduler = JobScheduler(max_workers=MAX_WORKERS, on_job_done=finalize_job)
+# AIMD control of the scheduler's worker limit from page load outcomes reported by the scraper
+controller.bind(scheduler.set_limit, scheduler.max_workers,
+                start=int(os.environ["SCRAPER_ADAPTIVE_START"]) if os.environ.get("SCRAPER_ADAPTIVE_START") else None,
+                on_change=lambda change: events.publish('concurrency_changed', **change))
+
+def process_multiple_queries(job_id: str, queries: List[str], location: str, extraction_mode: str = "script",
+                             panel_wait_mode: str = "observer", concurrency: int = 1, priority: Optional[str] = None,
+                             pagination_mode: str = "url", page_workers: int = 1,
+                             known_business_mode: str = "off", detail_cache_ttl: Optional[int] = None,
+                             reuse_results: bool = True, query_indexes: Optional[List[int]] = None,
+                             checkpoints: Optional[dict] = None, engine: str = "selenium",
+                             csv_files: Optional[dict] = None, seen_businesses: Optional[SeenSet] = None):
+    """Queue a job's queries on the global scheduler.
+
+    Single-query jobs default to the interactive priority class, batches to bulk.
+    `query_indexes` limits the job to those queries (0-based), `checkpoints`
+    ({query number: checkpoint}) resumes them and `csv_files` ({query number:
+    CSV file}) names the files cut-off queries were writing and
+    `seen_businesses` seeds the job's dedup set; all are used after a restart.
+    Returns a threading.Event that is set once the job has finished.
+    """
+    stats = job_stats.setdefault(job_id, ScrapeStats())
+    scrape_options = {
+        'extraction_mode': extraction_mode,
+        'panel_wait_mode': panel_wait_mode,
+        'pagination_mode': pagination_mode,
+        'page_workers': page_workers,
+        # Business CIDs already visited by any query of this job
+        'seen_businesses': seen_businesses if seen_businesses is not None else SeenSet(),
+        'business_index': business_index,
+        'known_business_mode': known_business_mode,
+        'detail_cache': detail_cache,
+        'detail_cache_ttl': detail_cache_ttl
+    }
+    priority = priority or ('interactive' if len(queries) == 1 else 'bulk')
+    if query_indexes is None:
+        query_indexes = range(len(queries))
+    checkpoints = checkpoints or {}
+    csv_files = csv_files or {}
+    tasks = [
+        functools.partial(run_query, job_id, idx, queries[idx], location, stats, scrape_options,
+                          reuse_results=reuse_results, checkpoint=checkpoints.get(idx + 1), engine=engine,
+                          csv_file=csv_files.get(idx + 1))
+        for idx in query_indexes
+    ]
+    return scheduler.submit_job(job_id, tasks, priority=priority, concurrency=concurrency)
+
+def create_job(request: ScrapeRequest):
+    """Register a job for the request and queue its queries; returns the job id"""
+    global last_created_job_id
+    job_id = str(uuid.uuid4())
+
+    # Update last_created_job_id persistently
+    last_created_job_id = job_id
+    save_backend_state({'last_job_id': last_created_job_id})
+
+    job_status[job_id] = {
+        'job_id': job_id,
+        'status': 'queued',
+        'total_queries': len(request.queries),
+        'completed_queries': 0,
+        'queries': request.queries,
+        'location': request.location,
+        'results': [],
+        'created_at': datetime.now().isoformat(),
+        'started_at': datetime.now().isoformat(),
+        'extraction_mode': request.extraction_mode,
+        'panel_wait_mode': request.panel_wait_mode,
+        'pagination_mode': request.pagination_mode,
+        'concurrency': request.concurrency,
+        'page_workers': request.page_workers,
+        'known_business_mode': request.known_business_mode,
+        'detail_cache_ttl': request.detail_cache_ttl,
+        'reuse_results': request.reuse_results,
+        'priority': request.priority or ('interactive' if len(request.queries) == 1 else 'bulk'),
+        'deadline_seconds': request.deadline_seconds,
+        'engine': request.engine,
+        'active_queries': []
+    }
+    save_job(job_id)
+    cancel_tokens[job_id] = CancellationToken(request.deadline_seconds or JOB_DEADLINE)
+
+    process_multiple_queries(
+        job_id, request.queries, request.location,
+        extraction_mode=request.extraction_mode,
+        panel_wait_mode=request.panel_wait_mode,
+        pagination_mode=request.pagination_mode,
+        concurrency=request.concurrency,
+        page_workers=request.page_workers,
+        known_business_mode=request.known_business_mode,
+        detail_cache_ttl=request.detail_cache_ttl,
+        reuse_results=request.reuse_results,
+        priority=job_status[job_id]['priority'],
+        engine=request.engine
+    )
+    return job_id
+
+def resume_job(job_id: str):
+    """Queue the queries of an interrupted job that have no result yet, from their checkpoints"""
+    job = job_status[job_id]
+    done = {result.get('query_index') for result in job.get('results', [])}
+    query_indexes = [idx for idx in range(len(job['queries'])) if idx + 1 not in done]
+    checkpoints = job_store.get_checkpoints(job_id)
+    csv_files = {entry['index']: entry['csv_file'] for entry in job.get('interrupted_queries', [])
+                 if entry['index'] - 1 in query_indexes}
+    seen_businesses = businesses_in_results(job.get('results', []))
+    print(f"DEBUG: Resuming job {job_id}: {len(query_indexes)} of {len(job['queries'])} queries left, "
+          f"{len(checkpoints)} from a checkpoint")
+    save_job(job_id)
+    # The deadline starts over: time spent before the restart is not held against the job
+    cancel_tokens[job_id] = CancellationToken(job.get('deadline_seconds') or JOB_DEADLINE)
+    process_multiple_queries(
+        job_id, job['queries'], job.get('location', ''),
+        extraction_mode=job.get('extraction_mode', 'script'),
+        panel_wait_mode=job.get('panel_wait_mode', 'observer'),
+        pagination_mode=job.get('pagination_mode', 'url'),
+        concurrency=job.get('concurrency', 1),
+        page_workers=job.get('page_workers', 1),
+        known_business_mode=job.get('known_business_mode', 'off'),
+        detail_cache_ttl=job.get('detail_cache_ttl'),
+        reuse_results=job.get('reuse_results', True),
+        priority=job.get('priority'),
+        query_indexes=query_indexes,
+        checkpoints=checkpoints,
+        engine=job.get('engine', 'selenium'),
+        csv_files=csv_files,
+        seen_businesses=seen_businesses
+    )
 
 @app.post("/api/scrape", response_model=JobResponse, status_code=202)
 async def scrape(request: ScrapeRequest):
     try:
         if not request.queries:
             raise HTTPException(status_code=400, detail="No queries provided")
+        if request.engine == "playwright" and not playwright_engine.AVAILABLE:
+            raise HTTPException(status_code=400, detail=playwright_engine.MISSING_MESSAGE)
 
-        job_id = str(uuid.uuid4())
-        
-        # Update last_created_job_id persistently
-        global last_created_job_id
-        last_created_job_id = job_id
-        save_backend_state({'last_job_id': last_created_job_id})
-
-        job_status[job_id] = {
-            'job_id': job_id,
-            'status': 'queued',
-            'total_queries': len(request.queries),
-            'completed_queries': 0,
-            'queries': request.queries,
-            'location': request.location,
-            'results': [],
-            'created_at': datetime.now().isoformat(),
-            'started_at': datetime.now().isoformat()
-        }
-        save_jobs()
-
-        thread = threading.Thread(
-            target=process_multiple_queries,
-            args=(job_id, request.queries, request.location)
-        )
-        thread.daemon = True
-        thread.start()
-
-        # Track the running thread
-        running_threads[job_id] = thread
+        job_id = create_job(request)
+        position = scheduler.queue_position(job_id)
 
         return JobResponse(
             job_id=job_id,
-            message="Scraping started",
+            message=f"Queued behind {position - 1} job(s)" if position and position > 1 else "Scraping started",
             total_queries=len(request.queries)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def close_stuck_browsers(job_id: str):
+    """Close any browser (or Playwright context) a terminated job still holds; the pool replaces it on the next acquire"""
+    closed = driver_pool.discard_job(job_id)
+    if closed:
+        print(f"Closed {closed} browser driver(s) for job {job_id} still busy {TERMINATE_GRACE:g}s after termination")
+    closed = playwright_engine.engine.close_job(job_id)
+    if closed:
+        print(f"Closed {closed} Playwright context(s) for job {job_id} still busy {TERMINATE_GRACE:g}s after termination")
+
 @app.post("/api/terminate/{job_id}")
 async def terminate_job(job_id: str):
     """Mark a job for termination"""
     if job_id not in job_status:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    # Mark the job for termination
-    termination_flags[job_id] = True
+    # Cancel the job's token (wakes every wait of its workers) and drop its queries that have not started yet
+    cancel_tokens.setdefault(job_id, CancellationToken()).cancel('terminated')
+    scheduler.cancel_job(job_id)
 
-    # Close any active browser driver for this job
-    if job_id in thread_drivers:
-        try:
-            driver = thread_drivers[job_id]
-            driver.quit()
-            print(f"Closed browser driver for job {job_id}")
-            del thread_drivers[job_id]
-        except Exception as e:
-            print(f"Error closing driver for job {job_id}: {e}")
+    # Workers stop and hand their browsers back by themselves; only close those still
+    # leased after the grace period (e.g. stuck in a page load), not race the worker
+    closer = threading.Timer(TERMINATE_GRACE, close_stuck_browsers, args=(job_id,))
+    closer.daemon = True
+    closer.start()
 
     # Update job status to indicate termination in progress
     if job_status[job_id]['status'] in ['queued', 'processing', 'terminating']:
@@ -507,7 +905,7 @@ async def terminate_job(job_id: str):
         job_status[job_id]['current_query'] = None
         job_status[job_id]['current_query_index'] = None
         # Important: Sync global state
-        save_jobs()
+        save_job(job_id)
 
     return {"message": "Job termination requested", "job_id": job_id}
 
@@ -518,7 +916,7 @@ async def get_status(job_id: str):
         raise HTTPException(status_code=404, detail="Job not found")
 
     # Check if the job has been marked for termination and is currently running
-    if (job_id in termination_flags and termination_flags[job_id] and
+    if (job_cancelled(job_id) and
         job_status[job_id]['status'] in ['processing', 'queued']):
         # If termination was requested but status hasn't been updated yet,
         # return the status with 'terminating' to reflect the current state
@@ -527,6 +925,16 @@ async def get_status(job_id: str):
             current_status['status'] = 'terminating'
         return current_status
 
+    if job_status[job_id]['status'] == 'queued':
+        current_status = job_status[job_id].copy()
+        current_status['queue_position'] = scheduler.queue_position(job_id)
+        return current_status
+
+    if job_status[job_id]['status'] == 'processing' and breaker.state != 'closed':
+        current_status = job_status[job_id].copy()
+        current_status['breaker'] = breaker.status()
+        return current_status
+
     return job_status[job_id]
 
 
@@ -547,12 +955,8 @@ async def list_files():
         files = []
         if not os.path.exists(CSV_OUTPUT_DIR): return []
             
-        active_files = []
-        for job in job_status.values():
-            if job.get('status') in ['processing', 'queued']:
-                if job.get('current_csv_file'):
-                    active_files.append(job.get('current_csv_file'))
-                    
+        active_files = get_active_files()
+
         for filename in os.listdir(CSV_OUTPUT_DIR):
             if filename.endswith('.csv'):
                 filepath = os.path.join(CSV_OUTPUT_DIR, filename)
@@ -580,6 +984,7 @@ async def delete_file(filename: str):
         filepath = os.path.join(CSV_OUTPUT_DIR, filename)
         if os.path.exists(filepath):
             os.remove(filepath)
+            events.publish('files_deleted', filenames=[filename])
             return {"message": "Deleted"}
         raise HTTPException(status_code=404, detail="Not found")
     except Exception as e:
@@ -601,59 +1006,49 @@ async def clear_job_status(job_id: str):
         save_backend_state({'last_job_id': None})
 
     # Remove the job from active tracking
-    del job_status[job_id]
-
-    # Also remove from the JSON file to prevent reloading on refresh
-    if JOBS_FILE.exists():
-        try:
-            with open(JOBS_FILE, 'r') as f:
-                jobs = json.load(f)
-
-            # Remove the specific job
-            if job_id in jobs:
-                del jobs[job_id]
+    with state_lock:
+        del job_status[job_id]
 
-            # Save the updated jobs back to file
-            with open(JOBS_FILE, 'w') as f:
-                json.dump(jobs, f, indent=2)
-
-        except Exception as e:
-            print(f"Error updating jobs.json: {e}")
-            # Continue anyway, as the in-memory removal worked
+    # Also remove it from the store to prevent reloading on refresh
+    try:
+        job_store.delete_job(job_id)
+        job_store.delete_checkpoints(job_id)
+    except Exception as e:
+        print(f"Error deleting job {job_id} from store: {e}")
+        # Continue anyway, as the in-memory removal worked
 
+    events.publish('job_state', job_id=job_id, status='cleared')
     return {"message": "Job status cleared", "job_id": job_id}
 
 
 @app.get("/api/download-all")
 async def download_all_zip():
-    """Download all CSV files as a ZIP archive"""
+    """Download all CSV files as a ZIP archive, streamed and cached between requests"""
     try:
         # Get list of files currently being processed
-        active_files = set()
-        for job in job_status.values():
-            if job.get('status') in ['processing', 'queued']:
-                if job.get('current_csv_file'):
-                    active_files.add(job.get('current_csv_file'))
+        active_files = get_active_files()
 
-        # Create ZIP in memory
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            files_added = 0
-            for filename in os.listdir(CSV_OUTPUT_DIR):
-                if filename.endswith('.csv') and filename not in active_files:
-                    filepath = os.path.join(CSV_OUTPUT_DIR, filename)
-                    zip_file.write(filepath, filename)
-                    files_added += 1
-        
-        if files_added == 0:
+        entries = [
+            ZipEntry.from_path(filename, os.path.join(CSV_OUTPUT_DIR, filename))
+            for filename in sorted(os.listdir(CSV_OUTPUT_DIR))
+            if filename.endswith('.csv') and filename not in active_files
+        ]
+
+        if not entries:
             raise HTTPException(status_code=404, detail="No files to download")
 
-        zip_buffer.seek(0)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return Response(
-            content=zip_buffer.getvalue(),
+        download_name = f"all_results_{timestamp}.zip"
+
+        # Same files, sizes and mtimes as last time: serve the finished archive from disk
+        cached = zip_cache.cached_archive(entries)
+        if cached:
+            return FileResponse(cached, media_type="application/x-zip-compressed", filename=download_name)
+
+        return StreamingResponse(
+            zip_cache.stream(entries),
             media_type="application/x-zip-compressed",
-            headers={"Content-Disposition": f"attachment; filename=all_results_{timestamp}.zip"}
+            headers={"Content-Disposition": f"attachment; filename={download_name}"}
         )
     except Exception as e:
         if isinstance(e, HTTPException):
@@ -662,17 +1057,11 @@ async def download_all_zip():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
-
 @app.delete("/api/delete-all-csv")
 async def delete_all_csv():
     try:
         # Get list of files currently being processed
-        active_files = set()
-        for job in job_status.values():
-            if job.get('status') in ['processing', 'queued']:
-                if job.get('current_csv_file'):
-                    active_files.add(job.get('current_csv_file'))
+        active_files = get_active_files()
 
         deleted_files = []
         for filename in os.listdir(CSV_OUTPUT_DIR):
@@ -681,10 +1070,115 @@ async def delete_all_csv():
                 os.remove(filepath)
                 deleted_files.append(filename)
 
+        if deleted_files:
+            events.publish('files_deleted', filenames=deleted_files)
         return {"message": f"Deleted {len(deleted_files)} CSV files", "deleted_files": deleted_files}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/pool-status")
+async def pool_status():
+    """Report warm, leased and recycled browsers in the driver pool"""
+    return driver_pool.status()
+
+@app.get("/api/playwright")
+async def playwright_status():
+    """Report the Playwright engine's browser and open contexts"""
+    return playwright_engine.engine.status()
+
+@app.get("/api/business-index")
+async def business_index_status():
+    """Report how many businesses the cross-job index knows"""
+    return business_index.status()
+
+@app.get("/api/detail-cache")
+async def detail_cache_status():
+    """Report detail cache size, TTL and hit/miss counts since startup"""
+    return detail_cache.status()
+
+@app.get("/api/rate-limit")
+async def rate_limit_status():
+    """Report the shared navigation/click budget and how often workers had to wait for it"""
+    return limiter.status()
+
+@app.get("/api/concurrency")
+async def concurrency_status():
+    """Report the adaptive worker limit, the current sample window and recent changes with reasons"""
+    return controller.status()
+
+@app.get("/api/breaker")
+async def breaker_status():
+    """Report whether workers are paused behind the block-page circuit breaker and until when"""
+    return breaker.status()
+
+@app.get("/api/scheduler")
+async def scheduler_status():
+    """Report the global worker cap, busy workers and queued jobs"""
+    return scheduler.status()
+
+@app.get("/api/events")
+async def event_stream(request: Request, job_id: Optional[str] = None):
+    """Server-sent events replacing status/files/health polling.
+
+    The stream opens with a `snapshot` event (the full status of `job_id`, or
+    null), then pushes job_state, query_started, query_finished,
+    page_advanced, row_scraped and file events. Without `job_id` only job
+    state and file events are sent.
+    """
+    try:
+        last_event_id = int(request.headers.get('last-event-id', ''))
+    except ValueError:
+        last_event_id = None
+    queue = events.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            with state_lock:
+                job = dict(job_status[job_id]) if job_id in job_status else None
+            if job and job['status'] == 'queued':
+                job['queue_position'] = scheduler.queue_position(job_id)
+            yield "retry: 3000\n\n"
+            yield format_sse('snapshot', {'job_id': job_id, 'job': job})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if wants_event(event, job_id):
+                    yield format_sse(event['type'], dict(event['data'], job_id=event['job_id']), event['id'])
+        finally:
+            events.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.on_event("startup")
+async def warm_driver_pool():
+    if POOL_WARM > 0:
+        threading.Thread(target=driver_pool.warm, args=(POOL_WARM,), daemon=True).start()
+
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    while resumable_job_ids:
+        job_id = resumable_job_ids.pop(0)
+        try:
+            resume_job(job_id)
+        except Exception as e:
+            print(f"[ERROR] Could not resume job {job_id}: {e}")
+            with state_lock:
+                job_status[job_id]['status'] = 'failed'
+                job_status[job_id]['error'] = f'Could not resume after restart: {e}'
+            save_job(job_id)
+
+@app.on_event("shutdown")
+async def shutdown_driver_pool():
+    driver_pool.shutdown()
+    playwright_engine.engine.shutdown()
+
 @app.get("/health", response_model=HealthResponse)
 async def health():
     return HealthResponse(status="healthy")
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import uuid
+import zipfile
+import zlib
+from pathlib import Path
+
+
+ZIP_CHUNK_SIZE = 256 * 1024
+ZIP_COMPRESS_LEVEL = 6
+
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP_ENTRY_LIMIT = 0xFFFF
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_time, dos_date
+
+
+class ZipEntry:
+    """A file to put in the archive, identified by (filename, size, mtime)"""
+
+    def __init__(self, filename, filepath, size, mtime_ns):
+        self.filename = filename
+        self.filepath = filepath
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    @classmethod
+    def from_path(cls, filename, filepath):
+        st = os.stat(filepath)
+        return cls(filename, filepath, st.st_size, st.st_mtime_ns)
+
+    @property
+    def key(self):
+        return f"{self.filename}\0{self.size}\0{self.mtime_ns}"
+
+    @property
+    def digest(self):
+        return hashlib.sha1(self.key.encode('utf-8')).hexdigest()
+
+
+class ZipArchiveCache:
+    """Streams ZIP archives of the CSV outputs and caches what it compressed.
+
+    Each file is deflated once into a blob on disk, keyed by (filename, size,
+    mtime), and the archive is assembled from those blobs, so adding a file
+    only compresses the new one. The last complete archive is kept as well,
+    keyed by the whole set of entries, and served as is while nothing changed.
+    """
+
+    def __init__(self, cache_dir, level=ZIP_COMPRESS_LEVEL):
+        self.cache_dir = Path(cache_dir)
+        self.level = level
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # --- cache keys ----------------------------------------------------------------
+
+    def archive_path(self, entries):
+        keys = "\n".join(sorted(entry.key for entry in entries))
+        return self.cache_dir / f"archive-{hashlib.sha1(keys.encode('utf-8')).hexdigest()}.zip"
+
+    def cached_archive(self, entries):
+        """Path of the complete archive for exactly these entries, if one is cached"""
+        path = self.archive_path(entries)
+        return path if path.exists() else None
+
+    # --- per-file blobs ------------------------------------------------------------
+
+    def _blob(self, entry):
+        """Raw deflate data plus crc/sizes for one file, compressing it if not cached"""
+        blob_path = self.cache_dir / f"{entry.digest}.deflate"
+        meta_path = self.cache_dir / f"{entry.digest}.json"
+        if blob_path.exists() and meta_path.exists():
+            try:
+                with open(meta_path, 'r') as f:
+                    return blob_path, json.load(f)
+            except Exception:
+                pass
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        crc = 0
+        size = 0
+        tmp_path = self.cache_dir / f"{entry.digest}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(entry.filepath, 'rb') as src, open(tmp_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    dst.write(compressor.compress(chunk))
+                dst.write(compressor.flush())
+            meta = {'crc': crc, 'size': size, 'compressed_size': os.path.getsize(tmp_path)}
+            os.replace(tmp_path, blob_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+        return blob_path, meta
+
+    def prune(self, entries, keep_archive=None):
+        """Drop blobs of files that are gone or changed, and every archive but `keep_archive`"""
+        live = {entry.digest for entry in entries}
+        for path in self.cache_dir.iterdir():
+            try:
+                if path.name.startswith('archive-'):
+                    if path.suffix == '.zip' and path != keep_archive:
+                        path.unlink()
+                elif path.suffix in ('.deflate', '.json') and path.stem not in live:
+                    path.unlink()
+            except OSError:
+                pass
+
+    # --- archive -------------------------------------------------------------------
+
+    def stream(self, entries):
+        """Yield the ZIP archive chunk by chunk, saving a copy as the cached archive"""
+        archive_path = self.archive_path(entries)
+        tmp_path = self.cache_dir / f"archive-{uuid.uuid4().hex}.tmp"
+        complete = False
+        try:
+            with open(tmp_path, 'wb') as copy:
+                for chunk in self._zip_chunks(entries):
+                    copy.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, archive_path)
+            complete = True
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            if complete:
+                self.prune(entries, keep_archive=archive_path)
+
+    def _zip_chunks(self, entries):
+        offset = 0
+        central = []
+        for entry in entries:
+            blob_path, meta = self._blob(entry)
+            name = entry.filename.encode('utf-8')
+            flags = 0x0800  # File name is UTF-8
+            dos_time, dos_date = _dos_datetime(entry.mtime_ns / 1e9)
+            zip64 = meta['size'] >= _ZIP32_LIMIT or meta['compressed_size'] >= _ZIP32_LIMIT
+            version = 45 if zip64 else 20
+            extra = struct.pack('<HHQQ', 0x0001, 16, meta['size'], meta['compressed_size']) if zip64 else b''
+            header = struct.pack(
+                '<IHHHHHIIIHH', 0x04034b50, version, flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                meta['crc'],
+                _ZIP32_LIMIT if zip64 else meta['compressed_size'],
+                _ZIP32_LIMIT if zip64 else meta['size'],
+                len(name), len(extra)
+            ) + name + extra
+            yield header
+            with open(blob_path, 'rb') as f:
+                while True:
+                    chunk = f.read(ZIP_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            central.append((entry, name, flags, dos_time, dos_date, meta, offset))
+            offset += len(header) + meta['compressed_size']
+
+        cd_start = offset
+        cd_size = 0
+        for entry, name, flags, dos_time, dos_date, meta, local_offset in central:
+            extra_fields = []
+            size, compressed_size, header_offset = meta['size'], meta['compressed_size'], local_offset
+            if size >= _ZIP32_LIMIT:
+                extra_fields.append(size)
+                size = _ZIP32_LIMIT
+            if compressed_size >= _ZIP32_LIMIT:
+                extra_fields.append(compressed_size)
+                compressed_size = _ZIP32_LIMIT
+            if header_offset >= _ZIP32_LIMIT:
+                extra_fields.append(header_offset)
+                header_offset = _ZIP32_LIMIT
+            extra = b''
+            if extra_fields:
+                extra = struct.pack('<HH', 0x0001, 8 * len(extra_fields)) + struct.pack(f"<{len(extra_fields)}Q", *extra_fields)
+            version = 45 if extra_fields else 20
+            record = struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                meta['crc'], compressed_size, size, len(name), len(extra), 0, 0, 0, 0o100644 << 16, header_offset
+            ) + name + extra
+            cd_size += len(record)
+            yield record
+
+        count = len(central)
+        if count >= _ZIP_ENTRY_LIMIT or cd_start >= _ZIP32_LIMIT or cd_size >= _ZIP32_LIMIT:
+            eocd64_offset = cd_start + cd_size
+            yield struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_start)
+            yield struct.pack('<IIQI', 0x07064b50, 0, eocd64_offset, 1)
+            yield struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, min(count, _ZIP_ENTRY_LIMIT),
+                              min(count, _ZIP_ENTRY_LIMIT), min(cd_size, _ZIP32_LIMIT), min(cd_start, _ZIP32_LIMIT), 0)
+        else:
+            yield struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, cd_size, cd_start, 0)
@@ -5,7 +5,7 @@ import { Header } from "@/components/Header";
 import { JobConfig } from "@/components/JobConfig";
 import { StatusSection } from "@/components/StatusSection";
 import { FileGrid } from "@/components/FileGrid";
-import { startScrape, getJobStatus, getFiles, getActiveJob, terminateJob, clearJobStatus, ScrapeJob, GeneratedFile, API_BASE_URL } from "@/lib/api";
+import { startScrape, getFiles, getActiveJob, terminateJob, clearJobStatus, ScrapeJob, GeneratedFile, API_BASE_URL } from "@/lib/api";
 
 export default function Home() {
   const [currentJob, setCurrentJob] = useState<ScrapeJob | null>(null);
@@ -13,7 +13,9 @@ export default function Home() {
   const [isScraping, setIsScraping] = useState(false);
   const [apiHealth, setApiHealth] = useState<boolean | null>(null);
 
-  const pollingIntervalRef = useRef<NodeJS.Timeout | null>(null);
+  const eventSourceRef = useRef<EventSource | null>(null);
+  const filesReloadRef = useRef<NodeJS.Timeout | null>(null);
+  const terminationRequestedRef = useRef(false);
 
   const checkHealth = useCallback(async () => {
     try {
@@ -35,45 +37,92 @@ export default function Home() {
     }
   }, []);
 
-  const stopPolling = useCallback(() => {
-    if (pollingIntervalRef.current) {
-      clearInterval(pollingIntervalRef.current);
-      pollingIntervalRef.current = null;
+  // Coalesce bursts of file events (one per scraped row) into a single reload
+  const scheduleFilesReload = useCallback((delay: number) => {
+    if (filesReloadRef.current) return;
+    filesReloadRef.current = setTimeout(() => {
+      filesReloadRef.current = null;
+      loadFiles();
+    }, delay);
+  }, [loadFiles]);
+
+  const closeEvents = useCallback(() => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
     }
   }, []);
 
-  const pollStatus = useCallback(async (jobId: string) => {
-    try {
-      const job = await getJobStatus(jobId);
-      setCurrentJob(job);
-      setApiHealth(true);
-
-      if (job.status === 'completed' || job.status === 'failed' || job.status === 'terminated') {
-        stopPolling();
-        setIsScraping(false);
-        loadFiles();
+  // One server-sent event stream replaces the status, files and health polling.
+  // With a jobId it carries that job's progress; without one only job state and file changes.
+  const connectEvents = useCallback((jobId: string | null) => {
+    closeEvents();
+    const url = jobId
+      ? `${API_BASE_URL}/api/events?job_id=${encodeURIComponent(jobId)}`
+      : `${API_BASE_URL}/api/events`;
+    const source = new EventSource(url);
+    eventSourceRef.current = source;
+
+    const finishJob = (status: string) => {
+      setIsScraping(false);
+      loadFiles();
+      if (terminationRequestedRef.current && status === 'terminated') {
+        showNotification('Scraping job terminated successfully', 'success');
       }
-    } catch (error: any) {
-      console.error("Polling error:", error);
+      terminationRequestedRef.current = false;
+      connectEvents(null);
+    };
 
-      // If job is not found (404), server might have restarted or job was cleared
-      if (error.message?.includes('(404)') || error.message?.includes('404')) {
+    source.onopen = () => setApiHealth(true);
+    // EventSource reconnects by itself; a fresh snapshot arrives once it does
+    source.onerror = () => setApiHealth(false);
+
+    source.addEventListener('snapshot', (e) => {
+      if (!jobId) return;
+      const data = JSON.parse((e as MessageEvent).data);
+      if (!data.job) {
+        // Server might have restarted or job was cleared
         setCurrentJob(prev => prev ? { ...prev, status: 'failed', error: 'Job lost (Server might have restarted or job was cleared)' } : null);
-        stopPolling();
-        setIsScraping(false);
-        loadFiles(); // Reload files since the job is gone
-      } else {
-        // For other errors, keep polling but update health
-        setApiHealth(false);
+        finishJob('failed');
+        return;
       }
-    }
-  }, [loadFiles, stopPolling]);
+      setCurrentJob(data.job);
+      if (['completed', 'failed', 'terminated'].includes(data.job.status)) {
+        finishJob(data.job.status);
+      }
+    });
+
+    source.addEventListener('job_state', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      if (!jobId || data.job_id !== jobId || data.status === 'cleared') return;
+      const state = { ...data };
+      delete state.job_id;
+      setCurrentJob(prev => prev ? { ...prev, ...state } : prev);
+      if (['completed', 'failed', 'terminated'].includes(data.status)) {
+        finishJob(data.status);
+      }
+    });
+
+    source.addEventListener('query_finished', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      if (data.job_id !== jobId) return;
+      setCurrentJob(prev => {
+        // After a reconnect the snapshot may already contain this result
+        if (!prev || (prev.results || []).some(r => (r as any).query_index === data.result.query_index)) return prev;
+        return {
+          ...prev,
+          results: [...(prev.results || []), data.result],
+          completed_queries: (prev.results || []).length + 1
+        };
+      });
+      scheduleFilesReload(500);
+    });
 
-  const startPolling = useCallback((jobId: string) => {
-    stopPolling();
-    pollStatus(jobId); // Initial check
-    pollingIntervalRef.current = setInterval(() => pollStatus(jobId), 2000);
-  }, [pollStatus, stopPolling]);
+    source.addEventListener('row_scraped', () => scheduleFilesReload(5000));
+    ['file_created', 'file_renamed', 'files_deleted'].forEach(type => {
+      source.addEventListener(type, () => scheduleFilesReload(500));
+    });
+  }, [closeEvents, loadFiles, scheduleFilesReload]);
 
   const loadActiveJob = useCallback(async () => {
     try {
@@ -82,13 +131,15 @@ export default function Home() {
         setCurrentJob(job);
         if (job.status === 'processing' || job.status === 'queued') {
           setIsScraping(true);
-          startPolling(job.job_id);
+          connectEvents(job.job_id);
+          return;
         }
       }
     } catch (error) {
       console.error("Failed to load active job:", error);
     }
-  }, [startPolling]);
+    connectEvents(null);
+  }, [connectEvents]);
 
   const handleStartScrape = async (queries: string[]) => {
     try {
@@ -96,7 +147,7 @@ export default function Home() {
       const data = await startScrape(queries);
       const jobId = data.job_id;
 
-      // Initialize a local processing state if needed or just wait for polling
+      // Initialize a local processing state; the event stream snapshot replaces it
       setCurrentJob({
         job_id: jobId,
         status: 'queued',
@@ -108,7 +159,7 @@ export default function Home() {
         started_at: new Date().toISOString()
       });
 
-      startPolling(jobId);
+      connectEvents(jobId);
     } catch (error) {
       console.error("Failed to start scrape:", error);
       setIsScraping(false);
@@ -139,50 +190,17 @@ export default function Home() {
         setCurrentJob(prev => prev ? { ...prev, status: 'terminating' } : null);
         showNotification('Termination signal sent. Stopping scraper...', 'info');
 
+        terminationRequestedRef.current = true;
         const result = await terminateJob(currentJob.job_id);
         console.log('Termination request successful:', result);
 
-        // After sending terminate signal, poll for status changes to 'terminated'
-        const pollForTermination = async () => {
-          try {
-            const job = await getJobStatus(currentJob.job_id);
-            setCurrentJob(job);
-
-            // If the job is now terminated, stop polling
-            if (job.status === 'terminated' || job.status === 'completed' || job.status === 'failed') {
-              stopPolling();
-              setIsScraping(false);
-              loadFiles();
-              showNotification('Scraping job terminated successfully', 'success');
-            } else {
-              // Continue polling until the status changes
-              setTimeout(pollForTermination, 1000);
-            }
-          } catch (error: any) {
-            console.error("Error polling for termination:", error);
-
-            // Handle 404 errors when job is not found after termination
-            if (error.message?.includes('(404)') || error.message?.includes('404')) {
-                stopPolling();
-                setIsScraping(false);
-                loadFiles(); // Reload files since the job is gone
-                showNotification('Job status cleared after termination', 'info');
-            } else {
-                stopPolling();
-                setIsScraping(false);
-                showNotification('Error checking job status after termination', 'error');
-            }
-          }
-        };
-
-        // Start polling for status changes
-        setTimeout(pollForTermination, 1000);
-
+        // The event stream reports 'terminating' and then 'terminated'
       } catch (error) {
         console.error('Error terminating job:', error);
         showNotification('Failed to stop scraping: ' + (error as Error).message, 'error');
 
         // Reset the status back to processing if the termination request failed
+        terminationRequestedRef.current = false;
         if (currentJob) {
           setCurrentJob(prev => prev ? { ...prev, status: 'processing' } : null);
         }
@@ -234,7 +252,7 @@ export default function Home() {
       }
     }
 
-    stopPolling();
+    connectEvents(null);
     setCurrentJob(null);
     setIsScraping(false);
   };
@@ -242,21 +260,13 @@ export default function Home() {
   useEffect(() => {
     loadFiles();
     loadActiveJob();
-    checkHealth(); // Initial health check
-    const healthInterval = setInterval(checkHealth, 5000);
-
-    // Add a file refresh interval that runs while scraping
-    let fileInterval: NodeJS.Timeout | null = null;
-    if (isScraping) {
-      fileInterval = setInterval(loadFiles, 5000);
-    }
+    checkHealth(); // Initial health check; afterwards the event stream reports connectivity
 
     return () => {
-      stopPolling();
-      clearInterval(healthInterval);
-      if (fileInterval) clearInterval(fileInterval);
+      closeEvents();
+      if (filesReloadRef.current) clearTimeout(filesReloadRef.current);
     };
-  }, [loadFiles, checkHealth, stopPolling, isScraping]);
+  }, [loadFiles, loadActiveJob, checkHealth, closeEvents]);
 
   return (
     <>
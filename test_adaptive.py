@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the AIMD concurrency controller (backend/adaptive.py)
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from adaptive import AIMDController, ADAPTIVE_MIN_SAMPLES
+
+
+def make_controller(**overrides):
+    applied = []
+    options = dict(min_limit=1, max_limit=8, start=4, enabled=True, increase_interval=0,
+                   decrease_cooldown=0, max_error_rate=0.2, latency_target_ms=1000, apply=applied.append)
+    options.update(overrides)
+    return AIMDController(**options), applied
+
+
+def report_many(controller, outcome, count=ADAPTIVE_MIN_SAMPLES, latency_ms=100):
+    for _ in range(count):
+        controller.report(outcome, latency_ms)
+
+
+def test_healthy_window_adds_one():
+    controller, applied = make_controller()
+    report_many(controller, 'ok')
+    assert controller.level == 5
+    assert applied == [5]
+    assert controller.status()['window']['pages'] == 0
+
+
+def test_no_decision_before_min_samples():
+    controller, applied = make_controller()
+    report_many(controller, 'ok', count=ADAPTIVE_MIN_SAMPLES - 1)
+    assert controller.level == 4 and applied == []
+
+
+def test_increase_stops_at_max():
+    controller, applied = make_controller(start=8)
+    report_many(controller, 'ok')
+    assert controller.level == 8 and applied == []
+
+
+def test_block_page_halves_at_once():
+    controller, applied = make_controller()
+    controller.report('blocked', 100)
+    assert controller.level == 2
+    assert applied == [2]
+    assert controller.changes[-1]['reason'].startswith('blocked')
+
+
+def test_decrease_respects_cooldown():
+    controller, applied = make_controller(decrease_cooldown=60)
+    controller.report('blocked', 100)
+    assert controller.level == 4 and applied == []
+
+
+def test_error_rate_spike_halves():
+    controller, applied = make_controller()
+    report_many(controller, 'ok', count=3)
+    report_many(controller, 'timeout', count=2)
+    assert controller.level == 2
+    assert 'error rate' in controller.changes[-1]['reason']
+
+
+def test_latency_spike_halves():
+    controller, applied = make_controller()
+    report_many(controller, 'ok', latency_ms=5000)
+    assert controller.level == 2
+    assert 'median page load' in controller.changes[-1]['reason']
+
+
+def test_never_below_min():
+    controller, applied = make_controller(min_limit=2, start=3)
+    controller.report('blocked', 100)
+    controller.report('blocked', 100)
+    assert controller.level == 2
+
+
+def test_empty_pages_are_normal():
+    controller, applied = make_controller()
+    report_many(controller, 'empty')
+    assert controller.level == 5
+
+
+def test_first_page_without_listings_is_bad():
+    controller, applied = make_controller()
+    report_many(controller, 'no_listings')
+    assert controller.level == 2
+
+
+def test_disabled_controller_ignores_reports():
+    controller, applied = make_controller(enabled=False)
+    controller.report('blocked', 100)
+    report_many(controller, 'ok')
+    assert controller.level == 4 and applied == []
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the circuit breaker shared by every scraping worker (backend/circuit_breaker.py)
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, BlockedError
+
+
+def test_closed_breaker_lets_everyone_through():
+    breaker = CircuitBreaker(backoff=10)
+    assert breaker.wait_until_clear()
+    assert breaker.status()['state'] == 'closed'
+
+
+def test_trip_opens_for_backoff_then_one_probe():
+    breaker = CircuitBreaker(backoff=0.1)
+    breaker.trip("block page")
+    assert breaker.state == 'open'
+    started = time.time()
+    assert breaker.wait_until_clear(probe='a')
+    assert time.time() - started >= 0.09
+    assert breaker.state == 'half_open'
+    # The probe itself may keep navigating; everyone else waits for its verdict
+    assert breaker.wait_until_clear(probe='a')
+    assert breaker.wait_until_clear(cancelled=lambda: True, probe='b') is False
+
+
+def test_probe_success_closes_and_wakes_waiters():
+    breaker = CircuitBreaker(backoff=0.05)
+    breaker.trip("block page")
+    assert breaker.wait_until_clear(probe='probe')
+    cleared = []
+    waiter = threading.Thread(target=lambda: cleared.append(breaker.wait_until_clear(probe='other')))
+    waiter.start()
+    time.sleep(0.05)
+    assert cleared == []
+    breaker.record_success(probe='probe')
+    waiter.join(1)
+    assert cleared == [True]
+    assert breaker.state == 'closed' and breaker.consecutive_trips == 0
+
+
+def test_success_from_another_worker_does_not_close():
+    breaker = CircuitBreaker(backoff=0.01)
+    breaker.trip("block page")
+    assert breaker.wait_until_clear(probe='probe')
+    breaker.record_success(probe='other')
+    assert breaker.state == 'half_open'
+
+
+def test_probe_blocked_again_doubles_backoff():
+    breaker = CircuitBreaker(backoff=0.05, max_backoff=0.15)
+    breaker.trip("first")
+    breaker.trip("ignored while open")
+    assert breaker.consecutive_trips == 1
+    assert breaker.wait_until_clear(probe='probe')
+    breaker.trip("second")
+    assert breaker.consecutive_trips == 2
+    assert abs((breaker.retry_at - breaker.opened_at) - 0.1) < 1e-6
+    assert breaker.wait_until_clear(probe='probe')
+    breaker.trip("third")
+    assert abs((breaker.retry_at - breaker.opened_at) - 0.15) < 1e-6
+    assert breaker.trips_total == 3
+
+
+def test_cancelled_wait_returns_false():
+    breaker = CircuitBreaker(backoff=60)
+    breaker.trip("block page")
+    deadline = time.time() + 0.05
+    assert breaker.wait_until_clear(cancelled=lambda: time.time() >= deadline) is False
+    assert breaker.state == 'open'
+
+
+def test_stuck_probe_is_taken_over(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, 'PROBE_TIMEOUT', 0.05)
+    breaker = CircuitBreaker(backoff=0.01)
+    breaker.trip("block page")
+    assert breaker.wait_until_clear(probe='stuck')
+    assert breaker.wait_until_clear(probe='next')
+    breaker.record_success(probe='next')
+    assert breaker.state == 'closed'
+
+
+def test_blocked_error_keeps_rows():
+    error = BlockedError("https://www.google.com/sorry/index", rows=[{'name': 'a'}])
+    assert error.rows == [{'name': 'a'}]
+    assert BlockedError("https://www.google.com/sorry/index").rows == []
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
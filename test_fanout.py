@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the page fan-out helpers (backend/fanout.py)
+"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from fanout import SeenSet, SeenSetView, PageBuffer, OrderedPageMerger, PageFanout
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+    def flush(self):
+        pass
+
+
+def test_seen_set_add_new_is_check_and_add():
+    seen = SeenSet(['a'])
+    assert 'a' in seen
+    assert seen.add_new('a') is False
+    assert seen.add_new('b') is True
+    assert len(seen) == 2
+    seen.discard('b')
+    assert 'b' not in seen
+    seen.discard('missing')
+
+
+def test_seen_set_one_winner_per_item_across_threads():
+    seen = SeenSet()
+    winners = []
+
+    def worker():
+        for i in range(200):
+            if seen.add_new(i):
+                winners.append(i)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(winners) == list(range(200))
+
+
+def test_seen_set_view_counts_items_other_queries_had():
+    job_seen = SeenSet(['other'])
+    view = SeenSetView(job_seen)
+    assert view.add_new('mine') is True
+    assert 'mine' in job_seen
+    # Adding its own item again (resumed rows) is not a rejection
+    assert view.add_new('mine') is False
+    assert view.rejected == 0
+    assert view.add_new('other') is False
+    assert view.rejected == 1
+    view.discard('mine')
+    assert 'mine' not in job_seen and len(view) == 1
+
+
+def test_page_buffer_collects_rows():
+    buffer = PageBuffer()
+    buffer.writerow({'name': 'a'})
+    buffer.flush()
+    assert buffer.rows == [{'name': 'a'}]
+
+
+def test_merger_writes_pages_in_order():
+    writer = RecordingWriter()
+    written = []
+    merger = OrderedPageMerger(writer, first_page=0, on_written=lambda pages, rows: written.append((pages, len(rows))))
+    merger.complete(2, ['c'])
+    merger.complete(1, ['b1', 'b2'])
+    assert writer.rows == [] and written == []
+    merger.complete(0, ['a'])
+    assert writer.rows == ['a', 'b1', 'b2', 'c']
+    assert written == [(3, 4)]
+    merger.complete(3, [])
+    assert written[-1] == (4, 4)
+
+
+def test_merger_finish_writes_pages_behind_a_gap():
+    writer = RecordingWriter()
+    merger = OrderedPageMerger(writer, first_page=1)
+    merger.complete(4, ['d'])
+    merger.complete(3, ['c'])
+    merger.complete(1, ['a'])
+    assert writer.rows == ['a']
+    assert merger.finish() == ['a', 'c', 'd']
+    assert writer.rows == ['a', 'c', 'd']
+
+
+def test_merger_without_writer_keeps_rows():
+    merger = OrderedPageMerger()
+    merger.complete(1, ['b'])
+    merger.complete(0, ['a'])
+    assert merger.finish() == ['a', 'b']
+
+
+def test_fanout_hands_out_each_page_once():
+    fanout = PageFanout(first_page=1, max_pages=4)
+    assert [fanout.claim() for _ in range(4)] == [1, 2, 3, None]
+
+
+def test_fanout_mark_end_only_shrinks():
+    fanout = PageFanout(first_page=0, max_pages=10)
+    assert fanout.claim() == 0
+    fanout.mark_end(2)
+    fanout.mark_end(5)
+    assert [fanout.claim() for _ in range(3)] == [1, 2, None]
+
+
+def test_fanout_mark_end_before_next_page_stops_everyone():
+    fanout = PageFanout(first_page=0, max_pages=10)
+    fanout.mark_end(-1)
+    assert fanout.claim() is None
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -24,23 +24,23 @@ def check_backend_implementation():
     scraper_content = scraper_path.read_text()
 
     checks = [
-        # Check that thread_drivers is defined in server
-        ("thread_drivers" in server_content, "Global thread_drivers variable"),
+        # Check that the driver pool is defined in server
+        ("driver_pool = DriverPool()" in server_content, "Global driver_pool instance"),
 
-        # Check that termination endpoint closes drivers
-        ("thread_drivers[job_id]" in server_content and "driver.quit()" in server_content, "Driver cleanup in termination endpoint"),
+        # Check that termination endpoint closes the job's pooled drivers
+        ("driver_pool.discard_job(job_id)" in server_content, "Driver cleanup in termination endpoint"),
 
-        # Check that scraper accepts thread_drivers parameter
-        ("thread_drivers=None" in scraper_content, "Scraper function accepts thread_drivers parameter"),
+        # Check that scraper accepts driver_pool parameter
+        ("driver_pool=None" in scraper_content, "Scraper function accepts driver_pool parameter"),
 
-        # Check that scraper registers driver
-        ("thread_drivers[job_id] = driver" in scraper_content, "Driver registration in scraper"),
+        # Check that scraper leases a driver for the job
+        ("driver_pool.acquire(job_id=job_id)" in scraper_content, "Driver lease in scraper"),
 
-        # Check that scraper cleans up driver
-        ("del thread_drivers[job_id]" in scraper_content, "Driver cleanup in scraper finally block"),
+        # Check that scraper returns the driver to the pool
+        ("driver_pool.release(pooled)" in scraper_content, "Driver release in scraper finally block"),
 
-        # Check that scraper function call passes thread_drivers
-        ("thread_drivers=thread_drivers" in server_content, "thread_drivers passed to scraper function"),
+        # Check that scraper function call passes the pool
+        ("driver_pool=driver_pool" in server_content, "driver_pool passed to scraper function"),
     ]
 
     all_passed = True
@@ -105,7 +105,7 @@ def main():
         print("🎉 All terminate functionality improvements implemented successfully!")
         print("\n📋 Summary of changes:")
         print("   • Backend: Driver cleanup in termination endpoint")
-        print("   • Backend: Proper resource management with thread_drivers")
+        print("   • Backend: Proper resource management with the driver pool")
         print("   • Backend: Enhanced finally blocks for cleanup")
         print("   • Frontend: Better error handling and API integration")
         print("   • Both: Improved termination responsiveness")
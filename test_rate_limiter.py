@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the token bucket rate limiter (backend/rate_limiter.py)
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from rate_limiter import TokenBucket, RateLimiter, NAVIGATION_COST
+
+
+class Driver:
+    """Stands in for a browser; worker buckets are keyed by it"""
+
+
+def test_bucket_spends_burst_then_waits():
+    bucket = TokenBucket(rate=2, burst=3)
+    assert bucket.try_take(1) == 0.0
+    assert bucket.try_take(2) == 0.0
+    wait = bucket.try_take(1)
+    assert 0.4 < wait <= 0.5
+
+
+def test_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+    bucket.try_take(2)
+    time.sleep(0.2)
+    assert bucket.try_take(2) == 0.0
+    assert bucket.try_take(1) > 0
+
+
+def test_cost_above_burst_is_capped():
+    bucket = TokenBucket(rate=1, burst=2)
+    assert bucket.try_take(5) == 0.0
+    assert bucket.tokens == 0
+
+
+def test_give_back_returns_tokens():
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.try_take(2)
+    bucket.give_back(2)
+    assert bucket.try_take(2) == 0.0
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, burst=1)
+    for _ in range(100):
+        assert bucket.try_take(1) == 0.0
+
+
+def test_acquire_without_throttling_within_burst():
+    limiter = RateLimiter(global_rate=1, global_burst=4, worker_rate=1, worker_burst=4)
+    worker = Driver()
+    started = time.monotonic()
+    assert limiter.acquire('click', worker=worker)
+    assert limiter.acquire('navigate', worker=worker)
+    assert time.monotonic() - started < 0.05
+    status = limiter.status()
+    assert status['acquired'] == 2 and status['throttled'] == 0
+    assert status['navigation_cost'] == NAVIGATION_COST
+
+
+def test_worker_bucket_throttles_one_browser_only():
+    limiter = RateLimiter(global_rate=0, global_burst=1, worker_rate=10, worker_burst=1)
+    busy, idle = Driver(), Driver()
+    assert limiter.acquire('click', worker=busy)
+    started = time.monotonic()
+    assert limiter.acquire('click', worker=idle)
+    assert time.monotonic() - started < 0.05
+    assert limiter.acquire('click', worker=busy)
+    assert time.monotonic() - started >= 0.08
+    assert limiter.status()['throttled'] == 1
+
+
+def test_acquire_returns_false_when_cancelled():
+    limiter = RateLimiter(global_rate=0.1, global_burst=1, worker_rate=0, worker_burst=1)
+    assert limiter.acquire('click')
+    deadline = time.monotonic() + 0.2
+    started = time.monotonic()
+    assert limiter.acquire('click', cancelled=lambda: time.monotonic() >= deadline) is False
+    assert time.monotonic() - started < 1
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))